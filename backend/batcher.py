@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into batches.
+
+    Requests submitted within `max_wait_ms` of the first pending request (up to
+    `max_batch_size` of them) are handed to `handler` in one call, so the model
+    pays a single backbone forward for the whole group. All calls to `handler`
+    happen on one worker thread, which therefore owns the model.
+    """
+
+    def __init__(self, handler, max_batch_size=8, max_wait_ms=10.0):
+        """
+        Args:
+            handler (func): Takes a list of items and returns a list of results
+                of the same length and order.
+            max_batch_size (int): Maximum number of items per handler call.
+            max_wait_ms (float): Time window to wait for more items after the
+                first one of a batch arrives.
+        """
+        self.handler = handler
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self.num_batches = 0
+        self.num_items = 0
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(
+            target=self._run, name="eidos-batcher", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, item):
+        """Queue an item and return a Future that resolves to its result."""
+        if self._closed:
+            raise RuntimeError("Batcher is closed")
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def stats(self):
+        return {
+            "batches": self.num_batches,
+            "items": self.num_items,
+            "avg_batch_size": self.num_items / max(self.num_batches, 1),
+            "pending": self._queue.qsize(),
+        }
+
+    def close(self):
+        """Stop the worker once the already queued items are processed."""
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if entry is None:
+                # Re-queue the sentinel so the worker stops after this batch
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+
+            # Skip requests whose caller has already given up
+            batch = [(item, f) for item, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.handler([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"Batch handler returned {len(results)} results for {len(batch)} items"
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.num_batches += 1
+            self.num_items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
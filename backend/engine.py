@@ -5,17 +5,28 @@ import sys
 import cv2
 import base64
 import time
+from concurrent.futures import Future
 from PIL import Image
 
 # Add parent directory to path to import sam3
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sam3.model_builder import build_sam3_image_model
+from sam3.model.sam3_image_processor import Sam3Processor
+from sam3.train.masks_ops import rle_encode
+from batcher import MicroBatcher
+from video_pipeline import VideoPipeline
+
+HIGHLIGHT_COLOR = (255, 243, 0) # BGR for Neon Cyan (0, 243, 255)
 
 class EidosEngine:
-    def __init__(self, device=None):
+    def __init__(self, device=None, max_batch_size=8, batch_window_ms=10.0, confidence_threshold=0.5, video_queue_size=8,
+                 image_cache_mb=1024, image_cache_offload_mb=2048):
         self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
+        self.video_queue_size = video_queue_size
         print(f"Initializing E.I.D.O.S. Engine on {self.device}...")
+        self.processor = None
+        self.batcher = None
         
         try:
             # Initialize SAM 3 Model
@@ -25,6 +36,20 @@ class EidosEngine:
                 load_from_HF=True,
                 eval_mode=True
             )
+            self.processor = Sam3Processor(
+                self.model,
+                device=self.device,
+                confidence_threshold=confidence_threshold,
+                # Re-analysing an already seen image with a new prompt skips the ViT
+                image_cache_bytes=image_cache_mb * 1024 * 1024,
+                image_cache_offload_bytes=image_cache_offload_mb * 1024 * 1024
+            )
+            # Concurrent /analyze requests are coalesced into one backbone forward
+            self.batcher = MicroBatcher(
+                self._infer_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=batch_window_ms
+            )
             print("SAM 3 Model loaded successfully.")
             self.ready = True
         except Exception as e:
@@ -33,55 +58,169 @@ class EidosEngine:
             self.model = None
             self.ready = False
 
-    def process_image(self, image_path, prompt):
+    def stats(self):
+        """Batching and cache counters, for monitoring."""
+        if not self.ready:
+            return {}
+        text_cache = self.model.backbone.text_cache
+        image_cache = self.processor.image_cache
+        return {
+            "batcher": self.batcher.stats(),
+            "text_cache": text_cache.stats() if text_cache is not None else None,
+            "image_cache": image_cache.stats() if image_cache is not None else None,
+        }
+
+    def _infer_batch(self, requests):
+        """
+        Run SAM 3 on a batch of requests in a single backbone forward.
+        Args:
+            requests (list): (BGR image, prompt) tuples.
+        Returns:
+            list: One dict per request with boolean masks (N, H, W) kept as a tensor on
+                the model device, and numpy boxes (N, 4, xyxy) and scores (N,).
+        """
+        images = [Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)) for img, _ in requests]
+        state = self.processor.set_image_batch(images)
+        state = self.processor.set_text_prompt_batch([prompt for _, prompt in requests], state)
+        return [
+            {
+                "masks": masks.squeeze(1),
+                "boxes": boxes.float().cpu().numpy(),
+                "scores": scores.float().cpu().numpy(),
+            }
+            for masks, boxes, scores in zip(state["masks"], state["boxes"], state["scores"])
+        ]
+
+    def _simulate_detections(self, img, frame_idx=None):
+        # Create a dummy mask (circle) to simulate "drone" detection
+        h, w = img.shape[:2]
+        mask = np.zeros((h, w), dtype=np.uint8)
+        if frame_idx is None:
+            center = (w // 2, h // 2)
+            radius = min(h, w) // 4
+        else:
+            # Animate center based on frame count to simulate movement
+            center_x = (w // 2) + int((w // 4) * np.sin(frame_idx * 0.05))
+            center_y = (h // 2) + int((h // 4) * np.cos(frame_idx * 0.05))
+            center = (center_x, center_y)
+            radius = min(h, w) // 6
+        cv2.circle(mask, center, radius, 255, -1)
+        x, y, w_rect, h_rect = cv2.boundingRect(mask)
+        return {
+            "masks": (mask > 0)[None],
+            "boxes": np.array([[x, y, x + w_rect, y + h_rect]], dtype=np.float32),
+            "scores": np.array([0.98], dtype=np.float32),
+        }
+
+    def detect_async(self, img, prompt, frame_idx=None):
+        """
+        Queue a BGR image for segmentation of every instance of `prompt`.
+        Returns a Future of the detections; requests queued close together are
+        processed in the same batch.
+        """
+        if not self.ready:
+            future = Future()
+            future.set_result(self._simulate_detections(img, frame_idx))
+            return future
+        return self.batcher.submit((img, prompt))
+
+    def detect(self, img, prompt):
+        """
+        Segment every instance of `prompt` in a BGR image.
+        Blocks until the batch containing this request has been processed.
+        """
+        return self.detect_async(img, prompt).result()
+
+    def render_detections(self, img, detections, prompt):
+        """Overlay masks, boxes and labels on a copy of a BGR image."""
+        output = img.copy()
+        highlight = np.zeros_like(img)
+        highlight[:] = HIGHLIGHT_COLOR
+        
+        # Apply cyan highlight
+        alpha = 0.4
+        masks = detections["masks"]
+        if torch.is_tensor(masks):
+            masks = masks.cpu().numpy()
+        for mask in masks:
+            # Only blend where mask is present
+            mask_indices = mask > 0
+            if mask_indices.any():
+                output[mask_indices] = cv2.addWeighted(output[mask_indices], 1 - alpha, highlight[mask_indices], alpha, 0)
+        
+        # Draw bounding boxes and labels
+        for box, score in zip(detections["boxes"], detections["scores"]):
+            x0, y0, x1, y1 = [int(round(v)) for v in box]
+            cv2.rectangle(output, (x0, y0), (x1, y1), HIGHLIGHT_COLOR, 2)
+            cv2.putText(output, f"TARGET: {prompt.upper()} {score:.2f}", (x0, y0 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, HIGHLIGHT_COLOR, 2)
+        return output
+
+    def encode_detections(self, detections):
+        """
+        Compact JSON-serializable form of the detections: COCO RLE masks,
+        xyxy boxes and scores, without rendering or re-encoding the image.
+        """
+        masks = detections["masks"]
+        if not torch.is_tensor(masks):
+            masks = torch.from_numpy(masks)
+        rles = rle_encode(masks.bool())
+        return [
+            {
+                "box": [round(float(v), 2) for v in box],
+                "score": round(float(score), 4),
+                "mask": rle,
+            }
+            for rle, box, score in zip(rles, detections["boxes"], detections["scores"])
+        ]
+
+    def process_image(self, image, prompt, response_format="image", include_image=False):
         """
         Process an image with SAM 3 (or simulation).
         Args:
-            image_path (str): Path to the image file.
+            image (str | bytes): Path to the image file, or the encoded image
+                bytes (e.g. an upload), which are decoded in memory.
             prompt (str): Text prompt for segmentation.
+            response_format (str): "image" to return the rendered overlay as a
+                base64 JPEG, "rle" to return the raw detections (RLE masks,
+                boxes and scores) for the client to overlay itself.
+            include_image (bool): With "rle", also return the rendered image.
         Returns:
-            dict: Result with status, message, and base64 image.
+            dict: Result with status, message, and base64 image and/or detections.
         """
         try:
-            img = cv2.imread(image_path)
+            if response_format not in ("image", "rle"):
+                return {"status": "error", "message": f"Unknown response format '{response_format}'"}
+
+            if isinstance(image, (bytes, bytearray, memoryview)):
+                img = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+            else:
+                img = cv2.imread(image)
             if img is None:
                 return {"status": "error", "message": "Failed to load image"}
             
-            # Create a dummy mask (center circle) to simulate "drone" detection
-            h, w = img.shape[:2]
-            mask = np.zeros((h, w), dtype=np.uint8)
-            center = (w // 2, h // 2)
-            radius = min(h, w) // 4
-            cv2.circle(mask, center, radius, 255, -1)
-            
-            # Apply cyan highlight
-            highlight = np.zeros_like(img)
-            highlight[:] = (255, 243, 0) # BGR for Neon Cyan (0, 243, 255)
-            
-            # Blend
-            alpha = 0.4
-            # Only blend where mask is present
-            mask_indices = mask > 0
-            output = img.copy()
-            output[mask_indices] = cv2.addWeighted(img[mask_indices], 1 - alpha, highlight[mask_indices], alpha, 0)
-            
-            # Draw bounding box
-            x, y, w_rect, h_rect = cv2.boundingRect(mask)
-            cv2.rectangle(output, (x, y), (x + w_rect, y + h_rect), (255, 243, 0), 2)
+            detections = self.detect(img, prompt)
             
-            # Add label
-            cv2.putText(output, f"TARGET: {prompt.upper()}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 243, 0), 2)
-
-            # Convert to base64
-            _, buffer = cv2.imencode('.jpg', output)
-            img_str = base64.b64encode(buffer).decode('utf-8')
-            
-            return {
+            num_targets = len(detections["scores"])
+            result = {
                 "status": "success",
-                "message": f"Target '{prompt}' acquired",
-                "image": f"data:image/jpeg;base64,{img_str}",
-                "confidence": 0.98
+                "message": f"Target '{prompt}' acquired" if num_targets else f"No '{prompt}' detected",
+                "confidence": float(detections["scores"].max()) if num_targets else 0.0,
+                "num_targets": num_targets
             }
+
+            if response_format == "rle":
+                result["width"] = img.shape[1]
+                result["height"] = img.shape[0]
+                result["detections"] = self.encode_detections(detections)
+
+            if response_format == "image" or include_image:
+                output = self.render_detections(img, detections, prompt)
+                # Convert to base64
+                _, buffer = cv2.imencode('.jpg', output)
+                img_str = base64.b64encode(buffer).decode('utf-8')
+                result["image"] = f"data:image/jpeg;base64,{img_str}"
+            
+            return result
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
@@ -107,53 +246,29 @@ class EidosEngine:
                 # Fallback if frame count is unknown
                 total_frames = 100 
             
-            output_path = video_path.replace("temp_", "processed_")
+            input_dir, input_name = os.path.split(video_path)
+            output_path = os.path.join(input_dir, input_name.replace("temp_", "processed_", 1))
             # Use mp4v codec
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
             out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
             
-            frame_count = 0
-            
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Simulation logic: Moving target
-                h, w = frame.shape[:2]
-                mask = np.zeros((h, w), dtype=np.uint8)
-                
-                # Animate center based on frame count to simulate movement
-                center_x = (w // 2) + int((w // 4) * np.sin(frame_count * 0.05))
-                center_y = (h // 2) + int((h // 4) * np.cos(frame_count * 0.05))
-                center = (center_x, center_y)
-                
-                radius = min(h, w) // 6
-                cv2.circle(mask, center, radius, 255, -1)
-                
-                # Apply cyan highlight
-                highlight = np.zeros_like(frame)
-                highlight[:] = (255, 243, 0) # BGR for Neon Cyan
-                
-                alpha = 0.4
-                mask_indices = mask > 0
-                frame[mask_indices] = cv2.addWeighted(frame[mask_indices], 1 - alpha, highlight[mask_indices], alpha, 0)
-                
-                # Draw bounding box
-                x, y, w_rect, h_rect = cv2.boundingRect(mask)
-                cv2.rectangle(frame, (x, y), (x + w_rect, y + h_rect), (255, 243, 0), 2)
-                cv2.putText(frame, f"TARGET: {prompt.upper()}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 243, 0), 2)
-                
-                out.write(frame)
-                
-                frame_count += 1
-                if progress_callback:
-                    # Report progress
-                    progress = min(frame_count / total_frames, 0.99)
-                    progress_callback(progress)
-                    
-            cap.release()
-            out.release()
+            # Decode, inference and encode run as overlapping pipeline stages
+            pipeline = VideoPipeline(
+                submit_fn=lambda frame, frame_idx: self.detect_async(frame, prompt, frame_idx),
+                render_fn=lambda frame, detections: self.render_detections(frame, detections, prompt),
+                queue_size=self.video_queue_size,
+                max_in_flight=self.batcher.max_batch_size if self.batcher else 1
+            )
+            try:
+                stats = pipeline.run(cap, out, total_frames, progress_callback)
+            finally:
+                cap.release()
+                out.release()
+            print(
+                f"Processed {stats['frames']} frames "
+                f"(decode {stats['decode_time']:.1f}s, inference {stats['inference_time']:.1f}s, "
+                f"encode {stats['encode_time']:.1f}s)"
+            )
             
             return {"status": "success", "output_path": output_path}
             
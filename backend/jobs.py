@@ -0,0 +1,284 @@
+import multiprocessing as mp
+import os
+import sqlite3
+import threading
+import time
+
+# Job lifecycle: queued -> processing -> completed | failed
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def get_num_video_workers():
+    """Number of video worker processes, from EIDOS_VIDEO_WORKERS (1 by default)."""
+    return int(os.environ.get("EIDOS_VIDEO_WORKERS", "1"))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    prompt TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobStore:
+    """
+    Video job state persisted in a local SQLite database.
+
+    Every method opens its own short-lived connection, so a store can be shared
+    by the web workers and the video worker processes (each process builds its
+    own JobStore on the same path).
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+
+    def create(self, job_id, input_path, prompt):
+        self._execute(
+            "INSERT INTO jobs (id, status, prompt, input_path, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, QUEUED, prompt, os.path.abspath(input_path), time.time()),
+        )
+
+    def claim_next(self, worker):
+        """Atomically move the oldest queued job to `processing` and return it (or None)."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, started_at = ? WHERE id = ?",
+                (PROCESSING, worker, time.time(), row["id"]),
+            )
+            conn.execute("COMMIT")
+            return dict(row)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def set_progress(self, job_id, progress):
+        self._execute("UPDATE jobs SET progress = ? WHERE id = ?", (progress, job_id))
+
+    def complete(self, job_id, result):
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, progress = 100, finished_at = ? WHERE id = ?",
+            (COMPLETED, result, time.time(), job_id),
+        )
+
+    def fail(self, job_id, error):
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (FAILED, error, time.time(), job_id),
+        )
+
+    def fail_worker_jobs(self, worker, error):
+        """Fail the jobs a crashed worker was processing."""
+        return self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE worker = ? AND status = ?",
+            (FAILED, error, time.time(), worker, PROCESSING),
+        )
+
+    def requeue_interrupted(self):
+        """Put jobs left in `processing` by a previous run back in the queue."""
+        return self._execute(
+            "UPDATE jobs SET status = ?, progress = 0, worker = NULL, started_at = NULL WHERE status = ?",
+            (QUEUED, PROCESSING),
+        )
+
+    def get(self, job_id):
+        """Job state as returned by /status, including queue wait and run time in seconds."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = {"status": row["status"], "progress": row["progress"]}
+        if row["status"] == COMPLETED:
+            job["result"] = row["result"]
+        if row["status"] == FAILED:
+            job["error"] = row["error"]
+        now = time.time()
+        job["queue_time"] = (row["started_at"] or now) - row["created_at"]
+        if row["started_at"] is not None:
+            job["run_time"] = (row["finished_at"] or now) - row["started_at"]
+        return job
+
+    def stats(self):
+        """Queue depth and job timings, to size the worker pool."""
+        conn = self._connect()
+        try:
+            counts = {
+                row["status"]: row["n"]
+                for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+            }
+            timings = conn.execute(
+                "SELECT AVG(started_at - created_at) AS queue_time, AVG(finished_at - started_at) AS run_time "
+                "FROM jobs WHERE status = ?",
+                (COMPLETED,),
+            ).fetchone()
+            oldest = conn.execute(
+                "SELECT MIN(created_at) AS t FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return {
+            "queue_depth": counts.get(QUEUED, 0),
+            "processing": counts.get(PROCESSING, 0),
+            "completed": counts.get(COMPLETED, 0),
+            "failed": counts.get(FAILED, 0),
+            "oldest_queued_age": time.time() - oldest["t"] if oldest["t"] else 0.0,
+            "avg_queue_time": timings["queue_time"] or 0.0,
+            "avg_run_time": timings["run_time"] or 0.0,
+        }
+
+
+def _worker_main(db_path, worker, stop_event, poll_interval, engine_kwargs):
+    """Video worker process: holds a warm EidosEngine and drains the job queue."""
+    from engine import EidosEngine
+
+    store = JobStore(db_path)
+    engine = EidosEngine(**engine_kwargs)
+    print(f"[{worker}] Ready.")
+
+    while not stop_event.is_set():
+        job = store.claim_next(worker)
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+
+        job_id = job["id"]
+        last_progress = [-1]
+
+        def update_progress(p):
+            # Only hit the database when the displayed percentage changes
+            progress = int(p * 100)
+            if progress != last_progress[0]:
+                last_progress[0] = progress
+                store.set_progress(job_id, progress)
+
+        try:
+            result = engine.process_video(job["input_path"], job["prompt"], update_progress)
+            if result["status"] == "success":
+                store.complete(job_id, result["output_path"])
+            else:
+                store.fail(job_id, result["message"])
+        except Exception as e:
+            store.fail(job_id, str(e))
+        finally:
+            # The upload is no longer needed once the output has been written
+            if os.path.exists(job["input_path"]):
+                os.remove(job["input_path"])
+
+
+class WorkerPool:
+    """
+    Pool of video worker processes sharing a JobStore.
+
+    Each worker loads its own EidosEngine once and then polls the store for
+    queued jobs. A monitor thread restarts workers that die and fails the job
+    they were holding.
+    """
+
+    def __init__(self, db_path, num_workers=1, poll_interval=0.5, engine_kwargs=None):
+        self.db_path = os.path.abspath(db_path)
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.engine_kwargs = engine_kwargs or {}
+        # spawn (not fork) so that each worker initializes CUDA on its own
+        self._ctx = mp.get_context("spawn")
+        self._stop_event = self._ctx.Event()
+        self._processes = {}
+        self._monitor = None
+
+    def _spawn(self, worker):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.db_path, worker, self._stop_event, self.poll_interval, self.engine_kwargs),
+            name=worker,
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker] = process
+
+    def start(self):
+        requeued = JobStore(self.db_path).requeue_interrupted()
+        if requeued:
+            print(f"Re-queued {requeued} interrupted video job(s).")
+        for i in range(self.num_workers):
+            self._spawn(f"video-worker-{i}")
+        self._monitor = threading.Thread(target=self._watch, name="eidos-pool-monitor", daemon=True)
+        self._monitor.start()
+
+    def _watch(self):
+        store = JobStore(self.db_path)
+        while not self._stop_event.wait(1.0):
+            for worker, process in list(self._processes.items()):
+                if process.is_alive():
+                    continue
+                store.fail_worker_jobs(worker, f"Worker exited with code {process.exitcode}")
+                print(f"{worker} exited with code {process.exitcode}, restarting.")
+                self._spawn(worker)
+
+    def alive(self):
+        return sum(process.is_alive() for process in self._processes.values())
+
+    def stop(self, timeout=10.0):
+        self._stop_event.set()
+        if self._monitor is not None:
+            self._monitor.join()
+        for process in self._processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+if __name__ == "__main__":
+    # Standalone pool, for deployments that run several uvicorn workers with
+    # EIDOS_VIDEO_WORKERS=0 and a single dedicated job runner (started with
+    # EIDOS_VIDEO_WORKERS set to the number of worker processes).
+    pool = WorkerPool(
+        os.environ.get("EIDOS_JOB_DB", "eidos_jobs.db"),
+        num_workers=get_num_video_workers(),
+    )
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -1,12 +1,20 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import uvicorn
 import os
 import shutil
+import tempfile
 import uuid
 from engine import EidosEngine
+from jobs import JobStore, WorkerPool, COMPLETED, get_num_video_workers
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 app = FastAPI(title="E.I.D.O.S. Neural Bridge", version="1.0.0")
 
@@ -22,13 +30,31 @@ app.add_middleware(
 # Initialize Engine (Global Singleton)
 # We initialize it lazily or on startup to avoid blocking import times during dev
 engine = None
-jobs = {} # Store job status: {job_id: {"status": "processing", "progress": 0, "result": None}}
+
+# Video jobs are persisted in SQLite and run by a pool of worker processes,
+# each holding its own warm engine. With several uvicorn workers, set
+# EIDOS_VIDEO_WORKERS=0 and run `python backend/jobs.py` once instead.
+job_store = JobStore(os.environ.get("EIDOS_JOB_DB", "eidos_jobs.db"))
+worker_pool = None
+
+UPLOAD_DIR = os.environ.get("EIDOS_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "eidos_uploads"))
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+COPY_BUFFER_SIZE = 1024 * 1024
 
 @app.on_event("startup")
 async def startup_event():
-    global engine
+    global engine, worker_pool
     print("Igniting E.I.D.O.S. Engine...")
     engine = EidosEngine()
+    num_video_workers = get_num_video_workers()
+    if num_video_workers > 0:
+        worker_pool = WorkerPool(job_store.path, num_workers=num_video_workers)
+        worker_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if worker_pool:
+        worker_pool.stop()
 
 @app.get("/")
 async def root():
@@ -38,48 +64,50 @@ async def root():
         "model_loaded": engine.ready if engine else False
     }
 
+@app.get("/stats")
+async def get_engine_stats():
+    if not engine:
+        raise HTTPException(status_code=503, detail="Engine not initialized")
+    return engine.stats()
+
 @app.post("/analyze")
 async def analyze_image(
     file: UploadFile = File(...),
-    prompt: str = Form(...)
+    prompt: str = Form(...),
+    format: str = Form("image"),
+    include_image: bool = Form(False)
 ):
+    """
+    Response formats:
+      - "image": rendered overlay as a base64 JPEG data URL (default).
+      - "rle": COCO RLE masks, boxes and scores as JSON; the rendered image is
+        only added with include_image=true.
+      - "msgpack": same payload as "rle", msgpack-encoded (requires msgpack).
+    """
     if not engine:
         raise HTTPException(status_code=503, detail="Engine not initialized")
+    if format not in ("image", "rle", "msgpack"):
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'")
+    if format == "msgpack" and msgpack is None:
+        raise HTTPException(status_code=400, detail="msgpack format requires the msgpack package")
     
-    # Save temp file
-    temp_path = f"temp_{file.filename}"
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    try:
-        # Process with SAM 3
-        result = engine.process_image(temp_path, prompt)
-        return result
-    finally:
-        # Cleanup
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-
-def process_video_task(job_id: str, file_path: str, prompt: str):
-    def update_progress(p):
-        jobs[job_id]["progress"] = int(p * 100)
-    
-    try:
-        result = engine.process_video(file_path, prompt, update_progress)
-        if result["status"] == "success":
-            jobs[job_id]["status"] = "completed"
-            jobs[job_id]["result"] = result["output_path"]
-            jobs[job_id]["progress"] = 100
-        else:
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = result["message"]
-    except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
+    # Decode the upload straight from memory, no temp file round trip
+    data = await file.read()
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+    # Process with SAM 3 off the event loop, so that concurrent requests
+    # can be coalesced into one batch by the engine
+    response_format = "image" if format == "image" else "rle"
+    result = await run_in_threadpool(
+        engine.process_image, data, prompt, response_format, include_image
+    )
+    if format == "msgpack":
+        return Response(content=msgpack.packb(result), media_type="application/msgpack")
+    return result
 
 @app.post("/analyze_video")
 async def analyze_video(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     prompt: str = Form(...)
 ):
@@ -87,27 +115,38 @@ async def analyze_video(
         raise HTTPException(status_code=503, detail="Engine not initialized")
     
     job_id = str(uuid.uuid4())
-    temp_path = f"temp_{job_id}_{file.filename}"
-    
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # The workers decode from a file path, so the upload (already spooled by
+    # starlette) is streamed into a uniquely named file in the upload dir
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    with tempfile.NamedTemporaryFile(
+        prefix=f"temp_{job_id}_", suffix=suffix, dir=UPLOAD_DIR, delete=False
+    ) as buffer:
+        await run_in_threadpool(shutil.copyfileobj, file.file, buffer, COPY_BUFFER_SIZE)
+        temp_path = buffer.name
     
-    jobs[job_id] = {"status": "processing", "progress": 0}
-    background_tasks.add_task(process_video_task, job_id, temp_path, prompt)
+    job_store.create(job_id, temp_path, prompt)
     
     return {"job_id": job_id, "status": "started"}
 
 @app.get("/status/{job_id}")
 async def get_status(job_id: str):
-    if job_id not in jobs:
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    return jobs[job_id]
+    return job
 
 @app.get("/result/{job_id}")
 async def get_result(job_id: str):
-    if job_id not in jobs or jobs[job_id]["status"] != "completed":
+    job = job_store.get(job_id)
+    if job is None or job["status"] != COMPLETED:
         raise HTTPException(status_code=400, detail="Result not ready")
-    return FileResponse(jobs[job_id]["result"], media_type="video/mp4")
+    return FileResponse(job["result"], media_type="video/mp4")
+
+@app.get("/jobs/stats")
+async def get_job_stats():
+    stats = job_store.stats()
+    stats["workers_alive"] = worker_pool.alive() if worker_pool else 0
+    return stats
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
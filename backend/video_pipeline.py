@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+from collections import deque
+
+_EOS = object() # End-of-stream marker passed between stages
+
+
+def _put(q, item, stop_event):
+    """Blocking put that gives up once the pipeline is stopped."""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop_event):
+    """Blocking get that returns the end-of-stream marker once the pipeline is stopped."""
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _EOS
+
+
+class VideoPipeline:
+    """
+    Three-stage streaming video pipeline: decode -> inference -> encode.
+
+    Decoding (cv2.VideoCapture) and encoding (cv2.VideoWriter) each run on their
+    own thread and talk to the inference stage through bounded queues, so the
+    CPU-bound codec work overlaps with model work while memory stays bounded:
+    a slow stage blocks the stages feeding it (backpressure).
+
+    The inference stage runs on the calling thread. It hands frames to
+    `submit_fn(frame, frame_idx)`, which must return a Future of the detections,
+    and keeps up to `max_in_flight` frames outstanding so that an asynchronous
+    backend (e.g. the engine's MicroBatcher) can batch consecutive frames.
+    Finished frames are rendered with `render_fn(frame, detections)` and encoded
+    in order.
+    """
+
+    def __init__(self, submit_fn, render_fn, queue_size=8, max_in_flight=4):
+        self.submit_fn = submit_fn
+        self.render_fn = render_fn
+        self.queue_size = max(1, int(queue_size))
+        self.max_in_flight = max(1, int(max_in_flight))
+
+    def run(self, cap, writer, total_frames, progress_callback=None):
+        """
+        Stream every frame of `cap` through the pipeline into `writer`.
+        Args:
+            cap (cv2.VideoCapture): Opened input video.
+            writer (cv2.VideoWriter): Opened output video.
+            total_frames (int): Expected number of frames, used for progress.
+            progress_callback (func): Function to call with progress (0.0 to 1.0)
+                after each encoded frame.
+        Returns:
+            dict: Number of frames and busy time (seconds) spent in each stage.
+        """
+        stop_event = threading.Event()
+        errors = []
+        stats = {"frames": 0, "decode_time": 0.0, "inference_time": 0.0, "encode_time": 0.0}
+        decoded = queue.Queue(maxsize=self.queue_size)
+        rendered = queue.Queue(maxsize=self.queue_size)
+
+        def fail(e):
+            errors.append(e)
+            stop_event.set()
+
+        def decode():
+            try:
+                frame_idx = 0
+                while not stop_event.is_set():
+                    t0 = time.perf_counter()
+                    ret, frame = cap.read()
+                    stats["decode_time"] += time.perf_counter() - t0
+                    if not ret:
+                        break
+                    if not _put(decoded, (frame_idx, frame), stop_event):
+                        return
+                    frame_idx += 1
+                _put(decoded, _EOS, stop_event)
+            except Exception as e:
+                fail(e)
+
+        def encode():
+            try:
+                while True:
+                    item = _get(rendered, stop_event)
+                    if item is _EOS:
+                        break
+                    _, frame = item
+                    t0 = time.perf_counter()
+                    writer.write(frame)
+                    stats["encode_time"] += time.perf_counter() - t0
+                    stats["frames"] += 1
+                    if progress_callback:
+                        # Report progress
+                        progress_callback(min(stats["frames"] / total_frames, 0.99))
+            except Exception as e:
+                fail(e)
+
+        decoder = threading.Thread(target=decode, name="eidos-decode", daemon=True)
+        encoder = threading.Thread(target=encode, name="eidos-encode", daemon=True)
+        decoder.start()
+        encoder.start()
+
+        in_flight = deque()
+
+        def flush_oldest():
+            frame_idx, frame, future = in_flight.popleft()
+            t0 = time.perf_counter()
+            output = self.render_fn(frame, future.result())
+            stats["inference_time"] += time.perf_counter() - t0
+            _put(rendered, (frame_idx, output), stop_event)
+
+        try:
+            while True:
+                item = _get(decoded, stop_event)
+                if item is _EOS:
+                    break
+                frame_idx, frame = item
+                in_flight.append((frame_idx, frame, self.submit_fn(frame, frame_idx)))
+                if len(in_flight) >= self.max_in_flight:
+                    flush_oldest()
+            while in_flight and not stop_event.is_set():
+                flush_oldest()
+            _put(rendered, _EOS, stop_event)
+        except Exception as e:
+            fail(e)
+        finally:
+            encoder.join()
+            stop_event.set()
+            decoder.join()
+
+        if errors:
+            raise errors[0]
+        return stats
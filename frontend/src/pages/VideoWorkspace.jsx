@@ -10,6 +10,7 @@ const VideoWorkspace = () => {
     const fileInputRef = useRef(null);
     const [isTargetLocked, setIsTargetLocked] = useState(false);
     const [isProcessing, setIsProcessing] = useState(false);
+    const [isQueued, setIsQueued] = useState(false); // video job waiting for a worker
     const [mediaType, setMediaType] = useState('image'); // 'image' or 'video'
     const [showTelemetry, setShowTelemetry] = useState(true);
 
@@ -32,15 +33,18 @@ const VideoWorkspace = () => {
                 const res = await fetch(`http://localhost:8000/status/${jobId}`);
                 const data = await res.json();
 
-                if (data.status === 'processing') {
+                if (data.status === 'queued' || data.status === 'processing') {
+                    setIsQueued(data.status === 'queued');
                     setProgress(data.progress);
                 } else if (data.status === 'completed') {
                     clearInterval(interval);
+                    setIsQueued(false);
                     setProgress(100);
                     setProcessedVideo(`http://localhost:8000/result/${jobId}`);
                     setIsProcessing(false);
                 } else if (data.status === 'failed') {
                     clearInterval(interval);
+                    setIsQueued(false);
                     setIsProcessing(false);
                     console.error("Job failed:", data.error);
                     alert(`Analysis failed: ${data.error}`);
@@ -48,6 +52,7 @@ const VideoWorkspace = () => {
             } catch (e) {
                 console.error("Polling error:", e);
                 clearInterval(interval);
+                setIsQueued(false);
                 setIsProcessing(false);
             }
         }, 1000);
@@ -214,7 +219,7 @@ const VideoWorkspace = () => {
                                     <div className="absolute inset-0 flex items-center justify-center bg-black/50 backdrop-blur-sm z-20">
                                         <div className="flex flex-col items-center gap-4 w-64">
                                             <div className="flex items-center justify-between w-full text-neon font-mono text-xs mb-1">
-                                                <span>ANALYZING TARGET...</span>
+                                                <span>{isQueued ? 'QUEUED...' : 'ANALYZING TARGET...'}</span>
                                                 <span>{progress}%</span>
                                             </div>
                                             <div className="w-full h-2 bg-gray-800 border border-gray-600">
@@ -4,6 +4,7 @@ from typing import Dict, List
 
 import numpy as np
 import torch
+from sam3.perflib.rle import rle_decode
 
 try:
     from pycocotools import mask as mask_utils
@@ -63,6 +64,9 @@ def _decode_single_mask(mask_repr, h: int, w: int) -> np.ndarray:
 
 
 def _decode_masks_to_torch_bool(pred_masks: List, h: int, w: int) -> torch.Tensor:
+    if all(isinstance(m, (str, bytes)) for m in pred_masks):
+        # decode all the RLE strings at once
+        return torch.from_numpy(rle_decode(pred_masks, h, w))
     bin_masks = [_decode_single_mask(m, h, w) for m in pred_masks]
     masks_np = np.stack(bin_masks, axis=0).astype(np.uint8)  # (N, H, W)
     return torch.from_numpy(masks_np > 0)
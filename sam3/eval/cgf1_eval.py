@@ -13,6 +13,8 @@ import numpy as np
 import pycocotools.mask as maskUtils
 from pycocotools.coco import COCO
 from pycocotools.cocoeval import COCOeval
+from sam3.eval.prediction_store import is_prediction_store, PredictionStore
+from sam3.eval.sharded_eval import map_shards
 from scipy.optimize import linear_sum_assignment
 from tqdm import tqdm
 
@@ -112,7 +114,11 @@ class COCOCustom(COCO):
 
         print("Loading and preparing results...")
         tic = time.time()
-        if type(resFile) == str:
+        if isinstance(resFile, PredictionStore):
+            anns = resFile.to_anns()
+        elif type(resFile) == str and is_prediction_store(resFile):
+            anns = PredictionStore(resFile).to_anns()
+        elif type(resFile) == str:
             with open(resFile) as f:
                 anns = json.load(f)
         elif type(resFile) == np.ndarray:
@@ -547,12 +553,14 @@ class CGF1Evaluator:
         gt_path: Union[str, List[str]],
         iou_type="segm",
         verbose=False,
+        num_workers=0,
     ):
         """
         Args:
             gt_path (str or list of str): path(s) to ground truth COCO json file(s)
             iou_type (str): type of IoU to evaluate
             threshold (float): threshold for predictions
+            num_workers (int): if > 1, the images are evaluated in that many forked processes
         """
         self.gt_paths = gt_path if isinstance(gt_path, list) else [gt_path]
         self.iou_type = iou_type
@@ -560,6 +568,7 @@ class CGF1Evaluator:
         self.coco_gts = [COCOCustom(gt) for gt in self.gt_paths]
 
         self.verbose = verbose
+        self.num_workers = num_workers
 
         self.coco_evals = []
         for i, coco_gt in enumerate(self.coco_gts):
@@ -604,35 +613,35 @@ class CGF1Evaluator:
         if self.verbose:
             print(f"Loading predictions from {pred_file}")
 
-        with open(pred_file, "r") as f:
-            preds = json.load(f)
+        if is_prediction_store(pred_file):
+            # the predictions of each image are read from the memory-mapped store
+            store = PredictionStore(pred_file)
+            num_preds = len(store)
+            get_img_preds = store.get_anns
+        else:
+            with open(pred_file, "r") as f:
+                preds = json.load(f)
+            num_preds = len(preds)
+            img2preds = defaultdict(list)
+            for pred in preds:
+                img2preds[pred["image_id"]].append(pred)
+            get_img_preds = img2preds.__getitem__
 
         if self.verbose:
-            print(f"Loaded {len(preds)} predictions")
-
-        img2preds = defaultdict(list)
-        for pred in preds:
-            img2preds[pred["image_id"]].append(pred)
-
-        all_eval_imgs = []
-        for img_id in tqdm(self.eval_img_ids, disable=not self.verbose):
-            results = img2preds[img_id]
-            all_scorings = []
-            for cur_coco_gt, coco_eval in zip(self.coco_gts, self.coco_evals):
-                # suppress pycocotools prints
-                with open(os.devnull, "w") as devnull:
-                    with contextlib.redirect_stdout(devnull):
-                        coco_dt = (
-                            cur_coco_gt.loadRes(results) if results else COCOCustom()
-                        )
-
-                coco_eval.cocoDt = coco_dt
-                coco_eval.params.imgIds = [img_id]
-                coco_eval.params.useCats = False
-                img_ids, eval_imgs = _evaluate(coco_eval)
-                all_scorings.append(eval_imgs)
-            selected = self._select_best_scoring(all_scorings)
-            all_eval_imgs.append(selected)
+            print(f"Loaded {num_preds} predictions")
+
+        def evaluate_img_ids(img_ids):
+            eval_imgs = []
+            # the progress is only shown when evaluating in a single process
+            show_progress = self.verbose and self.num_workers <= 1
+            for img_id in tqdm(img_ids, disable=not show_progress):
+                eval_imgs.append(self._evaluate_img(img_id, get_img_preds(img_id)))
+            return eval_imgs
+
+        # the images are evaluated independently, possibly in several processes
+        all_eval_imgs = map_shards(
+            evaluate_img_ids, self.eval_img_ids, self.num_workers
+        )
 
         # After this point, we have selected the best scoring per image among several ground truths
         # we can now accumulate and summarize, using only the first coco_eval
@@ -659,6 +668,23 @@ class CGF1Evaluator:
 
         return out
 
+    def _evaluate_img(self, img_id, results):
+        """Evaluate the predictions `results` of an image against each of the GTs, and
+        select the best scoring."""
+        all_scorings = []
+        for cur_coco_gt, coco_eval in zip(self.coco_gts, self.coco_evals):
+            # suppress pycocotools prints
+            with open(os.devnull, "w") as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    coco_dt = cur_coco_gt.loadRes(results) if results else COCOCustom()
+
+            coco_eval.cocoDt = coco_dt
+            coco_eval.params.imgIds = [img_id]
+            coco_eval.params.useCats = False
+            img_ids, eval_imgs = _evaluate(coco_eval)
+            all_scorings.append(eval_imgs)
+        return self._select_best_scoring(all_scorings)
+
     @staticmethod
     def _select_best_scoring(scorings):
         # This function is used for "oracle" type evaluation.
@@ -8,12 +8,17 @@ In general, since the number of classes can be big, and the API model makes pred
 we may need to split the inference process for a given image in several chunks.
 """
 
+import contextlib
+import copy
 import logging
+import os
 from collections import defaultdict
 
+import numpy as np
 import torch
 from pycocotools.coco import COCO
 from pycocotools.cocoeval import COCOeval
+from sam3.eval.prediction_store import is_prediction_store, PredictionStore
 from sam3.train.utils.distributed import is_main_process
 
 try:
@@ -131,11 +136,14 @@ class CocoEvaluatorOfflineWithPredFileEvaluators:
         tide: bool = True,
         iou_type: str = "bbox",
         positive_split=False,
+        store_chunk_size: int = 1000,
     ):
         self.gt_path = gt_path
         self.tide_enabled = HAS_TIDE and tide
         self.positive_split = positive_split
         self.iou_type = iou_type
+        # number of images whose predictions are loaded at once from a prediction store
+        self.store_chunk_size = store_chunk_size
 
     def evaluate(self, dumped_file):
         if not is_main_process():
@@ -144,16 +152,24 @@ class CocoEvaluatorOfflineWithPredFileEvaluators:
         logging.info("OfflineCoco evaluator: Loading groundtruth")
         self.gt = COCO(self.gt_path)
 
-        # Creating the result file
-        logging.info("Coco evaluator: Creating the result file")
-        cocoDt = self.gt.loadRes(str(dumped_file))
-
-        # Run the evaluation
-        logging.info("Coco evaluator: Running evaluation")
-        coco_eval = COCOevalCustom(
-            self.gt, cocoDt, iouType=self.iou_type, dt_only_positive=self.positive_split
-        )
-        coco_eval.evaluate()
+        is_store = is_prediction_store(dumped_file)
+        if is_store:
+            logging.info("Coco evaluator: Running evaluation on the prediction store")
+            coco_eval = self._evaluate_store(PredictionStore(dumped_file))
+        else:
+            # Creating the result file
+            logging.info("Coco evaluator: Creating the result file")
+            cocoDt = self.gt.loadRes(str(dumped_file))
+
+            # Run the evaluation
+            logging.info("Coco evaluator: Running evaluation")
+            coco_eval = COCOevalCustom(
+                self.gt,
+                cocoDt,
+                iouType=self.iou_type,
+                dt_only_positive=self.positive_split,
+            )
+            coco_eval.evaluate()
         coco_eval.accumulate()
         coco_eval.summarize()
 
@@ -161,7 +177,9 @@ class CocoEvaluatorOfflineWithPredFileEvaluators:
         for i, value in enumerate(coco_eval.stats):
             outs[f"coco_eval_{self.iou_type}_{COCO_METRICS[i]}"] = value
 
-        if self.tide_enabled:
+        if self.tide_enabled and is_store:
+            logging.warning("TIDE only supports JSON prediction files, skipping it")
+        elif self.tide_enabled:
             logging.info("Coco evaluator: Loading TIDE")
             self.tide_gt = datasets.COCO(self.gt_path)
             self.tide = TIDE(mode="mask" if self.iou_type == "segm" else "bbox")
@@ -179,3 +197,38 @@ class CocoEvaluatorOfflineWithPredFileEvaluators:
                 outs[f"coco_eval_{self.iou_type}_TIDE_{k}"] = v
 
         return outs
+
+    def _evaluate_store(self, store):
+        """
+        Same as `evaluate` of COCOevalCustom on all the predictions of a prediction store,
+        but only the predictions of `store_chunk_size` images are loaded at a time. The
+        per-image results of the chunks are concatenated in the order expected by
+        `accumulate` (category, area range, image).
+        """
+        coco_eval = COCOevalCustom(
+            self.gt, COCO(), iouType=self.iou_type, dt_only_positive=self.positive_split
+        )
+        p = coco_eval.params
+        img_ids = list(np.unique(p.imgIds))
+        num_cats = len(np.unique(p.catIds)) if p.useCats else 1
+        num_areas = len(p.areaRng)
+        eval_imgs = []
+        for start in range(0, len(img_ids), self.store_chunk_size):
+            chunk_img_ids = img_ids[start : start + self.store_chunk_size]
+            anns = [ann for img_id in chunk_img_ids for ann in store.get_anns(img_id)]
+            # suppress pycocotools prints
+            with open(os.devnull, "w") as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    coco_eval.cocoDt = self.gt.loadRes(anns) if anns else COCO()
+                    p.imgIds = chunk_img_ids
+                    coco_eval.evaluate()
+            eval_imgs.append(
+                np.array(coco_eval.evalImgs, dtype=object).reshape(
+                    num_cats, num_areas, len(chunk_img_ids)
+                )
+            )
+        p.imgIds = img_ids
+        coco_eval._paramsEval = copy.deepcopy(p)
+        coco_eval.evalImgs = list(np.concatenate(eval_imgs, axis=2).flatten())
+        coco_eval.ious = {}
+        return coco_eval
@@ -10,8 +10,8 @@ Supports distributed processing with multiple GPUs/processes.
 import copy
 import gc
 import heapq
-import json
 import logging
+import operator
 import os
 from collections import defaultdict
 from pathlib import Path
@@ -21,11 +21,24 @@ import pycocotools.mask as mask_utils
 import torch
 from iopath.common.file_io import g_pathmgr
 from sam3.eval.coco_eval_offline import convert_to_xywh
+from sam3.eval.prediction_store import (
+    check_store_path,
+    PREDICTION_STORE_SUFFIX,
+    write_prediction_store,
+)
+from sam3.eval.streaming_dump import (
+    merge_shards,
+    remove_shard,
+    ShardWriter,
+    write_json_list,
+)
 from sam3.train.masks_ops import rle_encode
 from sam3.train.utils.distributed import (
     all_gather,
+    barrier,
     gather_to_rank_0_via_filesys,
     get_rank,
+    get_world_size,
     is_main_process,
 )
 
@@ -60,6 +73,9 @@ class PredictionDumper:
         gather_pred_via_filesys: bool = False,
         merge_predictions: bool = False,
         pred_file_evaluators: Optional[Any] = None,
+        dump_format: str = "json",
+        stream_to_disk: bool = False,
+        stream_buffer_size: int = 10000,
     ):
         """
         Initialize the PredictionDumper.
@@ -72,6 +88,16 @@ class PredictionDumper:
             gather_pred_via_filesys: If True, use the filesystem for collective gathers across
                 processes (requires a shared filesystem). Otherwise, use torch collective ops.
             merge_predictions: If True, merge predictions from all processes and dump to a single file.
+            dump_format: "json" to dump the predictions to a JSON file, or "columnar" to dump
+                them to a memory-mappable prediction store (see `sam3.eval.prediction_store`).
+                Unlike JSON dumps, which are written through iopath, prediction stores
+                require dump_dir to be on a local (or mounted) filesystem.
+            stream_to_disk: If True, each process appends its predictions to a shard file in
+                dump_dir during `update` (which must be on a filesystem shared by all the
+                processes), and the shards are merged image by image by the main process
+                instead of being gathered in memory (see `sam3.eval.streaming_dump`).
+            stream_buffer_size: Number of predictions buffered before being written to the
+                shard file when stream_to_disk is True.
         """
         self.iou_type = iou_type
         self.maxdets = maxdets
@@ -80,6 +106,16 @@ class PredictionDumper:
         self.gather_pred_via_filesys = gather_pred_via_filesys
         self.merge_predictions = merge_predictions
         self.pred_file_evaluators = pred_file_evaluators
+        assert dump_format in ("json", "columnar"), f"Unknown dump format {dump_format}"
+        self.dump_format = dump_format
+        if dump_format == "columnar":
+            check_store_path(dump_dir)
+        self.stream_to_disk = stream_to_disk
+        self.stream_buffer_size = stream_buffer_size
+        # the shard files of each synchronization round have different names, so that
+        # a process never overwrites shards that are still being merged
+        self._sync_round = 0
+        self._shard_writer = None
         if self.pred_file_evaluators is not None:
             assert (
                 merge_predictions
@@ -116,7 +152,10 @@ class PredictionDumper:
             if "bbox" in r:
                 r["bbox"] = [round(coord, 5) for coord in r["bbox"]]
             r["score"] = round(r["score"], 5)
-        self.dump.extend(dumped_results)
+        if self.stream_to_disk:
+            self._get_shard_writer().append(dumped_results)
+        else:
+            self.dump.extend(dumped_results)
 
     def synchronize_between_processes(self):
         """
@@ -124,33 +163,133 @@ class PredictionDumper:
 
         If gather_pred_via_filesys is True, uses filesystem for gathering.
         Otherwise, uses torch distributed collective operations.
-        Saves per-rank predictions to separate JSON files.
+        Saves per-rank predictions to separate files (JSON files or prediction stores).
         """
         logging.info("Prediction Dumper: Synchronizing between processes")
 
-        if not self.merge_predictions:
+        suffix = PREDICTION_STORE_SUFFIX if self.dump_format == "columnar" else ".json"
+        if self.stream_to_disk:
+            dumped_file = self._merge_shards(suffix)
+        elif not self.merge_predictions:
             dumped_file = (
                 Path(self.dump_dir)
-                / f"coco_predictions_{self.iou_type}_{get_rank()}.json"
+                / f"coco_predictions_{self.iou_type}_{get_rank()}{suffix}"
             )
             logging.info(
                 f"Prediction Dumper: Dumping local predictions to {dumped_file}"
             )
-            with g_pathmgr.open(str(dumped_file), "w") as f:
-                json.dump(self.dump, f)
+            self._write(dumped_file)
         else:
             self.dump = self.gather_and_merge_predictions()
-            dumped_file = Path(self.dump_dir) / f"coco_predictions_{self.iou_type}.json"
+            dumped_file = (
+                Path(self.dump_dir) / f"coco_predictions_{self.iou_type}{suffix}"
+            )
             if is_main_process():
                 logging.info(
                     f"Prediction Dumper: Dumping merged predictions to {dumped_file}"
                 )
-                with g_pathmgr.open(str(dumped_file), "w") as f:
-                    json.dump(self.dump, f)
+                self._write(dumped_file)
 
         self.reset()
         return dumped_file
 
+    def _write(self, dumped_file, preds=None):
+        """Write the predictions (`self.dump` by default, or an iterator)."""
+        preds = self.dump if preds is None else preds
+        if self.dump_format == "columnar":
+            write_prediction_store(dumped_file, list(preds))
+        else:
+            with g_pathmgr.open(str(dumped_file), "w") as f:
+                write_json_list(f, preds)
+
+    def _shard_path(self, rank):
+        return str(
+            Path(self.dump_dir)
+            / ".shards"
+            / f"coco_predictions_{self.iou_type}_{self._sync_round}_{rank}.bin"
+        )
+
+    def _get_shard_writer(self):
+        # opened lazily, so that no empty shard is left after the last round
+        if self._shard_writer is None:
+            self._shard_writer = ShardWriter(
+                self._shard_path(get_rank()),
+                key_fn=operator.itemgetter("image_id"),
+                buffer_size=self.stream_buffer_size,
+            )
+        return self._shard_writer
+
+    def _merge_shards(self, suffix):
+        """Merge the shard files written by the processes (see `stream_to_disk`)."""
+        # every process writes its shard, even if empty, as they are all merged
+        self._get_shard_writer().close()
+        self._shard_writer = None
+        rank = get_rank()
+        if not self.merge_predictions:
+            dumped_file = (
+                Path(self.dump_dir) / f"coco_predictions_{self.iou_type}_{rank}{suffix}"
+            )
+            logging.info(
+                f"Prediction Dumper: Dumping local predictions to {dumped_file}"
+            )
+            shard_paths = [self._shard_path(rank)]
+            preds = (
+                p
+                for _, shard_preds in merge_shards(shard_paths)
+                for _, preds in shard_preds
+                for p in preds
+            )
+            self._write(dumped_file, preds)
+        else:
+            # wait for all the processes to finish writing their shards
+            barrier()
+            dumped_file = (
+                Path(self.dump_dir) / f"coco_predictions_{self.iou_type}{suffix}"
+            )
+            shard_paths = [self._shard_path(r) for r in range(get_world_size())]
+            if is_main_process():
+                logging.info(
+                    f"Prediction Dumper: Merging and dumping predictions to {dumped_file}"
+                )
+                preds = (
+                    p
+                    for _, shard_preds in merge_shards(shard_paths)
+                    for p in self._select_top_preds(shard_preds)
+                )
+                self._write(dumped_file, preds)
+            else:
+                # the shards of the other processes are removed by the main process
+                shard_paths = []
+        for shard_path in shard_paths:
+            remove_shard(shard_path)
+        self._sync_round += 1
+        return dumped_file
+
+    def _select_top_preds(self, shard_preds):
+        """
+        Same as `gather_and_merge_predictions`, but for the predictions of a single image,
+        given as the (rank, preds) lists of each process.
+        """
+        top_preds = []
+        seen_cats = set()
+        cur_rank, cur_seen_cats = None, set()
+        for rank, preds in shard_preds:
+            if rank != cur_rank:
+                seen_cats.update(cur_seen_cats)
+                cur_rank, cur_seen_cats = rank, set()
+            for p in preds:
+                # Skip if we've already seen this category in a previous dump
+                if p["category_id"] in seen_cats:
+                    continue
+                cur_seen_cats.add(p["category_id"])
+
+                # Use a min-heap to keep top predictions
+                if len(top_preds) < self.maxdets:
+                    heapq.heappush(top_preds, HeapElement(p))
+                else:
+                    heapq.heappushpop(top_preds, HeapElement(p))
+        return [h.val for h in top_preds]
+
     def gather_and_merge_predictions(self):
         """
         Gather predictions from all processes and merge them, keeping top predictions per image.
@@ -233,6 +372,9 @@ class PredictionDumper:
     def reset(self):
         """Reset internal state for a new evaluation round."""
         self.dump = []
+        if self._shard_writer is not None:
+            self._shard_writer.discard()
+            self._shard_writer = None
 
     def prepare(self, predictions, iou_type):
         """
@@ -192,6 +192,10 @@ class YouTubeVIS(_BaseDataset):
     def get_display_name(self, tracker):
         return self.tracker_to_disp[tracker]
 
+    def get_seq_cost(self, seq):
+        """The number of timesteps of the sequence"""
+        return self.seq_lengths[self.seq_name_to_seq_id[seq]]
+
     def _load_raw_file(self, tracker, seq, is_gt):
         """Load a file (gt or tracker) in the YouTubeVIS format
         If is_gt, this returns a dict which contains the fields:
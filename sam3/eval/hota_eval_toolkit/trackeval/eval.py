@@ -3,10 +3,9 @@
 import os
 import time
 import traceback
-from functools import partial
-from multiprocessing.pool import Pool
 
 import numpy as np
+from sam3.eval.sequence_scheduler import evaluate_sequences
 
 from . import _timing, utils
 from .metrics import Count
@@ -30,6 +29,7 @@ class Evaluator:
         default_config = {
             "USE_PARALLEL": False,
             "NUM_PARALLEL_CORES": 8,
+            "PARALLEL_START_METHOD": None,  # None for forkserver (if available)
             "BREAK_ON_ERROR": True,  # Raises exception and exits with error
             "RETURN_ON_ERROR": False,  # if not BREAK_ON_ERROR, then returns from function on error
             "LOG_ON_ERROR": os.path.join(
@@ -250,40 +250,32 @@ class Evaluator:
                     print("\nEvaluating %s\n" % tracker)
                     time_start = time.time()
                     if config["USE_PARALLEL"]:
+                        # the sequences are scheduled longest first, and the workers
+                        # only receive the sequence ids (see `sequence_scheduler`)
+                        pbar = None
                         if show_progressbar and TQDM_IMPORTED:
-                            seq_list_sorted = sorted(seq_list)
-
-                            with Pool(config["NUM_PARALLEL_CORES"]) as pool, tqdm.tqdm(
-                                total=len(seq_list)
-                            ) as pbar:
-                                _eval_sequence = partial(
-                                    eval_sequence,
-                                    dataset=dataset,
-                                    tracker=tracker,
-                                    class_list=class_list,
-                                    metrics_list=metrics_list,
-                                    metric_names=metric_names,
-                                )
-                                results = []
-                                for r in pool.imap(
-                                    _eval_sequence, seq_list_sorted, chunksize=20
-                                ):
-                                    results.append(r)
-                                    pbar.update()
-                                res = dict(zip(seq_list_sorted, results))
-
-                        else:
-                            with Pool(config["NUM_PARALLEL_CORES"]) as pool:
-                                _eval_sequence = partial(
-                                    eval_sequence,
-                                    dataset=dataset,
-                                    tracker=tracker,
-                                    class_list=class_list,
-                                    metrics_list=metrics_list,
-                                    metric_names=metric_names,
-                                )
-                                results = pool.map(_eval_sequence, seq_list)
-                                res = dict(zip(seq_list, results))
+                            seq_list = sorted(seq_list)
+                            pbar = tqdm.tqdm(total=len(seq_list))
+                        res, seq_times = evaluate_sequences(
+                            eval_sequence,
+                            seq_list,
+                            dataset,
+                            (tracker, class_list, metrics_list, metric_names),
+                            config["NUM_PARALLEL_CORES"],
+                            start_method=config["PARALLEL_START_METHOD"],
+                            progress_callback=pbar.update if pbar else None,
+                        )
+                        if pbar is not None:
+                            pbar.close()
+                        # one line per sequence, so not with DISPLAY_LESS_PROGRESS
+                        if (
+                            config["TIME_PROGRESS"]
+                            and not config["DISPLAY_LESS_PROGRESS"]
+                        ):
+                            _timing.report_times(
+                                "eval_sequence",
+                                {(tracker, seq): t for seq, t in seq_times.items()},
+                            )
                     else:
                         res = {}
                         if show_progressbar and TQDM_IMPORTED:
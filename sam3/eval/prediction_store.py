@@ -0,0 +1,205 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""
+Columnar on-disk store of COCO-format predictions, opened as memory-mapped arrays.
+
+A store is a directory with one `.npy` array per field (image_id, category_id, score,
+bbox, area, and the RLE size and counts of the segmentations), where the compressed
+RLE counts of all the predictions are concatenated in a single byte blob. The rows
+are grouped by image (keeping their order within each image), with an index from
+each image id to its range of rows, so that the predictions of an image are read
+without parsing the whole file.
+
+Compared to a JSON dump, loading a store is nearly instant and only touches the
+pages of the rows that are read, and the predictions of the images that are not
+being evaluated are never materialized as Python dicts.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+PREDICTION_STORE_SUFFIX = ".preds"
+_META_FILE = "meta.json"
+_FORMAT_VERSION = 1
+_SUPPORTED_KEYS = {"image_id", "category_id", "score", "bbox", "area", "segmentation"}
+
+
+def is_prediction_store(path) -> bool:
+    return os.path.isfile(os.path.join(str(path), _META_FILE))
+
+
+def check_store_path(path):
+    """Prediction stores are written and memory-mapped with the local file APIs (not
+    through iopath), so they must be on a local or mounted filesystem."""
+    if "://" in str(path):
+        raise ValueError(
+            f"Prediction stores must be on a local filesystem, got {path} "
+            '(use dump_format="json" for other paths)'
+        )
+
+
+def write_prediction_store(path, preds: Sequence[Dict]):
+    """
+    Write the COCO-format predictions `preds` (dicts with an integer "image_id", a
+    "category_id", a "score", and optionally a "bbox", an "area" and a compressed RLE
+    "segmentation") to a prediction store directory at `path`.
+    """
+    check_store_path(path)
+    for pred in preds:
+        unsupported = pred.keys() - _SUPPORTED_KEYS
+        if unsupported:
+            raise ValueError(f"Unsupported prediction fields: {sorted(unsupported)}")
+    num_preds = len(preds)
+    image_ids = np.array([p["image_id"] for p in preds], dtype=np.int64)
+    # group the rows by image, keeping their order within each image
+    order = np.argsort(image_ids, kind="stable")
+    preds = [preds[i] for i in order.tolist()]
+    columns = {
+        "image_id": image_ids[order],
+        "category_id": np.array([p["category_id"] for p in preds], dtype=np.int64),
+        "score": np.array([p["score"] for p in preds], dtype=np.float64),
+    }
+    fields = ["image_id", "category_id", "score"]
+    # the optional fields are stored if any prediction has them (with NaNs or empty
+    # RLEs on the other rows)
+    if any("bbox" in p for p in preds):
+        bbox = np.full((num_preds, 4), np.nan, dtype=np.float64)
+        for i, p in enumerate(preds):
+            if "bbox" in p:
+                bbox[i] = p["bbox"]
+        columns["bbox"] = bbox
+        fields.append("bbox")
+    if any("area" in p for p in preds):
+        columns["area"] = np.array(
+            [p.get("area", np.nan) for p in preds], dtype=np.float64
+        )
+        fields.append("area")
+    if any("segmentation" in p for p in preds):
+        counts = []
+        size = np.full((num_preds, 2), -1, dtype=np.int64)
+        for i, p in enumerate(preds):
+            rle = p.get("segmentation")
+            if rle is None:
+                counts.append(b"")
+                continue
+            if not isinstance(rle.get("counts"), (str, bytes)):
+                raise ValueError("Only compressed RLE segmentations can be stored")
+            c = rle["counts"]
+            counts.append(c.encode("ascii") if isinstance(c, str) else c)
+            size[i] = rle["size"]
+        lengths = np.array([len(c) for c in counts], dtype=np.int64)
+        columns["rle_size"] = size
+        columns["rle_offsets"] = np.concatenate([[0], np.cumsum(lengths)])
+        columns["rle_counts"] = np.frombuffer(b"".join(counts), dtype=np.uint8)
+        fields.append("segmentation")
+
+    # index from each image id to its range of rows
+    index_image_ids, index_starts = np.unique(columns["image_id"], return_index=True)
+    columns["index_image_ids"] = index_image_ids
+    columns["index_offsets"] = np.append(index_starts, num_preds).astype(np.int64)
+
+    # write the store to a temporary directory and then rename it, so that readers
+    # never see a partially written store
+    path = str(path)
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    try:
+        for name, column in columns.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), column)
+        meta = {"version": _FORMAT_VERSION, "num_preds": num_preds, "fields": fields}
+        with open(os.path.join(tmp_dir, _META_FILE), "w") as f:
+            json.dump(meta, f)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(tmp_dir, path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+class PredictionStore:
+    """Read-only access to a prediction store written by `write_prediction_store`."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(os.path.join(self.path, _META_FILE)) as f:
+            meta = json.load(f)
+        assert meta["version"] == _FORMAT_VERSION, f"Unsupported store {meta}"
+        self.fields = meta["fields"]
+        self.num_preds = meta["num_preds"]
+        names = ["image_id", "category_id", "score", "index_image_ids", "index_offsets"]
+        if "bbox" in self.fields:
+            names.append("bbox")
+        if "area" in self.fields:
+            names.append("area")
+        if "segmentation" in self.fields:
+            names += ["rle_size", "rle_offsets", "rle_counts"]
+        self.columns = {name: self._load_column(name) for name in names}
+
+    def _load_column(self, name: str) -> np.ndarray:
+        column_path = os.path.join(self.path, f"{name}.npy")
+        try:
+            return np.load(column_path, mmap_mode="r")
+        except ValueError:
+            # empty arrays cannot be memory-mapped
+            return np.load(column_path)
+
+    def __len__(self):
+        return self.num_preds
+
+    def get_image_ids(self) -> np.ndarray:
+        """The (sorted) ids of the images with predictions."""
+        return np.asarray(self.columns["index_image_ids"])
+
+    def _rows(self, image_id) -> slice:
+        index_image_ids = self.columns["index_image_ids"]
+        i = np.searchsorted(index_image_ids, image_id)
+        if i == len(index_image_ids) or index_image_ids[i] != image_id:
+            return slice(0, 0)
+        offsets = self.columns["index_offsets"]
+        return slice(int(offsets[i]), int(offsets[i + 1]))
+
+    def get_anns(self, image_id) -> List[Dict]:
+        """The predictions of an image, as COCO-format dicts."""
+        return self._to_anns(self._rows(image_id))
+
+    def to_anns(self) -> List[Dict]:
+        """All the predictions, as COCO-format dicts (grouped by image)."""
+        return self._to_anns(slice(0, self.num_preds))
+
+    def _to_anns(self, rows: slice) -> List[Dict]:
+        c = self.columns
+        anns = [
+            {"image_id": image_id, "category_id": category_id, "score": score}
+            for image_id, category_id, score in zip(
+                c["image_id"][rows].tolist(),
+                c["category_id"][rows].tolist(),
+                c["score"][rows].tolist(),
+            )
+        ]
+        if "bbox" in self.fields:
+            bbox = np.asarray(c["bbox"][rows])
+            has_bbox = ~np.isnan(bbox).any(axis=1)
+            for ann, box, valid in zip(anns, bbox.tolist(), has_bbox.tolist()):
+                if valid:
+                    ann["bbox"] = box
+        if "area" in self.fields:
+            for ann, area in zip(anns, c["area"][rows].tolist()):
+                if area == area:  # not NaN
+                    ann["area"] = area
+        if "segmentation" in self.fields:
+            offsets = np.asarray(c["rle_offsets"][rows.start : rows.stop + 1])
+            blob = c["rle_counts"][offsets[0] : offsets[-1]].tobytes().decode("ascii")
+            offsets = (offsets - offsets[0]).tolist()
+            sizes = c["rle_size"][rows].tolist()
+            for i, (ann, size) in enumerate(zip(anns, sizes)):
+                if size[0] >= 0:
+                    counts = blob[offsets[i] : offsets[i + 1]]
+                    ann["segmentation"] = {"size": size, "counts": counts}
+        return anns
@@ -0,0 +1,78 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""
+Parallel evaluation of the sequences of a tracking dataset (used by the HOTA and TETA
+toolkits).
+
+The dataset and the evaluation arguments are pickled once and loaded once by each
+worker process (in the pool initializer), so the tasks only carry sequence ids.
+The sequences are scheduled one at a time, longest first, so that a few long
+sequences don't end up in the same chunk or start last and leave the other workers
+idle.
+"""
+
+import multiprocessing as mp
+import pickle
+from time import perf_counter
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# (eval_fn, dataset, eval_args) loaded in each worker process
+_WORKER_STATE = None
+
+
+def _init_worker(payload: bytes):
+    global _WORKER_STATE
+    _WORKER_STATE = pickle.loads(payload)
+
+
+def _eval_seq(seq):
+    eval_fn, dataset, eval_args = _WORKER_STATE
+    start = perf_counter()
+    result = eval_fn(seq, dataset, *eval_args)
+    return seq, result, perf_counter() - start
+
+
+def get_default_start_method() -> str:
+    # forkserver workers don't inherit the state (e.g. threads or CUDA) of the parent
+    if "forkserver" in mp.get_all_start_methods():
+        return "forkserver"
+    return "spawn"
+
+
+def evaluate_sequences(
+    eval_fn: Callable,
+    seq_list: Sequence,
+    dataset,
+    eval_args: tuple,
+    num_workers: int,
+    start_method: Optional[str] = None,
+    progress_callback: Optional[Callable] = None,
+) -> Tuple[Dict, Dict]:
+    """
+    Evaluate `eval_fn(seq, dataset, *eval_args)` on each sequence of `seq_list` in a
+    pool of `num_workers` processes, where `eval_fn` is a module-level function.
+
+    Returns:
+      - results: dict of the result of each sequence, in the order of `seq_list`
+      - timings: dict of the time spent evaluating each sequence (in seconds)
+    """
+    get_seq_cost = getattr(dataset, "get_seq_cost", lambda seq: 0)
+    costs = {seq: get_seq_cost(seq) for seq in seq_list}
+    # longest sequences first (the sort is stable, keeping the order of the others)
+    scheduled = sorted(seq_list, key=lambda seq: -costs[seq])
+    payload = pickle.dumps((eval_fn, dataset, eval_args))
+    ctx = mp.get_context(start_method or get_default_start_method())
+    results, timings = {}, {}
+    with ctx.Pool(
+        min(num_workers, max(1, len(seq_list))),
+        initializer=_init_worker,
+        initargs=(payload,),
+    ) as pool:
+        for seq, result, elapsed in pool.imap_unordered(
+            _eval_seq, scheduled, chunksize=1
+        ):
+            results[seq] = result
+            timings[seq] = elapsed
+            if progress_callback is not None:
+                progress_callback()
+    return {seq: results[seq] for seq in seq_list}, timings
@@ -0,0 +1,60 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""
+Sharded per-image evaluation: the image ids are split in contiguous shards that are
+evaluated in a pool of forked processes.
+
+The evaluators (with their loaded GT and predictions) are inherited by the workers
+through fork, so only the shards of image ids are sent to the workers and only the
+per-image results are sent back. Since each image is evaluated independently and
+the results are concatenated in the order of the shards, the results are identical
+to the ones of a sequential evaluation.
+"""
+
+import logging
+import multiprocessing as mp
+from typing import Callable, List, Sequence
+
+# the function evaluating a shard, inherited by the forked workers
+_SHARD_FN = None
+
+
+def _run_shard(shard):
+    return _SHARD_FN(shard)
+
+
+def split_in_shards(items: Sequence, num_shards: int) -> List[Sequence]:
+    """Split `items` in (at most) `num_shards` contiguous shards of balanced sizes."""
+    num_shards = max(1, min(num_shards, len(items)))
+    bounds = [len(items) * i // num_shards for i in range(num_shards + 1)]
+    return [items[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def map_shards(
+    fn: Callable[[Sequence], list],
+    items: Sequence,
+    num_workers: int,
+    shards_per_worker: int = 4,
+) -> list:
+    """
+    Concatenation of `fn(shard)` over contiguous shards of `items`, where `fn` returns
+    a list of per-item results. With `num_workers` > 1, the shards are evaluated in
+    forked processes (a few shards per worker to balance the load); otherwise, or if
+    fork is not available, `fn` is called on all the items in the current process.
+    """
+    if num_workers <= 1 or len(items) <= 1:
+        return fn(items)
+    if "fork" not in mp.get_all_start_methods():
+        logging.warning("fork is not available, running the evaluation sequentially")
+        return fn(items)
+
+    global _SHARD_FN
+    assert _SHARD_FN is None, "nested sharded evaluations are not supported"
+    shards = split_in_shards(items, num_workers * shards_per_worker)
+    _SHARD_FN = fn
+    try:
+        with mp.get_context("fork").Pool(min(num_workers, len(shards))) as pool:
+            shard_results = pool.map(_run_shard, shards, chunksize=1)
+    finally:
+        _SHARD_FN = None
+    return [result for results in shard_results for result in results]
@@ -0,0 +1,129 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""
+Streaming dump of predictions: instead of holding all the predictions in memory
+and gathering them to rank 0, each rank appends them to its own shard file as they
+are produced, and rank 0 merges the shards of all the ranks while holding only a few
+predictions of each shard in memory.
+
+A shard file is a sequence of length-prefixed, zlib-compressed records, each holding
+the predictions of a single key (e.g. an image id) as `(key, preds)`. The predictions
+are buffered and flushed as sorted runs of records, so the shards can be merged with
+a k-way merge over all the runs, yielding all the predictions of a key together.
+"""
+
+import heapq
+import itertools
+import json
+import os
+import pickle
+import struct
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+_LENGTH = struct.Struct("<Q")
+
+
+def _runs_path(shard_path: str) -> str:
+    return shard_path + ".runs.json"
+
+
+class ShardWriter:
+    """Appends predictions, grouped by `key_fn` and sorted in runs, to a shard file."""
+
+    def __init__(self, path: str, key_fn: Callable[[Dict], Any], buffer_size=10000):
+        self.path = path
+        self.key_fn = key_fn
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.runs = []  # (start, end) byte offsets of each sorted run
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, "wb")
+
+    def append(self, preds: Sequence[Dict]):
+        self.buffer.extend(preds)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        start = self.file.tell()
+        # a stable sort, keeping the order of the predictions of each key
+        self.buffer.sort(key=self.key_fn)
+        for key, preds in itertools.groupby(self.buffer, key=self.key_fn):
+            record = zlib.compress(pickle.dumps((key, list(preds))), level=1)
+            self.file.write(_LENGTH.pack(len(record)))
+            self.file.write(record)
+        self.runs.append((start, self.file.tell()))
+        self.buffer = []
+
+    def close(self):
+        """Flush the remaining predictions and write the index of the runs."""
+        self.flush()
+        self.file.close()
+        with open(_runs_path(self.path), "w") as f:
+            json.dump(self.runs, f)
+
+    def discard(self):
+        """Close and remove the shard without writing its index (e.g. on a reset)."""
+        if not self.file.closed:
+            self.file.close()
+        remove_shard(self.path)
+
+
+def _iter_run(f, start: int, end: int) -> Iterator[Tuple[Any, List[Dict]]]:
+    """The (key, preds) records of a run, read lazily from the shard file `f`."""
+    offset = start
+    while offset < end:
+        f.seek(offset)
+        (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+        key, preds = pickle.loads(zlib.decompress(f.read(length)))
+        offset += _LENGTH.size + length
+        yield key, preds
+
+
+def _tag_run(records, shard_idx: int, run_idx: int):
+    for key, preds in records:
+        yield key, shard_idx, run_idx, preds
+
+
+def merge_shards(
+    shard_paths: Sequence[str],
+) -> Iterator[Tuple[Any, List[Tuple[int, List[Dict]]]]]:
+    """
+    K-way merge of the runs of several shards (e.g. one per rank), yielding each key
+    in sorted order with the list of `(shard_idx, preds)` of this key, in the order of
+    the shards and, within a shard, in the order in which they were appended.
+    """
+    files = [open(path, "rb") for path in shard_paths]
+    try:
+        runs = []
+        for shard_idx, (path, f) in enumerate(zip(shard_paths, files)):
+            with open(_runs_path(path)) as runs_file:
+                shard_runs = json.load(runs_file)
+            for run_idx, (start, end) in enumerate(shard_runs):
+                runs.append(_tag_run(_iter_run(f, start, end), shard_idx, run_idx))
+        merged = heapq.merge(*runs, key=lambda record: record[:3])
+        for key, records in itertools.groupby(merged, key=lambda record: record[0]):
+            yield key, [(shard_idx, preds) for _, shard_idx, _, preds in records]
+    finally:
+        for f in files:
+            f.close()
+
+
+def remove_shard(shard_path: str):
+    for path in (shard_path, _runs_path(shard_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def write_json_list(f, items: Iterator):
+    """Write the items as a JSON list (the same output as `json.dump(list(items), f)`)
+    without materializing the list."""
+    f.write("[")
+    for i, item in enumerate(items):
+        if i > 0:
+            f.write(", ")
+        f.write(json.dumps(item))
+    f.write("]")
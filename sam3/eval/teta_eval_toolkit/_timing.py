@@ -67,3 +67,14 @@ def time(f):
             return f(*args, **kw)
 
     return wrap
+
+
+def report_times(method_name, times):
+    """Record and display the times of a function that were measured elsewhere (e.g.
+    in the worker processes of a parallel evaluation), keyed by its argument values."""
+    global counter
+    timer_dict[method_name] = timer_dict.get(method_name, 0) + sum(times.values())
+    for arg_vals, tt in times.items():
+        counter += 1
+        arg_text = "(" + ", ".join(arg_vals) + ")"
+        print("%i %-70s %2.4f sec" % (counter, method_name + arg_text, tt))
@@ -59,6 +59,7 @@ def get_default_eval_config():
     default_config = {
         "USE_PARALLEL": True,
         "NUM_PARALLEL_CORES": 8,
+        "PARALLEL_START_METHOD": None,  # None for forkserver (if available)
         "BREAK_ON_ERROR": True,
         "RETURN_ON_ERROR": False,
         "LOG_ON_ERROR": os.path.join(code_path, "error_log.txt"),
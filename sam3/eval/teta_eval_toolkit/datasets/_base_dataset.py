@@ -63,6 +63,12 @@ class _BaseDataset(ABC):
         """Return info about the dataset needed for the Evaluator"""
         return self.tracker_list, self.seq_list, self.class_list
 
+    def get_seq_cost(self, seq):
+        """Estimated cost of evaluating a sequence, used to schedule the longest sequences first
+        in parallel evaluations. Can be overwritten, by default all sequences have the same cost.
+        """
+        return 0
+
     @_timing.time
     def get_raw_seq_data(self, tracker, seq):
         """Loads raw data (tracker and ground-truth) for a single tracker on a single sequence.
@@ -177,6 +177,10 @@ class TAO(_BaseDataset):
     def get_display_name(self, tracker):
         return self.tracker_to_disp[tracker]
 
+    def get_seq_cost(self, seq):
+        """The number of timesteps of the sequence"""
+        return self.seq_lengths[self.seq_name2seqid[seq]]
+
     def _load_raw_file(self, tracker, seq, is_gt):
         """Load a file (gt or tracker) in the TAO format
 
@@ -6,10 +6,9 @@ import os
 import pickle
 import time
 import traceback
-from functools import partial
-from multiprocessing.pool import Pool
 
 import numpy as np
+from sam3.eval.sequence_scheduler import evaluate_sequences
 
 from . import _timing, utils
 from .config import get_default_eval_config, init_config
@@ -103,17 +102,21 @@ class Evaluator:
         time_start = time.time()
         config = self.config
         if config["USE_PARALLEL"]:
-            with Pool(config["NUM_PARALLEL_CORES"]) as pool:
-                _eval_sequence = partial(
-                    eval_sequence,
-                    dataset=dataset,
-                    tracker=tracker,
-                    class_list=class_list,
-                    metrics_list=metrics_list,
-                    metric_names=metric_names,
+            # the sequences are scheduled longest first, and the workers only receive
+            # the sequence ids (see `sequence_scheduler`)
+            res, seq_times = evaluate_sequences(
+                eval_sequence,
+                seq_list,
+                dataset,
+                (tracker, class_list, metrics_list, metric_names),
+                config["NUM_PARALLEL_CORES"],
+                start_method=config["PARALLEL_START_METHOD"],
+            )
+            # one line per sequence, so not with DISPLAY_LESS_PROGRESS
+            if config["TIME_PROGRESS"] and not config["DISPLAY_LESS_PROGRESS"]:
+                _timing.report_times(
+                    "eval_sequence", {(tracker, seq): t for seq, t in seq_times.items()}
                 )
-                results = pool.map(_eval_sequence, seq_list)
-                res = dict(zip(seq_list, results))
         else:
             res = {}
             for curr_seq in sorted(seq_list):
@@ -2,6 +2,7 @@
 import copy
 import gc
 import logging
+import operator
 import os
 from collections import defaultdict
 from operator import xor
@@ -14,6 +15,12 @@ import torch
 from pycocotools.cocoeval import COCOeval
 from sam3.eval.cgf1_eval import CGF1Eval
 from sam3.eval.coco_eval_offline import convert_to_xywh
+from sam3.eval.streaming_dump import (
+    merge_shards,
+    remove_shard,
+    ShardWriter,
+    write_json_list,
+)
 from sam3.model.box_ops import box_xywh_inter_union
 from sam3.train.masks_ops import rle_encode
 from sam3.train.utils import distributed as dist
@@ -27,6 +34,92 @@ except ModuleNotFoundError:
 from iopath.common.file_io import g_pathmgr
 
 
+def _iou_masklet_pair(preds, gts):
+    """IoU between two masklets (lists of per-frame RLEs, with None or {} on the frames
+    where the object is absent), accumulating the areas over the frames."""
+    inter = 0
+    union = 0
+    for p_i, gt_i in zip(preds, gts):
+        if p_i and gt_i:
+            # Compute areas of intersection and union
+            inter += mask_util.area(mask_util.merge([p_i, gt_i], intersect=True))
+            union += mask_util.area(mask_util.merge([p_i, gt_i], intersect=False))
+        elif gt_i:
+            union += mask_util.area(gt_i)
+        elif p_i:
+            union += mask_util.area(p_i)
+    if union > 0:
+        iou = inter / union
+        assert iou >= 0 and iou <= 1, "Encountered an error in IoU computation"
+    else:
+        assert np.isclose(inter, 0) and np.isclose(
+            union, 0
+        ), "Encountered an error in IoU computation"
+        iou = 1
+    return iou
+
+
+def _masklet_areas(masklets, num_frames):
+    """Presence (num_masklets, num_frames) and areas of the masklets on each frame,
+    computed with a single `mask_util.area` call."""
+    present = np.array(
+        [[bool(m) for m in masklet[:num_frames]] for masklet in masklets], dtype=bool
+    ).reshape(len(masklets), num_frames)
+    areas = np.zeros(present.shape, dtype=np.float64)
+    rles = [m for masklet in masklets for m in masklet[:num_frames] if m]
+    if len(rles) > 0:
+        areas[present] = mask_util.area(rles)
+    return present, areas
+
+
+def masklet_ious(dt_masklets, gt_masklets):
+    """
+    IoU between all the pairs of predicted and GT masklets (lists of per-frame RLEs,
+    with None or {} on the frames where the object is absent), where the areas of
+    intersection and union are accumulated over the frames.
+
+    Instead of merging the RLEs of each pair on each frame, the areas of all the masks
+    are computed at once and the intersections of all the pairs of a frame come from a
+    single `mask_util.iou` call (with the GTs as crowd, the IoU is the intersection
+    over the prediction area). The unions follow from the areas and intersections.
+
+    Returns:
+      - ious: (num_dt, num_gt) float64 array
+    """
+    lengths = {len(m) for m in dt_masklets} | {len(m) for m in gt_masklets}
+    if len(lengths) > 1:
+        # masklets of different lengths are only compared on their common frames
+        return np.array(
+            [
+                [_iou_masklet_pair(d_i, g_i) for g_i in gt_masklets]
+                for d_i in dt_masklets
+            ]
+        )
+    num_frames = lengths.pop() if lengths else 0
+    dt_present, dt_areas = _masklet_areas(dt_masklets, num_frames)
+    gt_present, gt_areas = _masklet_areas(gt_masklets, num_frames)
+
+    inter = np.zeros((len(dt_masklets), len(gt_masklets)), dtype=np.float64)
+    for t in np.flatnonzero(dt_present.any(axis=0) & gt_present.any(axis=0)):
+        dt_inds = np.flatnonzero(dt_present[:, t])
+        gt_inds = np.flatnonzero(gt_present[:, t])
+        crowd_ious = mask_util.iou(
+            [dt_masklets[i][t] for i in dt_inds],
+            [gt_masklets[j][t] for j in gt_inds],
+            [1] * len(gt_inds),
+        )
+        # the intersections are integer pixel counts
+        frame_inter = np.rint(np.asarray(crowd_ious) * dt_areas[dt_inds, t][:, None])
+        inter[np.ix_(dt_inds, gt_inds)] += frame_inter
+
+    union = dt_areas.sum(axis=1)[:, None] + gt_areas.sum(axis=1)[None, :] - inter
+    assert (inter >= 0).all() and (
+        inter <= union
+    ).all(), "Encountered an error in IoU computation"
+    # two masklets that are both empty on all the frames have an IoU of 1
+    return np.where(union > 0, inter / np.maximum(union, 1), 1.0)
+
+
 class YTVISevalMixin:
     """
     Identical to COCOeval but adapts computeIoU to compute IoU between tracklets/masklets.
@@ -114,34 +207,8 @@ class YTVISevalMixin:
             )
             return inter / union
 
-        def iou_masklets(preds, gts):
-            inter = 0
-            union = 0
-            for p_i, gt_i in zip(preds, gts):
-                if p_i and gt_i:
-                    # Compute areas of intersection and union
-                    inter += mask_util.area(
-                        mask_util.merge([p_i, gt_i], intersect=True)
-                    )
-                    union += mask_util.area(
-                        mask_util.merge([p_i, gt_i], intersect=False)
-                    )
-                elif gt_i:
-                    union += mask_util.area(gt_i)
-                elif p_i:
-                    union += mask_util.area(p_i)
-            if union > 0:
-                iou = inter / union
-                assert iou >= 0 and iou <= 1, "Encountered an error in IoU computation"
-            else:
-                assert np.isclose(inter, 0) and np.isclose(
-                    union, 0
-                ), "Encountered an error in IoU computation"
-                iou = 1
-            return iou
-
         if p.iouType == "segm":
-            ious = [[iou_masklets(d_i, g_i) for g_i in g] for d_i in d]
+            ious = masklet_ious(d, g)
         else:
             ious = iou_tracklets(d, g)
         return np.array(ious)
@@ -172,6 +239,8 @@ class YTVISResultsWriter:
         save_per_frame_scores: bool = False,
         write_eval_metrics_file: bool = True,
         eval_metrics_file_suffix: str = ".sam3_eval_metrics",
+        stream_to_disk: bool = False,
+        stream_buffer_size: int = 1000,
     ):
         self.dump_file = dump_file
         self.dump = []
@@ -194,9 +263,37 @@ class YTVISResultsWriter:
             self.eval_metrics_file = self.dump_file + eval_metrics_file_suffix
             os.makedirs(os.path.dirname(self.eval_metrics_file), exist_ok=True)
 
+        # if `stream_to_disk`, each process appends its predictions to a shard file next
+        # to the dump file (on a filesystem shared by all the processes) instead of
+        # keeping them in memory, and the main process merges the shards video by
+        # video (see `sam3.eval.streaming_dump`)
+        self.stream_to_disk = stream_to_disk
+        self.stream_buffer_size = stream_buffer_size
+        self._sync_round = 0
+        self._shard_writer = None
+
+    def _shard_path(self, rank):
+        dirname, basename = os.path.split(self.dump_file)
+        return os.path.join(
+            dirname, ".shards", f"{basename}_{self._sync_round}_{rank}.bin"
+        )
+
+    def _get_shard_writer(self):
+        # opened lazily, so that no empty shard is left after the last round
+        if self._shard_writer is None:
+            self._shard_writer = ShardWriter(
+                self._shard_path(dist.get_rank()),
+                key_fn=operator.itemgetter("video_id"),
+                buffer_size=self.stream_buffer_size,
+            )
+        return self._shard_writer
+
     def _dump_vid_preds(self, results):
         dumped_results = copy.deepcopy(results)
-        self.dump.extend(dumped_results)
+        if self.stream_to_disk:
+            self._get_shard_writer().append(dumped_results)
+        else:
+            self.dump.extend(dumped_results)
 
     def prepare(self, predictions):
         ytvis_results = []
@@ -278,6 +375,8 @@ class YTVISResultsWriter:
         self._dump_vid_preds(results)
 
     def _dump_preds(self):
+        if self.stream_to_disk:
+            return self._dump_merged_shards()
         if not dist.is_main_process():
             self.dump = []
             gc.collect()
@@ -290,8 +389,55 @@ class YTVISResultsWriter:
         gc.collect()
         return str(dumped_file)
 
+    def _dump_merged_shards(self):
+        """Merge the shards of all the processes (written when `stream_to_disk`) into
+        the dump file, holding only the predictions of a few videos in memory."""
+        shard_paths = [self._shard_path(r) for r in range(dist.get_world_size())]
+        dumped_file = None
+        if dist.is_main_process():
+            dumped_file = Path(self.dump_file)
+            logging.info(f"YTVIS evaluator: Dumping predictions to {dumped_file}")
+            preds = (
+                p
+                for _, shard_preds in merge_shards(shard_paths)
+                for p in self._dedup_video_preds(shard_preds)
+            )
+            with g_pathmgr.open(str(dumped_file), "w") as f:
+                write_json_list(f, preds)
+            for shard_path in shard_paths:
+                remove_shard(shard_path)
+            dumped_file = str(dumped_file)
+        self._sync_round += 1
+        return dumped_file
+
+    @staticmethod
+    def _dedup_video_preds(shard_preds):
+        """
+        Same as `_dedup_post_gather`, but for the predictions of a single video, given
+        as the (rank, preds) lists of each process.
+        """
+        dedup_prediction_dict = {}
+        cat_ranks = {}
+        for rank, preds in shard_preds:
+            for p in preds:
+                k = p["category_id"]
+                if k not in dedup_prediction_dict:
+                    dedup_prediction_dict[k] = [p]
+                    cat_ranks[k] = rank
+                elif cat_ranks[k] == rank:
+                    dedup_prediction_dict[k].append(p)
+        return sum(dedup_prediction_dict.values(), [])
+
     def synchronize_between_processes(self):
         logging.info("YT-VIS evaluator: Synchronizing between processes")
+        if self.stream_to_disk:
+            # wait for all the processes to finish writing their shards, which are then
+            # merged by the main process in `_dump_preds` (every process writes its
+            # shard, even if empty)
+            self._get_shard_writer().close()
+            self._shard_writer = None
+            dist.barrier()
+            return
         dump_dict = self._dedup_pre_gather(self.dump)
         if self.gather_pred_via_filesys:
             dump_dict_all_gpus = dist.gather_to_rank_0_via_filesys(dump_dict)
@@ -409,3 +555,6 @@ class YTVISResultsWriter:
 
     def reset(self, *args, **kwargs):
         self.dump = []
+        if self._shard_writer is not None:
+            self._shard_writer.discard()
+            self._shard_writer = None
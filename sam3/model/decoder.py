@@ -278,7 +278,9 @@ class TransformerDecoder(nn.Module):
             if resolution is not None and stride is not None:
                 feat_size = resolution // stride
                 coords_h, coords_w = self._get_coords(
-                    feat_size, feat_size, device="cuda"
+                    feat_size,
+                    feat_size,
+                    device="cuda" if torch.cuda.is_available() else "cpu",
                 )
                 self.compilable_cord_cache = (coords_h, coords_w)
                 self.compilable_stored_size = (feat_size, feat_size)
@@ -332,9 +334,17 @@ class TransformerDecoder(nn.Module):
         H, W = feat_size
         boxes_xyxy = box_cxcywh_to_xyxy(reference_boxes).transpose(0, 1)
         bs, num_queries, _ = boxes_xyxy.shape
-        if self.compilable_cord_cache is None:
-            self.compilable_cord_cache = self._get_coords(H, W, reference_boxes.device)
-            self.compilable_stored_size = (H, W)
+        if (
+            self.compilable_cord_cache is None
+            or self.compilable_cord_cache[0].device != reference_boxes.device
+        ):
+            # (re)build the cache on the device of the model (it's not a buffer,
+            # so it doesn't follow `model.to(device)`)
+            H_cache, W_cache = self.compilable_stored_size or (H, W)
+            self.compilable_cord_cache = self._get_coords(
+                H_cache, W_cache, reference_boxes.device
+            )
+            self.compilable_stored_size = (H_cache, W_cache)
 
         if torch.compiler.is_dynamo_compiling() or self.compilable_stored_size == (
             H,
@@ -345,7 +355,10 @@ class TransformerDecoder(nn.Module):
         else:
             # cache miss, will create compilation issue
             # In case we're not compiling, we'll still rely on the dict-based cache
-            if feat_size not in self.coord_cache:
+            if (
+                feat_size not in self.coord_cache
+                or self.coord_cache[feat_size][0].device != reference_boxes.device
+            ):
                 self.coord_cache[feat_size] = self._get_coords(
                     H, W, reference_boxes.device
                 )
@@ -0,0 +1,248 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""Bounded LRU caches for model features (text embeddings, backbone outputs)."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import torch
+
+
+def map_tensors(obj, fn: Callable[[torch.Tensor], Any]):
+    """Applies `fn` to all tensors in a (nested) dict/list/tuple, rebuilding the
+    containers (so the result never aliases the input containers)."""
+    if isinstance(obj, torch.Tensor):
+        return fn(obj)
+    if isinstance(obj, dict):
+        return {k: map_tensors(v, fn) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(map_tensors(v, fn) for v in obj)
+    return obj
+
+
+def cat_tensor_trees(trees, dim: int = 0):
+    """Concatenates the tensors of several (nested) dicts/lists/tuples with the same
+    structure. Non-tensor leaves are taken from the first tree."""
+    first = trees[0]
+    if isinstance(first, torch.Tensor):
+        return torch.cat(trees, dim=dim)
+    if isinstance(first, dict):
+        return {k: cat_tensor_trees([t[k] for t in trees], dim) for k in first}
+    if isinstance(first, (list, tuple)):
+        return type(first)(
+            cat_tensor_trees([t[i] for t in trees], dim) for i in range(len(first))
+        )
+    return first
+
+
+def tensor_nbytes(obj) -> int:
+    """Total size in bytes of all tensors in a (nested) dict/list/tuple."""
+    if isinstance(obj, torch.Tensor):
+        return obj.numel() * obj.element_size()
+    if isinstance(obj, _OffloadedTensor):
+        return tensor_nbytes(obj.tensor)
+    if isinstance(obj, dict):
+        return sum(tensor_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(tensor_nbytes(v) for v in obj)
+    return 0
+
+
+class LRUCache:
+    """A thread-safe LRU cache bounded by number of entries and/or total bytes.
+
+    The size of each entry is computed once on insertion with `size_fn`
+    (by default, the total size of the tensors it contains). Hits, misses and
+    evictions are counted so that the cache efficiency can be monitored.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        size_fn: Callable[[Any], int] = tensor_nbytes,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        # called (outside of the lock) with each entry evicted to make room
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value):
+        nbytes = self.size_fn(value)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            if self.max_bytes is not None and nbytes > self.max_bytes:
+                # an entry larger than the whole budget is never cached
+                evicted = [(key, value)]
+            else:
+                self._entries[key] = (value, nbytes)
+                self.total_bytes += nbytes
+                evicted = self._evict()
+        if self.on_evict is not None:
+            for evicted_key, evicted_value in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.total_bytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _evict(self):
+        evicted = []
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            key, (value, nbytes) = self._entries.popitem(last=False)
+            self.total_bytes -= nbytes
+            self.evictions += 1
+            evicted.append((key, value))
+        return evicted
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+        }
+
+
+class _OffloadedTensor:
+    """A tensor stored in the offload tier, with the dtype and device to restore."""
+
+    __slots__ = ("tensor", "dtype", "device")
+
+    def __init__(self, tensor: torch.Tensor, dtype, device):
+        self.tensor = tensor
+        self.dtype = dtype
+        self.device = device
+
+
+def _offload(obj, dtype):
+    def _offload_tensor(t):
+        stored = t.detach().to("cpu")
+        if t.is_floating_point():
+            stored = stored.to(dtype)
+        return _OffloadedTensor(stored, t.dtype, t.device)
+
+    return map_tensors(obj, _offload_tensor)
+
+
+def _restore(obj, device=None):
+    if isinstance(obj, _OffloadedTensor):
+        target = obj.device if device is None else device
+        return obj.tensor.to(device=target, dtype=obj.dtype, non_blocking=True)
+    if isinstance(obj, dict):
+        return {k: _restore(v, device) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_restore(v, device) for v in obj)
+    return obj
+
+
+class TieredFeatureCache:
+    """A two-tier LRU cache for (nested dicts of) feature tensors.
+
+    The primary tier keeps the features as they were computed (typically on the
+    GPU), within `max_bytes`. Entries evicted from it are moved to an optional
+    offload tier on the CPU (within `offload_max_bytes`), where floating point
+    tensors are stored in `offload_dtype` (fp16 by default, halving their size).
+    A hit in the offload tier restores the features to their original dtype and
+    device and promotes them back to the primary tier.
+
+    Note that hits on the offload tier are lossy when `offload_dtype` has a lower
+    precision than the cached features.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        offload_max_bytes: int = 0,
+        offload_dtype: torch.dtype = torch.float16,
+    ):
+        self.offload_dtype = offload_dtype
+        self.offload = (
+            LRUCache(max_bytes=offload_max_bytes) if offload_max_bytes > 0 else None
+        )
+        self.primary = LRUCache(
+            max_bytes=max_bytes,
+            on_evict=self._offload_evicted if self.offload is not None else None,
+        )
+
+    def _offload_evicted(self, key, value):
+        self.offload.put(key, _offload(value, self.offload_dtype))
+
+    def __contains__(self, key: Hashable):
+        return key in self.primary or (self.offload is not None and key in self.offload)
+
+    def get(self, key: Hashable, default=None):
+        value = self.primary.get(key)
+        if value is not None:
+            return value
+        if self.offload is not None:
+            offloaded = self.offload.pop(key)
+            if offloaded is not None:
+                self.offload.hits += 1
+                value = _restore(offloaded)
+                self.primary.put(key, value)
+                return value
+            self.offload.misses += 1
+        return default
+
+    def put(self, key: Hashable, value):
+        if self.offload is not None:
+            self.offload.pop(key)
+        self.primary.put(key, value)
+
+    def clear(self):
+        self.primary.clear()
+        if self.offload is not None:
+            self.offload.clear()
+
+    def stats(self):
+        primary = self.primary.stats()
+        hits = primary["hits"]
+        stats = {"primary": primary}
+        if self.offload is not None:
+            stats["offload"] = self.offload.stats()
+            hits += stats["offload"]["hits"]
+        lookups = primary["hits"] + primary["misses"]
+        stats["hit_rate"] = hits / lookups if lookups > 0 else 0.0
+        return stats
@@ -0,0 +1,177 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""On-disk cache of preprocessed video frames, opened as memory-mapped arrays."""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Sequence
+
+import numpy as np
+import torch
+
+from sam3.logger import get_logger
+
+logger = get_logger(__name__)
+
+_FRAMES_FILE = "frames.npy"
+_META_FILE = "meta.json"
+_TMP_PREFIX = ".tmp-"
+
+
+class FrameStore:
+    """A disk cache of the resized and normalized frames of videos.
+
+    Each entry is keyed by the hash of the video content (so a renamed or copied
+    video is still a hit) and of the preprocessing parameters. It holds a `.npy`
+    array of shape (T, 3, image_size, image_size), which later sessions open with
+    `np.load(..., mmap_mode="c")`: the frames are read lazily from the page cache
+    and shared between sessions and processes, without decoding the video again.
+
+    The total size of the entries is bounded by `max_bytes`, evicting the least
+    recently used entries first. The recency is tracked with the modification time
+    of the entry directories, so it is shared by all processes using `root_dir`.
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        os.makedirs(root_dir, exist_ok=True)
+        # content hashes of the videos already hashed by this process, keyed by
+        # (path, size, mtime) to avoid reading the same video again
+        self._content_hashes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _hash_content(self, video_path: str) -> str:
+        """Hash of a video file, or of the image files of a video frame folder."""
+        if os.path.isdir(video_path):
+            paths = sorted(
+                os.path.join(video_path, p)
+                for p in os.listdir(video_path)
+                if os.path.isfile(os.path.join(video_path, p))
+            )
+        else:
+            paths = [video_path]
+        stats = [(p, os.stat(p)) for p in paths]
+        stat_key = tuple((p, s.st_size, s.st_mtime_ns) for p, s in stats)
+        content_hash = self._content_hashes.get(stat_key)
+        if content_hash is None:
+            hasher = hashlib.blake2b(digest_size=16)
+            for p in paths:
+                hasher.update(os.path.basename(p).encode())
+                with open(p, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        hasher.update(chunk)
+            content_hash = hasher.hexdigest()
+            self._content_hashes[stat_key] = content_hash
+        return content_hash
+
+    def make_key(
+        self,
+        video_path: str,
+        image_size: int,
+        img_mean: Sequence[float],
+        img_std: Sequence[float],
+        dtype: torch.dtype,
+    ) -> str:
+        """Key of the preprocessed frames of `video_path`."""
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(self._hash_content(video_path).encode())
+        hasher.update(f"{image_size}{tuple(img_mean)}{tuple(img_std)}{dtype}".encode())
+        return hasher.hexdigest()
+
+    def get(self, key: str):
+        """Returns the (images, video_height, video_width) of an entry, or None.
+
+        The images are a CPU tensor backed by a copy-on-write memory map of the
+        entry, so writing to it never modifies the store.
+        """
+        entry_dir = os.path.join(self.root_dir, key)
+        try:
+            with open(os.path.join(entry_dir, _META_FILE)) as f:
+                meta = json.load(f)
+            frames = np.load(os.path.join(entry_dir, _FRAMES_FILE), mmap_mode="c")
+            os.utime(entry_dir)  # mark the entry as recently used
+        except FileNotFoundError:
+            # not stored yet (or evicted by another process in the meantime)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return torch.from_numpy(frames), meta["video_height"], meta["video_width"]
+
+    def put(self, key: str, images: torch.Tensor, video_height, video_width):
+        """Stores the preprocessed frames `images` of shape (T, 3, H, W)."""
+        nbytes = images.numel() * images.element_size()
+        if nbytes > self.max_bytes:
+            # an entry larger than the whole budget is never stored
+            return
+        self._evict(self.max_bytes - nbytes)
+        # write the entry to a temporary directory and then rename it, so that other
+        # processes never see a partially written entry
+        tmp_dir = tempfile.mkdtemp(prefix=_TMP_PREFIX, dir=self.root_dir)
+        try:
+            images_np = images.cpu().numpy()
+            frames = np.lib.format.open_memmap(
+                os.path.join(tmp_dir, _FRAMES_FILE),
+                mode="w+",
+                dtype=images_np.dtype,
+                shape=images_np.shape,
+            )
+            frames[:] = images_np
+            frames.flush()
+            del frames
+            with open(os.path.join(tmp_dir, _META_FILE), "w") as f:
+                json.dump({"video_height": video_height, "video_width": video_width}, f)
+            os.rename(tmp_dir, os.path.join(self.root_dir, key))
+        except OSError as e:
+            # e.g. the entry was just stored by another process, or the disk is full
+            logger.warning(f"could not store frames {key} in {self.root_dir}: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _entries(self):
+        """(mtime, nbytes, path) of the stored entries."""
+        entries = []
+        for name in os.listdir(self.root_dir):
+            if name.startswith(_TMP_PREFIX):
+                continue
+            entry_dir = os.path.join(self.root_dir, name)
+            try:
+                mtime = os.stat(entry_dir).st_mtime
+                nbytes = os.stat(os.path.join(entry_dir, _FRAMES_FILE)).st_size
+            except FileNotFoundError:
+                continue
+            entries.append((mtime, nbytes, entry_dir))
+        return entries
+
+    def _evict(self, max_bytes: int):
+        """Removes the least recently used entries until they fit in `max_bytes`."""
+        entries = sorted(self._entries())
+        total_bytes = sum(nbytes for _, nbytes, _ in entries)
+        for _, nbytes, entry_dir in entries:
+            if total_bytes <= max_bytes:
+                break
+            # sessions that memory-mapped this entry keep a valid mapping
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_bytes -= nbytes
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(entries),
+            "bytes": sum(nbytes for _, nbytes, _ in entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+        }
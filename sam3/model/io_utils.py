@@ -5,6 +5,7 @@ import os
 import queue
 import re
 import time
+import weakref
 from threading import Condition, get_ident, Lock, Thread
 
 import numpy as np
@@ -26,6 +27,17 @@ IMAGE_EXTS = [".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".webp"]
 VIDEO_EXTS = [".mp4", ".mov", ".avi", ".mkv", ".webm"]
 
 
+def get_frame_storage_dtype(compute_device):
+    """
+    Dtype to store the normalized video frames. float16 precision is sufficient
+    when the model runs on GPU, but float16 conversions and arithmetic are slow on
+    CPU, so the frames are kept in float32 when the model runs on CPU.
+    """
+    return (
+        torch.float16 if torch.device(compute_device).type == "cuda" else torch.float32
+    )
+
+
 def load_resource_as_video_frames(
     resource_path,
     image_size,
@@ -34,14 +46,17 @@ def load_resource_as_video_frames(
     img_std=(0.5, 0.5, 0.5),
     async_loading_frames=False,
     video_loader_type="cv2",
+    compute_device=torch.device("cuda"),
+    frame_store=None,
 ):
     """
     Load video frames from either a video or an image (as a single-frame video).
     Alternatively, if input is a list of PIL images, convert its format
     """
     if isinstance(resource_path, list):
-        img_mean = torch.tensor(img_mean, dtype=torch.float16)[:, None, None]
-        img_std = torch.tensor(img_std, dtype=torch.float16)[:, None, None]
+        storage_dtype = get_frame_storage_dtype(compute_device)
+        img_mean = torch.tensor(img_mean, dtype=storage_dtype)[:, None, None]
+        img_std = torch.tensor(img_std, dtype=storage_dtype)[:, None, None]
         assert all(isinstance(img_pil, Image.Image) for img_pil in resource_path)
         assert len(resource_path) is not None
         orig_height, orig_width = resource_path[0].size
@@ -55,15 +70,14 @@ def load_resource_as_video_frames(
             assert img_np.dtype == np.uint8, "np.uint8 is expected for JPEG images"
             img_np = img_np / 255.0
             img = torch.from_numpy(img_np).permute(2, 0, 1)
-            # float16 precision should be sufficient for image tensor storage
-            img = img.to(dtype=torch.float16)
+            img = img.to(dtype=storage_dtype)
             # normalize by mean and std
             img -= img_mean
             img /= img_std
             images.append(img)
         images = torch.stack(images)
         if not offload_video_to_cpu:
-            images = images.cuda()
+            images = images.to(compute_device)
         return images, orig_height, orig_width
 
     is_image = (
@@ -77,6 +91,7 @@ def load_resource_as_video_frames(
             offload_video_to_cpu=offload_video_to_cpu,
             img_mean=img_mean,
             img_std=img_std,
+            compute_device=compute_device,
         )
     else:
         return load_video_frames(
@@ -87,6 +102,8 @@ def load_resource_as_video_frames(
             img_std=img_std,
             async_loading_frames=async_loading_frames,
             video_loader_type=video_loader_type,
+            compute_device=compute_device,
+            frame_store=frame_store,
         )
 
 
@@ -96,17 +113,19 @@ def load_image_as_single_frame_video(
     offload_video_to_cpu,
     img_mean=(0.5, 0.5, 0.5),
     img_std=(0.5, 0.5, 0.5),
+    compute_device=torch.device("cuda"),
 ):
     """Load an image as a single-frame video."""
+    storage_dtype = get_frame_storage_dtype(compute_device)
     images, image_height, image_width = _load_img_as_tensor(image_path, image_size)
-    images = images.unsqueeze(0).half()
+    images = images.unsqueeze(0).to(storage_dtype)
 
-    img_mean = torch.tensor(img_mean, dtype=torch.float16)[:, None, None]
-    img_std = torch.tensor(img_std, dtype=torch.float16)[:, None, None]
+    img_mean = torch.tensor(img_mean, dtype=storage_dtype)[:, None, None]
+    img_std = torch.tensor(img_std, dtype=storage_dtype)[:, None, None]
     if not offload_video_to_cpu:
-        images = images.cuda()
-        img_mean = img_mean.cuda()
-        img_std = img_std.cuda()
+        images = images.to(compute_device)
+        img_mean = img_mean.to(compute_device)
+        img_std = img_std.to(compute_device)
     # normalize by mean and std
     images -= img_mean
     images /= img_std
@@ -121,17 +140,56 @@ def load_video_frames(
     img_std=(0.5, 0.5, 0.5),
     async_loading_frames=False,
     video_loader_type="cv2",
+    compute_device=torch.device("cuda"),
+    frame_store=None,
 ):
     """
     Load the video frames from video_path. The frames are resized to image_size as in
-    the model and are loaded to GPU if offload_video_to_cpu=False. This is used by the demo.
+    the model and are loaded to `compute_device` if offload_video_to_cpu=False. This is
+    used by the demo.
+
+    If `frame_store` (a `FrameStore`) is given, the preprocessed frames of a video that
+    was already loaded are memory-mapped from the store instead of being decoded again,
+    and the frames of a new video are added to the store (unless they are loaded
+    asynchronously).
     """
     assert isinstance(video_path, str)
+    if frame_store is not None and not video_path.startswith("<load-dummy-video"):
+        storage_dtype = get_frame_storage_dtype(compute_device)
+        key = frame_store.make_key(
+            video_path, image_size, img_mean, img_std, storage_dtype
+        )
+        stored = frame_store.get(key)
+        if stored is not None:
+            images, video_height, video_width = stored
+            logger.info(f"loaded {len(images)} preprocessed frames from frame store")
+            if not offload_video_to_cpu:
+                images = images.to(compute_device)
+            return images, video_height, video_width
+        images, video_height, video_width = load_video_frames(
+            video_path=video_path,
+            image_size=image_size,
+            offload_video_to_cpu=offload_video_to_cpu,
+            img_mean=img_mean,
+            img_std=img_std,
+            async_loading_frames=async_loading_frames,
+            video_loader_type=video_loader_type,
+            compute_device=compute_device,
+        )
+        if isinstance(images, torch.Tensor):
+            frame_store.put(key, images, video_height, video_width)
+        return images, video_height, video_width
+
     if video_path.startswith("<load-dummy-video"):
         # Check for pattern <load-dummy-video-N> where N is an integer
         match = re.match(r"<load-dummy-video-(\d+)>", video_path)
         num_frames = int(match.group(1)) if match else 60
-        return load_dummy_video(image_size, offload_video_to_cpu, num_frames=num_frames)
+        return load_dummy_video(
+            image_size,
+            offload_video_to_cpu,
+            num_frames=num_frames,
+            compute_device=compute_device,
+        )
     elif os.path.isdir(video_path):
         return load_video_frames_from_image_folder(
             image_folder=video_path,
@@ -140,6 +198,7 @@ def load_video_frames(
             img_mean=img_mean,
             img_std=img_std,
             async_loading_frames=async_loading_frames,
+            compute_device=compute_device,
         )
     elif os.path.splitext(video_path)[-1].lower() in VIDEO_EXTS:
         return load_video_frames_from_video_file(
@@ -150,6 +209,7 @@ def load_video_frames(
             img_std=img_std,
             async_loading_frames=async_loading_frames,
             video_loader_type=video_loader_type,
+            compute_device=compute_device,
         )
     else:
         raise NotImplementedError("Only video files and image folders are supported")
@@ -162,6 +222,7 @@ def load_video_frames_from_image_folder(
     img_mean,
     img_std,
     async_loading_frames,
+    compute_device=torch.device("cuda"),
 ):
     """
     Load the video frames from a directory of image files ("<frame_index>.<img_ext>" format)
@@ -184,26 +245,31 @@ def load_video_frames_from_image_folder(
     if num_frames == 0:
         raise RuntimeError(f"no images found in {image_folder}")
     img_paths = [os.path.join(image_folder, frame_name) for frame_name in frame_names]
-    img_mean = torch.tensor(img_mean, dtype=torch.float16)[:, None, None]
-    img_std = torch.tensor(img_std, dtype=torch.float16)[:, None, None]
+    storage_dtype = get_frame_storage_dtype(compute_device)
+    img_mean = torch.tensor(img_mean, dtype=storage_dtype)[:, None, None]
+    img_std = torch.tensor(img_std, dtype=storage_dtype)[:, None, None]
 
     if async_loading_frames:
         lazy_images = AsyncImageFrameLoader(
-            img_paths, image_size, offload_video_to_cpu, img_mean, img_std
+            img_paths,
+            image_size,
+            offload_video_to_cpu,
+            img_mean,
+            img_std,
+            compute_device=compute_device,
         )
         return lazy_images, lazy_images.video_height, lazy_images.video_width
 
-    # float16 precision should be sufficient for image tensor storage
-    images = torch.zeros(num_frames, 3, image_size, image_size, dtype=torch.float16)
+    images = torch.zeros(num_frames, 3, image_size, image_size, dtype=storage_dtype)
     video_height, video_width = None, None
     for n, img_path in enumerate(
         tqdm(img_paths, desc=f"frame loading (image folder) [rank={RANK}]")
     ):
         images[n], video_height, video_width = _load_img_as_tensor(img_path, image_size)
     if not offload_video_to_cpu:
-        images = images.cuda()
-        img_mean = img_mean.cuda()
-        img_std = img_std.cuda()
+        images = images.to(compute_device)
+        img_mean = img_mean.to(compute_device)
+        img_std = img_std.to(compute_device)
     # normalize by mean and std
     images -= img_mean
     images /= img_std
@@ -220,15 +286,27 @@ def load_video_frames_from_video_file(
     gpu_acceleration=False,
     gpu_device=None,
     video_loader_type="cv2",
+    compute_device=torch.device("cuda"),
 ):
     """Load the video frames from a video file."""
-    if video_loader_type == "cv2":
+    if video_loader_type == "cv2" and async_loading_frames:
+        lazy_images = StreamingVideoFileLoaderWithCV2(
+            video_path=video_path,
+            image_size=image_size,
+            offload_video_to_cpu=offload_video_to_cpu,
+            img_mean=img_mean,
+            img_std=img_std,
+            compute_device=compute_device,
+        )
+        return lazy_images, lazy_images.video_height, lazy_images.video_width
+    elif video_loader_type == "cv2":
         return load_video_frames_from_video_file_using_cv2(
             video_path=video_path,
             image_size=image_size,
             img_mean=img_mean,
             img_std=img_std,
             offload_video_to_cpu=offload_video_to_cpu,
+            compute_device=compute_device,
         )
     elif video_loader_type == "torchcodec":
         logger.info("Using torchcodec to load video file")
@@ -240,6 +318,7 @@ def load_video_frames_from_video_file(
             img_std=img_std,
             gpu_acceleration=gpu_acceleration,
             gpu_device=gpu_device,
+            compute_device=compute_device,
         )
         # The `AsyncVideoFileLoaderWithTorchCodec` class always loads the videos asynchronously,
         # so we just wait for its loading thread to finish if async_loading_frames=False.
@@ -258,6 +337,7 @@ def load_video_frames_from_video_file_using_cv2(
     img_mean: tuple = (0.5, 0.5, 0.5),
     img_std: tuple = (0.5, 0.5, 0.5),
     offload_video_to_cpu: bool = False,
+    compute_device=torch.device("cuda"),
 ) -> torch.Tensor:
     """
     Load video from path, convert to normalized tensor with specified preprocessing
@@ -267,9 +347,15 @@ def load_video_frames_from_video_file_using_cv2(
         image_size: Target size for square frames (height and width)
         img_mean: Normalization mean (RGB)
         img_std: Normalization standard deviation (RGB)
+        offload_video_to_cpu: Keep the frames on CPU instead of `compute_device`
+        compute_device: Device on which the model runs
 
     Returns:
         torch.Tensor: Preprocessed video tensor in shape (T, C, H, W) with float16 dtype
+        (float32 if the model runs on CPU)
+
+    Note that all the frames are kept in memory; use `StreamingVideoFileLoaderWithCV2`
+    (`async_loading_frames=True`) to process long videos in bounded memory.
     """
     import cv2  # delay OpenCV import to avoid unnecessary dependency
 
@@ -301,29 +387,42 @@ def load_video_frames_from_video_file_using_cv2(
     pbar.close()
 
     # Convert to tensor
-    frames_np = np.stack(frames, axis=0).astype(np.float32)  # (T, H, W, C)
-    video_tensor = torch.from_numpy(frames_np).permute(0, 3, 1, 2)  # (T, C, H, W)
-
-    img_mean = torch.tensor(img_mean, dtype=torch.float16).view(1, 3, 1, 1)
-    img_std = torch.tensor(img_std, dtype=torch.float16).view(1, 3, 1, 1)
-    if not offload_video_to_cpu:
-        video_tensor = video_tensor.cuda()
-        img_mean = img_mean.cuda()
-        img_std = img_std.cuda()
-    # normalize by mean and std
-    video_tensor -= img_mean
-    video_tensor /= img_std
+    storage_dtype = get_frame_storage_dtype(compute_device)
+    device = torch.device("cpu") if offload_video_to_cpu else compute_device
+    video_tensor = torch.empty(
+        len(frames), 3, image_size, image_size, dtype=storage_dtype, device=device
+    )
+    img_mean = torch.tensor(img_mean, device=device).view(1, 3, 1, 1)
+    img_std = torch.tensor(img_std, device=device).view(1, 3, 1, 1)
+    # normalize by mean and std in float32 (float16 arithmetic is slow on CPU), a
+    # chunk of frames at a time to bound the memory of the float32 copies
+    chunk_size = 64
+    for start in range(0, len(frames), chunk_size):
+        chunk_np = np.stack(frames[start : start + chunk_size], axis=0)  # (T, H, W, C)
+        chunk = torch.from_numpy(chunk_np).to(device).permute(0, 3, 1, 2).float()
+        chunk /= 255.0
+        chunk -= img_mean
+        chunk /= img_std
+        video_tensor[start : start + chunk_size] = chunk
     return video_tensor, original_height, original_width
 
 
-def load_dummy_video(image_size, offload_video_to_cpu, num_frames=60):
+def load_dummy_video(
+    image_size, offload_video_to_cpu, num_frames=60, compute_device=torch.device("cuda")
+):
     """
     Load a dummy video with random frames for testing and compilation warmup purposes.
     """
     video_height, video_width = 480, 640  # dummy original video sizes
-    images = torch.randn(num_frames, 3, image_size, image_size, dtype=torch.float16)
+    images = torch.randn(
+        num_frames,
+        3,
+        image_size,
+        image_size,
+        dtype=get_frame_storage_dtype(compute_device),
+    )
     if not offload_video_to_cpu:
-        images = images.cuda()
+        images = images.to(compute_device)
     return images, video_height, video_width
 
 
@@ -341,12 +440,22 @@ class AsyncImageFrameLoader:
     A list of video frames to be load asynchronously without blocking session start.
     """
 
-    def __init__(self, img_paths, image_size, offload_video_to_cpu, img_mean, img_std):
+    def __init__(
+        self,
+        img_paths,
+        image_size,
+        offload_video_to_cpu,
+        img_mean,
+        img_std,
+        compute_device=torch.device("cuda"),
+    ):
         self.img_paths = img_paths
         self.image_size = image_size
         self.offload_video_to_cpu = offload_video_to_cpu
         self.img_mean = img_mean
         self.img_std = img_std
+        self.compute_device = compute_device
+        self.storage_dtype = get_frame_storage_dtype(compute_device)
         # items in `self._images` will be loaded asynchronously
         self.images = [None] * len(img_paths)
         # catch and raise any exceptions in the async loading thread
@@ -386,13 +495,12 @@ class AsyncImageFrameLoader:
         )
         self.video_height = video_height
         self.video_width = video_width
-        # float16 precision should be sufficient for image tensor storage
-        img = img.to(dtype=torch.float16)
+        img = img.to(dtype=self.storage_dtype)
         # normalize by mean and std
         img -= self.img_mean
         img /= self.img_std
         if not self.offload_video_to_cpu:
-            img = img.cuda()
+            img = img.to(self.compute_device)
         self.images[index] = img
         return img
 
@@ -400,6 +508,226 @@ class AsyncImageFrameLoader:
         return len(self.images)
 
 
+class StreamingVideoFileLoaderWithCV2:
+    """
+    Stream the frames of a video file with OpenCV in bounded memory.
+
+    Unlike `load_video_frames_from_video_file_using_cv2`, which decodes the whole
+    video upfront, this class only holds up to `max_buffered_frames` normalized
+    frames. A background thread decodes the frames ahead of the last accessed frame
+    (in the current propagation direction), and the frames that the propagation has
+    already passed are evicted first. Any other frame (e.g. when the user jumps to a
+    frame to add prompts) is decoded on demand by seeking the video.
+
+    Frames are decoded in ascending order in chunks of `max_buffered_frames // 4`, so
+    that propagating backward only seeks the video once per chunk. Note that seeking
+    may be inexact for videos without regular keyframes, in which case the eager cv2
+    loader or the TorchCodec loader should be used.
+    """
+
+    def __init__(
+        self,
+        video_path,
+        image_size,
+        offload_video_to_cpu,
+        img_mean,
+        img_std,
+        max_buffered_frames=64,
+        compute_device=torch.device("cuda"),
+    ):
+        import cv2  # delay OpenCV import to avoid unnecessary dependency
+
+        assert max_buffered_frames >= 4, "need at least 4 buffered frames"
+        self.video_path = video_path
+        self.image_size = image_size
+        self.offload_video_to_cpu = offload_video_to_cpu
+        compute_device = torch.device(compute_device)
+        self.out_device = (
+            torch.device("cpu") if offload_video_to_cpu else compute_device
+        )
+        self.storage_dtype = get_frame_storage_dtype(compute_device)
+        self.img_mean = torch.tensor(img_mean, dtype=torch.float32)[:, None, None]
+        self.img_std = torch.tensor(img_std, dtype=torch.float32)[:, None, None]
+        self.max_buffered_frames = max_buffered_frames
+        self.chunk_size = max_buffered_frames // 4
+        # frames to prefetch ahead of the last accessed frame, leaving room in the
+        # buffer for the frames behind it and a chunk being decoded
+        self.lookahead = max_buffered_frames - 2 * self.chunk_size
+        # catch and raise any exceptions in the prefetching thread
+        self.exception = None
+
+        self._start()
+        self.video_height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.video_width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.num_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if self.num_frames <= 0:
+            # the container doesn't store the frame count, so we count the frames
+            with self._cap_lock:
+                self.num_frames = 0
+                while self._cap.grab():
+                    self.num_frames += 1
+                self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        if self.num_frames == 0:
+            raise ValueError(f"No frames found in video: {video_path}")
+
+        # load the first frame to cache it (since it's most likely where the user
+        # will click) and then start prefetching the next frames
+        self.__getitem__(0)
+        self._thread.start()
+
+    def _start(self):
+        import cv2
+
+        self._cap = cv2.VideoCapture(self.video_path)
+        if not self._cap.isOpened():
+            raise ValueError(f"Could not open video: {self.video_path}")
+        # index of the next frame returned by `self._cap.read()`
+        self._cap_pos = 0
+        # `_cap_lock` serializes the decoding (OpenCV captures are not thread-safe)
+        # and `_cond` guards the buffer and the access position
+        self._cap_lock = Lock()
+        self._cond = Condition()
+        self._buffer = {}
+        self._cursor = 0
+        self._reverse = False
+        self._closed = False
+        # the thread only holds a weak reference to the loader, so that the loader
+        # and its buffer are freed when the session is closed
+        self._thread = Thread(
+            target=self._prefetch_loop, args=(weakref.ref(self),), daemon=True
+        )
+
+    def _transform_frame(self, frame):
+        import cv2
+
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        frame = cv2.resize(
+            frame, (self.image_size, self.image_size), interpolation=cv2.INTER_CUBIC
+        )
+        img = torch.from_numpy(frame).permute(2, 0, 1).float()
+        img /= 255.0
+        # normalize by mean and std
+        img -= self.img_mean
+        img /= self.img_std
+        return img.to(dtype=self.storage_dtype, device=self.out_device)
+
+    def _load_frame(self, index):
+        import cv2
+
+        with self._cap_lock:
+            with self._cond:
+                img = self._buffer.get(index)
+            if img is not None:
+                return img  # loaded by another thread while we waited for the lock
+            if self._cap_pos != index:
+                self._cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = self._cap.read()
+            if not ret:
+                raise RuntimeError(
+                    f"Failed to decode frame {index} from {self.video_path} (the "
+                    f"video has {self.num_frames} frames according to its metadata)"
+                )
+            self._cap_pos = index + 1
+            img = self._transform_frame(frame)
+            with self._cond:
+                self._buffer[index] = img
+                self._evict()
+        return img
+
+    def _evict(self):
+        """Evict the frames passed by the propagation first, then the farthest ones."""
+        while len(self._buffer) > self.max_buffered_frames:
+            cursor, reverse = self._cursor, self._reverse
+            evict_idx = max(
+                self._buffer,
+                key=lambda i: (
+                    (i > cursor) if reverse else (i < cursor),
+                    abs(i - cursor),
+                ),
+            )
+            del self._buffer[evict_idx]
+
+    def _next_frame_to_prefetch(self):
+        """The first frame to decode in the window ahead of the last accessed frame."""
+        if self._reverse:
+            # align the window to chunks so that the video is seeked once per chunk
+            begin = max(self._cursor - self.lookahead, 0)
+            begin -= begin % self.chunk_size
+            end = self._cursor + 1
+        else:
+            begin = self._cursor
+            end = min(self._cursor + self.lookahead + 1, self.num_frames)
+        for idx in range(begin, end):
+            if idx not in self._buffer:
+                return idx
+        return None
+
+    @staticmethod
+    def _prefetch_loop(loader_ref):
+        while True:
+            loader = loader_ref()
+            if loader is None or loader._closed:
+                return
+            try:
+                with loader._cond:
+                    idx = loader._next_frame_to_prefetch()
+                    if idx is None:
+                        # wait for the propagation to move on (with a timeout to
+                        # regularly release the reference to the loader)
+                        loader._cond.wait(timeout=0.1)
+                if idx is not None:
+                    with torch.inference_mode():
+                        loader._load_frame(idx)
+            except Exception as e:
+                loader.exception = e
+                raise
+            del loader
+
+    def __getitem__(self, index):
+        if self.exception is not None:
+            raise RuntimeError("Failure in frame loading thread") from self.exception
+        if index < 0:
+            index += self.num_frames
+        if index >= self.num_frames or index < 0:
+            raise IndexError(f"Index {index} is out of bounds; length is {len(self)}")
+
+        with self._cond:
+            if index != self._cursor:
+                self._reverse = index < self._cursor
+                self._cursor = index
+                self._cond.notify_all()
+            img = self._buffer.get(index)
+        if img is None:
+            img = self._load_frame(index)
+        return img
+
+    def __len__(self):
+        return self.num_frames
+
+    def close(self):
+        """Stop the prefetching thread and release the video file."""
+        self._closed = True
+        with self._cap_lock:
+            self._cap.release()
+        with self._cond:
+            self._buffer.clear()
+
+    def __getstate__(self):
+        """
+        Remove the video capture, the buffered frames and the thread during pickling,
+        so that this loader can be saved and loaded as a part of the model session.
+        """
+        state = self.__dict__.copy()
+        for key in ("_cap", "_cap_lock", "_cond", "_thread", "_buffer"):
+            state.pop(key)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._start()
+        self._thread.start()
+
+
 class TorchCodecDecoder:
     """
     A wrapper to support GPU device and num_threads in TorchCodec decoder,
@@ -501,28 +829,38 @@ class AsyncVideoFileLoaderWithTorchCodec:
         gpu_acceleration=True,
         gpu_device=None,
         use_rand_seek_in_loading=False,
+        compute_device=torch.device("cuda"),
     ):
         # Check and possibly infer the output device (and also get its GPU id when applicable)
+        compute_device = torch.device(compute_device)
         assert gpu_device is None or gpu_device.type == "cuda"
-        gpu_id = (
-            gpu_device.index
-            if gpu_device is not None and gpu_device.index is not None
-            else torch.cuda.current_device()
-        )
+        if compute_device.type != "cuda":
+            # the model runs on CPU, so the frames are decoded and kept on CPU
+            gpu_acceleration = False
+            gpu_id = None
+        else:
+            gpu_id = (
+                gpu_device.index
+                if gpu_device is not None and gpu_device.index is not None
+                else torch.cuda.current_device()
+            )
         if offload_video_to_cpu:
             out_device = torch.device("cpu")
+        elif compute_device.type != "cuda":
+            out_device = compute_device
         else:
             out_device = torch.device("cuda") if gpu_device is None else gpu_device
         self.out_device = out_device
+        self.storage_dtype = get_frame_storage_dtype(compute_device)
         self.gpu_acceleration = gpu_acceleration
         self.gpu_id = gpu_id
         self.image_size = image_size
         self.offload_video_to_cpu = offload_video_to_cpu
         if not isinstance(img_mean, torch.Tensor):
-            img_mean = torch.tensor(img_mean, dtype=torch.float16)[:, None, None]
+            img_mean = torch.tensor(img_mean, dtype=self.storage_dtype)[:, None, None]
         self.img_mean = img_mean
         if not isinstance(img_std, torch.Tensor):
-            img_std = torch.tensor(img_std, dtype=torch.float16)[:, None, None]
+            img_std = torch.tensor(img_std, dtype=self.storage_dtype)[:, None, None]
         self.img_std = img_std
 
         if gpu_acceleration:
@@ -551,7 +889,7 @@ class AsyncVideoFileLoaderWithTorchCodec:
             3,
             self.image_size,
             self.image_size,
-            dtype=torch.float16,
+            dtype=self.storage_dtype,
             device=self.out_device,
         )
         # catch and raise any exceptions in the async loading thread
@@ -652,8 +990,7 @@ class AsyncVideoFileLoaderWithTorchCodec:
             mode="bicubic",
             align_corners=False,
         )[0]
-        # float16 precision should be sufficient for image tensor storage
-        frame_resized = frame_resized.half()  # uint8 -> float16
+        frame_resized = frame_resized.to(self.storage_dtype)
         frame_resized /= 255
         frame_resized -= self.img_mean
         frame_resized /= self.img_std
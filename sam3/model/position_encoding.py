@@ -43,11 +43,20 @@ class PositionEmbeddingSine(nn.Module):
                 (precompute_resolution // 16, precompute_resolution // 16),
                 (precompute_resolution // 32, precompute_resolution // 32),
             ]
-            for size in precompute_sizes:
-                tensors = torch.zeros((1, 1) + size, device="cuda")
-                self.forward(tensors)
-                # further clone and detach it in the cache (just to be safe)
-                self.cache[size] = self.cache[size].clone().detach()
+            self.precompute(precompute_sizes)
+
+    def precompute(self, sizes, device=None):
+        """Fills the cache with the encodings of the (H, W) feature map `sizes`."""
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        for size in sizes:
+            size = tuple(size)
+            if size in self.cache:
+                continue
+            tensors = torch.zeros((1, 1) + size, device=device)
+            self.forward(tensors)
+            # further clone and detach it in the cache (just to be safe)
+            self.cache[size] = self.cache[size].clone().detach()
 
     def _encode_xy(self, x, y):
         # The positions are expected to be normalized
@@ -90,6 +99,9 @@ class PositionEmbeddingSine(nn.Module):
         cache_key = None
         cache_key = (x.shape[-2], x.shape[-1])
         if cache_key in self.cache:
+            if self.cache[cache_key].device != x.device:
+                # the cache was precomputed on another device (e.g. GPU vs CPU model)
+                self.cache[cache_key] = self.cache[cache_key].to(x.device)
             return self.cache[cache_key][None].repeat(x.shape[0], 1, 1, 1)
         y_embed = (
             torch.arange(1, x.shape[-2] + 1, dtype=torch.float32, device=x.device)
@@ -835,8 +835,11 @@ class Sam3ImageOnVideoMultiGPU(Sam3Image):
             feats = out_local["prev_encoder_out"]["backbone_out"]["sam2_backbone_out"]
             assert len(feats["backbone_fpn"]) == 3  # SAM2 backbone always have 3 levels
             # cast the SAM2 backbone features to bfloat16 for all-gather (this is usually
-            # a no-op, SAM2 backbone features are likely already in bfloat16 due to AMP)
-            backbone_fpn_bf16 = [x.to(torch.bfloat16) for x in feats["backbone_fpn"]]
+            # a no-op, SAM2 backbone features are likely already in bfloat16 due to AMP);
+            # on CPU, there is no AMP, so the features are kept in their original dtype
+            backbone_fpn_bf16 = [
+                x.to(torch.bfloat16) if x.is_cuda else x for x in feats["backbone_fpn"]
+            ]
             fpn0, fpn_handle0 = self._gather_tensor(backbone_fpn_bf16[0])
             fpn1, fpn_handle1 = self._gather_tensor(backbone_fpn_bf16[1])
             fpn2, fpn_handle2 = self._gather_tensor(backbone_fpn_bf16[2])
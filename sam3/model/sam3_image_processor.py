@@ -1,5 +1,6 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
-from typing import Dict, List
+import hashlib
+from typing import Dict, List, Optional, Sequence
 
 import numpy as np
 import PIL
@@ -8,16 +9,47 @@ import torch
 from sam3.model import box_ops
 
 from sam3.model.data_misc import FindStage, interpolate
+from sam3.model.feature_cache import cat_tensor_trees, map_tensors, TieredFeatureCache
 from torchvision.transforms import v2
 
 
 class Sam3Processor:
     """ """
 
-    def __init__(self, model, resolution=1008, device="cuda", confidence_threshold=0.5):
+    def __init__(
+        self,
+        model,
+        resolution=1008,
+        device="cuda",
+        confidence_threshold=0.5,
+        image_cache_bytes=0,
+        image_cache_offload_bytes=0,
+        resolutions: Optional[Sequence[int]] = None,
+    ):
+        """
+        Args:
+            image_cache_bytes: Memory budget of the cache of image features, keyed
+                by image content, which lets `set_image` / `set_image_batch` skip
+                the vision backbone for an image seen before (0 disables it).
+            image_cache_offload_bytes: Budget of a second, CPU tier of this cache
+                holding the features evicted from the first tier in fp16.
+            resolutions: Input resolutions supported for resolution-adaptive
+                inference. When set, each image is resized (preserving its aspect
+                ratio) so that its longest side matches the smallest of these
+                resolutions not smaller than it (or the largest one), then padded
+                to a square, instead of being stretched to `resolution` x
+                `resolution`. They must be multiples of the patch size times the
+                window size of the ViT (336 for SAM3). Note that `predict_inst`
+                only supports the default resolution.
+        """
         self.model = model
-        self.resolution = resolution
         self.device = device
+        self.resolutions = None
+        if resolutions is not None:
+            self.resolutions = sorted(set(resolutions))
+            self._check_resolutions(self.resolutions)
+            resolution = self.resolutions[-1]
+        self.resolution = resolution
         self.transform = v2.Compose(
             [
                 v2.ToDtype(torch.uint8, scale=True),
@@ -27,6 +59,14 @@ class Sam3Processor:
             ]
         )
         self.confidence_threshold = confidence_threshold
+        self.image_cache = (
+            TieredFeatureCache(
+                max_bytes=image_cache_bytes,
+                offload_max_bytes=image_cache_offload_bytes,
+            )
+            if image_cache_bytes > 0
+            else None
+        )
 
         self.find_stage = FindStage(
             img_ids=torch.tensor([0], device=device, dtype=torch.long),
@@ -38,6 +78,92 @@ class Sam3Processor:
             input_points_mask=None,
         )
 
+    def _check_resolutions(self, resolutions):
+        """Checks that the ViT can run at each resolution (full windows, and an even
+        feature map for the stride 2 level of the neck), and precomputes the
+        position encodings of their feature maps."""
+        vision_backbone = self.model.backbone.vision_backbone
+        trunk = vision_backbone.trunk
+        patch_size = trunk.patch_embed.proj.kernel_size[0]
+        window_size = max(block.window_size for block in trunk.blocks)
+        multiple = patch_size * max(window_size, 2)
+        for resolution in resolutions:
+            if resolution <= 0 or resolution % multiple != 0:
+                raise ValueError(
+                    f"Unsupported resolution {resolution}, resolutions must be "
+                    f"multiples of {multiple}"
+                )
+            feat_size = resolution // patch_size
+            vision_backbone.position_encoding.precompute(
+                [
+                    (int(feat_size * scale), int(feat_size * scale))
+                    for scale in vision_backbone.scale_factors
+                ],
+                device=self.device,
+            )
+
+    def select_resolution(self, height: int, width: int) -> int:
+        """Input resolution used for an image of the given size."""
+        if self.resolutions is None:
+            return self.resolution
+        longest_side = max(height, width)
+        for resolution in self.resolutions:
+            if resolution >= longest_side:
+                return resolution
+        return self.resolutions[-1]
+
+    def _transform_image(self, image, resolution: int) -> torch.Tensor:
+        image = v2.functional.to_image(image).to(self.device)
+        if self.resolutions is None:
+            return self.transform(image)
+        # aspect-preserving resize, then pad (bottom and right) to a square
+        height, width = image.shape[-2:]
+        scale = resolution / max(height, width)
+        new_height = min(resolution, round(height * scale))
+        new_width = min(resolution, round(width * scale))
+        image = v2.functional.to_dtype(image, torch.uint8, scale=True)
+        image = v2.functional.resize(image, [new_height, new_width])
+        image = v2.functional.to_dtype(image, torch.float32, scale=True)
+        image = v2.functional.normalize(image, mean=[0.5] * 3, std=[0.5] * 3)
+        return v2.functional.pad(
+            image, [0, 0, resolution - new_width, resolution - new_height]
+        )
+
+    @staticmethod
+    def _image_cache_key(image, resolution):
+        """Hash of the image content (and of its size and format), and of the
+        resolution at which it is processed"""
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(f"{resolution}".encode())
+        if isinstance(image, PIL.Image.Image):
+            hasher.update(f"{image.mode}{image.size}".encode())
+            hasher.update(image.tobytes())
+        else:
+            if isinstance(image, torch.Tensor):
+                image = image.detach().cpu().numpy()
+            image = np.ascontiguousarray(image)
+            hasher.update(f"{image.dtype}{image.shape}".encode())
+            hasher.update(image.data)
+        return hasher.hexdigest()
+
+    def _forward_image(self, images: torch.Tensor):
+        """Runs the vision backbone on a batch of transformed images"""
+        backbone_out = self.model.backbone.forward_image(images)
+        inst_interactivity_en = self.model.inst_interactive_predictor is not None
+        if inst_interactivity_en and "sam2_backbone_out" in backbone_out:
+            sam2_backbone_out = backbone_out["sam2_backbone_out"]
+            sam2_backbone_out["backbone_fpn"][0] = (
+                self.model.inst_interactive_predictor.model.sam_mask_decoder.conv_s0(
+                    sam2_backbone_out["backbone_fpn"][0]
+                )
+            )
+            sam2_backbone_out["backbone_fpn"][1] = (
+                self.model.inst_interactive_predictor.model.sam_mask_decoder.conv_s1(
+                    sam2_backbone_out["backbone_fpn"][1]
+                )
+            )
+        return backbone_out
+
     @torch.inference_mode()
     def set_image(self, image, state=None):
         """Sets the image on which we want to do predictions."""
@@ -51,24 +177,24 @@ class Sam3Processor:
         else:
             raise ValueError("Image must be a PIL image or a tensor")
 
-        image = v2.functional.to_image(image).to(self.device)
-        image = self.transform(image).unsqueeze(0)
-
         state["original_height"] = height
         state["original_width"] = width
-        state["backbone_out"] = self.model.backbone.forward_image(image)
-        inst_interactivity_en = self.model.inst_interactive_predictor is not None
-        if inst_interactivity_en and "sam2_backbone_out" in state["backbone_out"]:
-            sam2_backbone_out = state["backbone_out"]["sam2_backbone_out"]
-            sam2_backbone_out["backbone_fpn"][0] = (
-                self.model.inst_interactive_predictor.model.sam_mask_decoder.conv_s0(
-                    sam2_backbone_out["backbone_fpn"][0]
-                )
-            )
-            sam2_backbone_out["backbone_fpn"][1] = (
-                self.model.inst_interactive_predictor.model.sam_mask_decoder.conv_s1(
-                    sam2_backbone_out["backbone_fpn"][1]
-                )
+        resolution = self.select_resolution(height, width)
+
+        cache_key = None
+        if self.image_cache is not None:
+            cache_key = self._image_cache_key(image, resolution)
+            cached = self.image_cache.get(cache_key)
+            if cached is not None:
+                # fresh containers, since the prompts are added to `backbone_out`
+                state["backbone_out"] = map_tensors(cached, lambda x: x)
+                return state
+
+        image = self._transform_image(image, resolution).unsqueeze(0)
+        state["backbone_out"] = self._forward_image(image)
+        if cache_key is not None:
+            self.image_cache.put(
+                cache_key, map_tensors(state["backbone_out"], lambda x: x)
             )
         return state
 
@@ -87,26 +213,39 @@ class Sam3Processor:
 
         state["original_heights"] = [image.height for image in images]
         state["original_widths"] = [image.width for image in images]
+        # the images of a batch share the resolution selected for the largest one
+        resolution = max(
+            self.select_resolution(image.height, image.width) for image in images
+        )
 
-        images = [
-            self.transform(v2.functional.to_image(image).to(self.device))
-            for image in images
-        ]
-        images = torch.stack(images, dim=0)
-        state["backbone_out"] = self.model.backbone.forward_image(images)
-        inst_interactivity_en = self.model.inst_interactive_predictor is not None
-        if inst_interactivity_en and "sam2_backbone_out" in state["backbone_out"]:
-            sam2_backbone_out = state["backbone_out"]["sam2_backbone_out"]
-            sam2_backbone_out["backbone_fpn"][0] = (
-                self.model.inst_interactive_predictor.model.sam_mask_decoder.conv_s0(
-                    sam2_backbone_out["backbone_fpn"][0]
-                )
-            )
-            sam2_backbone_out["backbone_fpn"][1] = (
-                self.model.inst_interactive_predictor.model.sam_mask_decoder.conv_s1(
-                    sam2_backbone_out["backbone_fpn"][1]
-                )
-            )
+        if self.image_cache is None:
+            cache_keys = [None] * len(images)
+            per_image_out = [None] * len(images)
+        else:
+            cache_keys = [self._image_cache_key(image, resolution) for image in images]
+            per_image_out = [self.image_cache.get(key) for key in cache_keys]
+        missing = [i for i, out in enumerate(per_image_out) if out is None]
+        if len(missing) == 0:
+            state["backbone_out"] = cat_tensor_trees(per_image_out)
+            return state
+
+        # only forward the images whose features are not cached
+        batch = torch.stack(
+            [self._transform_image(images[i], resolution) for i in missing], dim=0
+        )
+        backbone_out = self._forward_image(batch)
+        if self.image_cache is None:
+            state["backbone_out"] = backbone_out
+            return state
+
+        for j, i in enumerate(missing):
+            # clone so that each entry only holds its own slice of the batch
+            per_image_out[i] = map_tensors(backbone_out, lambda x: x[j : j + 1].clone())
+            self.image_cache.put(cache_keys[i], per_image_out[i])
+        if len(missing) == len(images):
+            state["backbone_out"] = backbone_out
+        else:
+            state["backbone_out"] = cat_tensor_trees(per_image_out)
         return state
 
     @torch.inference_mode()
@@ -117,13 +256,53 @@ class Sam3Processor:
             raise ValueError("You must call set_image before set_text_prompt")
 
         text_outputs = self.model.backbone.forward_text([prompt], device=self.device)
-        # will erase the previous text prompt if any
+        # will erase the previous text prompt(s) if any
         state["backbone_out"].update(text_outputs)
+        state.pop("prompts", None)
+        state.pop("batch_prompts", None)
         if "geometric_prompt" not in state:
             state["geometric_prompt"] = self.model._get_dummy_prompt()
 
         return self._forward_grounding(state)
 
+    @torch.inference_mode()
+    def set_text_prompts(self, prompts: List[str], state: Dict):
+        """Searches the image for several text prompts at once.
+        The N prompts are batched through a single grounding pass over the image
+        features instead of calling `set_text_prompt` N times.
+        The outputs ("boxes", "masks", "masks_logits", "scores") are lists with one
+        entry per prompt, in the order of `prompts`."""
+
+        if "backbone_out" not in state or "original_height" not in state:
+            raise ValueError("You must call set_image before set_text_prompts")
+        if len(prompts) == 0:
+            raise ValueError("At least one prompt must be provided")
+
+        state.pop("batch_prompts", None)
+        # recorded so that the prompts can be re-run, e.g. by `set_confidence_threshold`
+        state["prompts"] = list(prompts)
+        return self._forward_grounding_prompts(state)
+
+    @torch.inference_mode()
+    def set_text_prompt_batch(self, prompts: List[str], state: Dict):
+        """Sets one text prompt per image of a batch set with `set_image_batch` and
+        runs the inference for the whole batch in a single grounding pass.
+        The outputs ("boxes", "masks", "masks_logits", "scores") are lists with one
+        entry per image."""
+
+        if "backbone_out" not in state or "original_heights" not in state:
+            raise ValueError(
+                "You must call set_image_batch before set_text_prompt_batch"
+            )
+        num_images = len(state["original_heights"])
+        if len(prompts) != num_images:
+            raise ValueError(f"Expected {num_images} prompts, got {len(prompts)}")
+
+        state.pop("prompts", None)
+        # recorded so that the prompts can be re-run, e.g. by `set_confidence_threshold`
+        state["batch_prompts"] = list(prompts)
+        return self._forward_grounding_prompts(state)
+
     @torch.inference_mode()
     def add_geometric_prompt(self, box: List, label: bool, state: Dict):
         """Adds a box prompt and run the inference.
@@ -133,6 +312,13 @@ class Sam3Processor:
         """
         if "backbone_out" not in state:
             raise ValueError("You must call set_image before set_text_prompt")
+        if "original_height" not in state:
+            raise ValueError("Geometric prompts are not supported on image batches")
+        if "prompts" in state:
+            raise ValueError(
+                "Geometric prompts cannot be combined with the prompts of "
+                "set_text_prompts, call reset_all_prompts first"
+            )
 
         if "language_features" not in state["backbone_out"]:
             # Looks like we don't have a text prompt yet. This is allowed, but we need to set the text prompt to "visual" for the model to rely only on the geometric prompt
@@ -146,6 +332,15 @@ class Sam3Processor:
 
         # adding a batch and sequence dimension
         boxes = torch.tensor(box, device=self.device, dtype=torch.float32).view(1, 1, 4)
+        if self.resolutions is not None:
+            # normalize w.r.t. the padded square image seen by the model
+            img_h, img_w = state["original_height"], state["original_width"]
+            longest_side = max(img_h, img_w)
+            boxes = (
+                boxes
+                * torch.tensor([img_w, img_h, img_w, img_h], device=self.device)
+                / longest_side
+            )
         labels = torch.tensor([label], device=self.device, dtype=torch.bool).view(1, 1)
         state["geometric_prompt"].append_boxes(boxes, labels)
 
@@ -163,7 +358,15 @@ class Sam3Processor:
                 if key in state["backbone_out"]:
                     del state["backbone_out"][key]
 
-        keys_to_del = ["geometric_prompt", "boxes", "masks", "masks_logits", "scores"]
+        keys_to_del = [
+            "geometric_prompt",
+            "boxes",
+            "masks",
+            "masks_logits",
+            "scores",
+            "prompts",
+            "batch_prompts",
+        ]
         for key in keys_to_del:
             if key in state:
                 del state[key]
@@ -176,11 +379,77 @@ class Sam3Processor:
             # we need to filter the boxes again
             # In principle we could do this more efficiently since we would only need
             # to rerun the heads. But this is simpler and not too inefficient
+            if "prompts" in state or "batch_prompts" in state:
+                return self._forward_grounding_prompts(state)
             return self._forward_grounding(state)
         return state
 
+    def _forward_grounding_prompts(self, state: Dict):
+        """Grounds the text prompts recorded in the state, either by `set_text_prompts`
+        (all on the image) or by `set_text_prompt_batch` (one per image of the batch),
+        with one entry per prompt in the outputs."""
+        if "batch_prompts" in state:
+            prompts = state["batch_prompts"]
+            img_ids = list(range(len(prompts)))
+            img_sizes = list(zip(state["original_heights"], state["original_widths"]))
+        else:
+            prompts = state["prompts"]
+            img_ids = [0] * len(prompts)
+            img_sizes = [(state["original_height"], state["original_width"])] * len(
+                prompts
+            )
+        results = self._forward_grounding_batch(state, prompts, img_ids, img_sizes)
+        for key in ["masks_logits", "masks", "boxes", "scores"]:
+            state[key] = [res[key] for res in results]
+        return state
+
+    @torch.inference_mode()
+    def _forward_grounding_batch(
+        self, state: Dict, prompts: List[str], img_ids: List[int], img_sizes: List
+    ):
+        """Runs one grounding pass for a batch of (image, text prompt) queries.
+        Query i grounds `prompts[i]` on image `img_ids[i]` of the backbone output,
+        whose original size is `img_sizes[i]` = (height, width).
+        Returns the post-processed outputs of each query."""
+        num_queries = len(prompts)
+        # encode each distinct prompt only once, queries index into them via text_ids
+        unique_prompts = list(dict.fromkeys(prompts))
+        text_outputs = self.model.backbone.forward_text(
+            unique_prompts, device=self.device
+        )
+        # will erase the previous text prompt if any
+        state["backbone_out"].update(text_outputs)
+        find_stage = FindStage(
+            img_ids=torch.tensor(img_ids, device=self.device, dtype=torch.long),
+            text_ids=torch.tensor(
+                [unique_prompts.index(p) for p in prompts],
+                device=self.device,
+                dtype=torch.long,
+            ),
+            input_boxes=None,
+            input_boxes_mask=None,
+            input_boxes_label=None,
+            input_points=None,
+            input_points_mask=None,
+        )
+        outputs = self.model.forward_grounding(
+            backbone_out=state["backbone_out"],
+            find_input=find_stage,
+            # not stored in the state, its batch size is specific to this query batch
+            geometric_prompt=self.model._get_dummy_prompt(num_prompts=num_queries),
+            find_target=None,
+        )
+        return [
+            self._postprocess_grounding(outputs, i, img_h, img_w)
+            for i, (img_h, img_w) in enumerate(img_sizes)
+        ]
+
     @torch.inference_mode()
     def _forward_grounding(self, state: Dict):
+        if "original_height" not in state:
+            raise ValueError(
+                "The state holds an image batch, use set_text_prompt_batch instead"
+            )
         outputs = self.model.forward_grounding(
             backbone_out=state["backbone_out"],
             find_input=self.find_stage,
@@ -188,11 +457,21 @@ class Sam3Processor:
             find_target=None,
         )
 
-        out_bbox = outputs["pred_boxes"]
-        out_logits = outputs["pred_logits"]
-        out_masks = outputs["pred_masks"]
+        state.update(
+            self._postprocess_grounding(
+                outputs, 0, state["original_height"], state["original_width"]
+            )
+        )
+        return state
+
+    def _postprocess_grounding(self, outputs: Dict, batch_idx: int, img_h, img_w):
+        """Filters the predictions of one image of the batch by confidence and
+        rescales the boxes and masks to the original image size."""
+        out_bbox = outputs["pred_boxes"][batch_idx]
+        out_logits = outputs["pred_logits"][batch_idx]
+        out_masks = outputs["pred_masks"][batch_idx]
         out_probs = out_logits.sigmoid()
-        presence_score = outputs["presence_logit_dec"].sigmoid().unsqueeze(1)
+        presence_score = outputs["presence_logit_dec"][batch_idx].sigmoid()
         out_probs = (out_probs * presence_score).squeeze(-1)
 
         keep = out_probs > self.confidence_threshold
@@ -203,20 +482,31 @@ class Sam3Processor:
         # convert to [x0, y0, x1, y1] format
         boxes = box_ops.box_cxcywh_to_xyxy(out_bbox)
 
-        img_h = state["original_height"]
-        img_w = state["original_width"]
-        scale_fct = torch.tensor([img_w, img_h, img_w, img_h]).to(self.device)
-        boxes = boxes * scale_fct[None, :]
-
-        out_masks = interpolate(
-            out_masks.unsqueeze(1),
-            (img_h, img_w),
-            mode="bilinear",
-            align_corners=False,
-        ).sigmoid()
-
-        state["masks_logits"] = out_masks
-        state["masks"] = out_masks > 0.5
-        state["boxes"] = boxes
-        state["scores"] = out_probs
-        return state
+        if self.resolutions is None:
+            scale_fct = torch.tensor([img_w, img_h, img_w, img_h]).to(self.device)
+            boxes = boxes * scale_fct[None, :]
+            out_masks = interpolate(
+                out_masks.unsqueeze(1),
+                (img_h, img_w),
+                mode="bilinear",
+                align_corners=False,
+            ).sigmoid()
+        else:
+            # the predictions are relative to the padded square image
+            longest_side = max(img_h, img_w)
+            boxes = boxes * longest_side
+            boxes[:, 0::2] = boxes[:, 0::2].clamp(0, img_w)
+            boxes[:, 1::2] = boxes[:, 1::2].clamp(0, img_h)
+            out_masks = interpolate(
+                out_masks.unsqueeze(1),
+                (longest_side, longest_side),
+                mode="bilinear",
+                align_corners=False,
+            )[..., :img_h, :img_w].sigmoid()
+
+        return {
+            "masks_logits": out_masks,
+            "masks": out_masks > 0.5,
+            "boxes": boxes,
+            "scores": out_probs,
+        }
@@ -4,6 +4,7 @@ import logging
 from collections import OrderedDict
 
 import torch
+from sam3.model.feature_cache import TieredFeatureCache
 
 from sam3.model.sam3_tracker_base import concat_points, NO_OBJ_SCORE, Sam3TrackerBase
 from sam3.model.sam3_tracker_utils import fill_holes_in_mask_scores
@@ -11,6 +12,10 @@ from sam3.model.utils.sam2_utils import load_video_frames
 from tqdm.auto import tqdm
 
 
+# key of the LRU cache of per-frame backbone features in `inference_state["cached_features"]`
+FRAME_FEATURE_CACHE_KEY = "frame_feature_cache"
+
+
 class Sam3TrackerPredictor(Sam3TrackerBase):
     """
     The demo class that extends the `Sam3TrackerBase` to handle user interactions
@@ -35,6 +40,12 @@ class Sam3TrackerPredictor(Sam3TrackerBase):
         # - if it's set to 0 or negative, this option is turned off and we use all points in the prompt encoder
         max_point_num_in_prompt_enc=16,
         non_overlap_masks_for_output=True,
+        # memory budget (in bytes) of an LRU cache of the backbone features of recently visited frames, so that
+        # revisiting a frame (e.g. adding clicks on several frames back and forth) doesn't rerun the image backbone
+        # (0 disables it and only the features of the most recent frame are kept)
+        frame_feature_cache_bytes=0,
+        # budget (in bytes) of a second, CPU tier of this cache, holding the features evicted from the first tier in fp16
+        frame_feature_cache_offload_bytes=0,
         # checkpoint_file=None,
         **kwargs,
     ):
@@ -45,9 +56,12 @@ class Sam3TrackerPredictor(Sam3TrackerBase):
         self.always_start_from_first_ann_frame = always_start_from_first_ann_frame
         self.max_point_num_in_prompt_enc = max_point_num_in_prompt_enc
         self.non_overlap_masks_for_output = non_overlap_masks_for_output
+        self.frame_feature_cache_bytes = frame_feature_cache_bytes
+        self.frame_feature_cache_offload_bytes = frame_feature_cache_offload_bytes
 
         self.bf16_context = torch.autocast(device_type="cuda", dtype=torch.bfloat16)
-        self.bf16_context.__enter__()  # keep using for the entire model process
+        if torch.cuda.is_available():
+            self.bf16_context.__enter__()  # keep using for the entire model process
 
         self.iter_use_prev_mask_pred = True
         self.add_all_frames_to_correct_as_cond = True
@@ -78,7 +92,7 @@ class Sam3TrackerPredictor(Sam3TrackerBase):
         if offload_state_to_cpu:
             inference_state["storage_device"] = torch.device("cpu")
         else:
-            inference_state["storage_device"] = torch.device("cuda")
+            inference_state["storage_device"] = self.device
 
         if video_path is not None:
             images, video_height, video_width = load_video_frames(
@@ -300,7 +314,9 @@ class Sam3TrackerPredictor(Sam3TrackerBase):
                     prev_out = obj_output_dict["non_cond_frame_outputs"].get(frame_idx)
 
             if prev_out is not None and prev_out["pred_masks"] is not None:
-                prev_sam_mask_logits = prev_out["pred_masks"].cuda(non_blocking=True)
+                prev_sam_mask_logits = prev_out["pred_masks"].to(
+                    inference_state["device"], non_blocking=True
+                )
                 # Clamp the scale of prev_sam_mask_logits to avoid rare numerical issues.
                 prev_sam_mask_logits = torch.clamp(prev_sam_mask_logits, -32.0, 32.0)
         current_out, _ = self._run_single_frame_inference(
@@ -1009,12 +1025,30 @@ class Sam3TrackerPredictor(Sam3TrackerBase):
         inference_state["frames_already_tracked"].clear()
         inference_state["first_ann_frame_idx"] = None
 
+    def get_frame_feature_cache(self, cached_features, create=True):
+        """
+        Get the LRU cache of per-frame backbone features kept in `cached_features`
+        (the dict of cached features of an inference state, which may be shared with
+        other inference states), creating it if needed. Returns None if it's disabled.
+        """
+        frame_cache = cached_features.get(FRAME_FEATURE_CACHE_KEY)
+        if frame_cache is None and create and self.frame_feature_cache_bytes > 0:
+            frame_cache = TieredFeatureCache(
+                max_bytes=self.frame_feature_cache_bytes,
+                offload_max_bytes=self.frame_feature_cache_offload_bytes,
+            )
+            cached_features[FRAME_FEATURE_CACHE_KEY] = frame_cache
+        return frame_cache
+
     def _get_image_feature(self, inference_state, frame_idx, batch_size):
         """Compute the image features on a given frame."""
         # Look up in the cache
         image, backbone_out = inference_state["cached_features"].get(
             frame_idx, (None, None)
         )
+        frame_cache = self.get_frame_feature_cache(inference_state["cached_features"])
+        if backbone_out is None and frame_cache is not None:
+            image, backbone_out = frame_cache.get(frame_idx, (None, None))
         if backbone_out is None:
             if self.backbone is None:
                 raise RuntimeError(
@@ -1023,11 +1057,21 @@ class Sam3TrackerPredictor(Sam3TrackerBase):
                 )
             else:
                 # Cache miss -- we will run inference on a single image
-                image = inference_state["images"][frame_idx].cuda().float().unsqueeze(0)
+                image = (
+                    inference_state["images"][frame_idx]
+                    .to(inference_state["device"])
+                    .float()
+                    .unsqueeze(0)
+                )
                 backbone_out = self.forward_image(image)
-                # Cache the most recent frame's feature (for repeated interactions with
-                # a frame; we can use an LRU cache for more frames in the future).
-                inference_state["cached_features"] = {frame_idx: (image, backbone_out)}
+                if frame_cache is not None:
+                    frame_cache.put(frame_idx, (image, backbone_out))
+                else:
+                    # Cache the most recent frame's feature (for repeated interactions
+                    # with a frame).
+                    inference_state["cached_features"] = {
+                        frame_idx: (image, backbone_out)
+                    }
         if "tracker_backbone_out" in backbone_out:
             backbone_out = backbone_out["tracker_backbone_out"]  # get backbone output
 
@@ -1095,7 +1139,7 @@ class Sam3TrackerPredictor(Sam3TrackerBase):
         storage_device = inference_state["storage_device"]
         maskmem_features = current_out["maskmem_features"]
         if maskmem_features is not None:
-            maskmem_features = maskmem_features.to(torch.bfloat16)
+            maskmem_features = self._to_memory_storage_dtype(maskmem_features)
             maskmem_features = maskmem_features.to(storage_device, non_blocking=True)
         pred_masks_gpu = current_out["pred_masks"]
         pred_masks = pred_masks_gpu.to(storage_device, non_blocking=True)
@@ -1146,7 +1190,7 @@ class Sam3TrackerPredictor(Sam3TrackerBase):
 
         # optionally offload the output to CPU memory to save GPU space
         storage_device = inference_state["storage_device"]
-        maskmem_features = maskmem_features.to(torch.bfloat16)
+        maskmem_features = self._to_memory_storage_dtype(maskmem_features)
         maskmem_features = maskmem_features.to(storage_device, non_blocking=True)
         # "maskmem_pos_enc" is the same across frames, so we only need to store one copy of it
         maskmem_pos_enc = self._get_maskmem_pos_enc(
@@ -1154,6 +1198,15 @@ class Sam3TrackerPredictor(Sam3TrackerBase):
         )
         return maskmem_features, maskmem_pos_enc
 
+    @staticmethod
+    def _to_memory_storage_dtype(maskmem_features):
+        """Memory features are stored in bfloat16 on GPU, where the model runs under
+        AMP. On CPU, they are kept in float32 to avoid slow conversions (and dtype
+        mismatches, since the model runs without autocast there)."""
+        if maskmem_features.is_cuda:
+            return maskmem_features.to(torch.bfloat16)
+        return maskmem_features
+
     def _get_maskmem_pos_enc(self, inference_state, current_out):
         """
         `maskmem_pos_enc` is the same across frames and objects, so we cache it as
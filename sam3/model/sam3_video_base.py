@@ -318,6 +318,7 @@ class Sam3VideoBase(nn.Module):
         feature_cache: Dict,
         reverse: bool,
         allow_new_detections: bool,
+        cache_frame_features: bool = False,
     ):
         # Step 1: if text feature is not cached in `feature_cache`, compute and cache it
         text_batch_key = tuple(input_batch.find_text_batch)
@@ -394,6 +395,13 @@ class Sam3VideoBase(nn.Module):
             input_batch.img_batch[frame_idx],
             backbone_cache,
         )
+        # only keep the features in the frame feature cache on the interactive paths
+        # (propagation never revisits a frame, so caching there would only cost the
+        # offloading of the older frames)
+        if cache_frame_features:
+            frame_cache = self.tracker.get_frame_feature_cache(feature_cache)
+            if frame_cache is not None:
+                frame_cache.put(frame_idx, feature_cache[frame_idx])
         # remove from `feature_cache` old features to save GPU memory
         feature_cache.pop(frame_idx - 1 if not reverse else frame_idx + 1, None)
         return det_out
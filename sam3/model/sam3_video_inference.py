@@ -57,6 +57,7 @@ class Sam3VideoInference(Sam3VideoBase):
         offload_video_to_cpu=False,
         async_loading_frames=False,
         video_loader_type="cv2",
+        frame_store=None,
     ):
         """Initialize an inference state from `resource_path` (an image or a video)."""
         images, orig_height, orig_width = load_resource_as_video_frames(
@@ -67,6 +68,8 @@ class Sam3VideoInference(Sam3VideoBase):
             img_std=self.image_std,
             async_loading_frames=async_loading_frames,
             video_loader_type=video_loader_type,
+            compute_device=self.device,
+            frame_store=frame_store,
         )
         inference_state = {}
         inference_state["image_size"] = self.image_size
@@ -477,9 +480,11 @@ class Sam3VideoInference(Sam3VideoBase):
 
             # slice those valid entries from the original outputs
             keep_idx = torch.nonzero(keep, as_tuple=True)[0]
-            keep_idx_gpu = keep_idx.pin_memory().to(
-                device=out_binary_masks.device, non_blocking=True
-            )
+            keep_idx_gpu = keep_idx
+            if out_binary_masks.is_cuda:
+                keep_idx_gpu = keep_idx.pin_memory().to(
+                    device=out_binary_masks.device, non_blocking=True
+                )
 
             out_obj_ids = torch.index_select(out_obj_ids, 0, keep_idx)
             out_probs = torch.index_select(out_probs, 0, keep_idx)
@@ -1334,10 +1339,22 @@ class Sam3VideoInferenceWithInstanceInteractivity(Sam3VideoInference):
         ]
         return states
 
-    def _prepare_backbone_feats(self, inference_state, frame_idx, reverse):
+    def _prepare_backbone_feats(
+        self, inference_state, frame_idx, reverse, cache_frame_features=False
+    ):
         input_batch = inference_state["input_batch"]
         feature_cache = inference_state["feature_cache"]
         num_frames = inference_state["num_frames"]
+        # only the backbone features are needed here, so we can skip the backbone
+        # and detector on a frame visited recently (on a single GPU, as the ranks
+        # need to run the detector together otherwise)
+        frame_cache = self.tracker.get_frame_feature_cache(feature_cache)
+        if frame_cache is not None and self.world_size == 1:
+            cached = frame_cache.get(frame_idx)
+            if cached is not None:
+                feature_cache[frame_idx] = cached
+                feature_cache.pop(frame_idx - 1 if not reverse else frame_idx + 1, None)
+                return
         geometric_prompt = (
             inference_state["constants"]["empty_geometric_prompt"]
             if inference_state["per_frame_geometric_prompt"][frame_idx] is None
@@ -1351,6 +1368,7 @@ class Sam3VideoInferenceWithInstanceInteractivity(Sam3VideoInference):
             feature_cache=feature_cache,
             reverse=reverse,
             allow_new_detections=True,
+            cache_frame_features=cache_frame_features,
         )
 
     @torch.inference_mode()
@@ -1419,7 +1437,9 @@ class Sam3VideoInferenceWithInstanceInteractivity(Sam3VideoInference):
         obj_rank = self._get_gpu_id_by_obj_id(inference_state, obj_id)
 
         # prepare feature
-        self._prepare_backbone_feats(inference_state, frame_idx, reverse=False)
+        self._prepare_backbone_feats(
+            inference_state, frame_idx, reverse=False, cache_frame_features=True
+        )
 
         object_has_been_refined = self._has_object_been_refined(inference_state, obj_id)
         if (
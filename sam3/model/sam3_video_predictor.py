@@ -16,6 +16,7 @@ import psutil
 import torch
 
 from sam3.logger import get_logger
+from sam3.model.frame_store import FrameStore
 
 logger = get_logger(__name__)
 
@@ -34,23 +35,42 @@ class Sam3VideoPredictor:
         async_loading_frames=False,
         video_loader_type="cv2",
         apply_temporal_disambiguation: bool = True,
+        frame_feature_cache_mb: int = 1024,
+        frame_feature_cache_offload_mb: int = 2048,
+        device=None,
+        frame_store_dir: Optional[str] = None,
+        frame_store_max_gb: float = 50.0,
     ):
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = torch.device(device)
         self.async_loading_frames = async_loading_frames
         self.video_loader_type = video_loader_type
+        # an on-disk cache of preprocessed frames, so that sessions on an already
+        # opened video skip decoding it (shared by all the processes using this dir)
+        self.frame_store = None
+        if frame_store_dir is not None:
+            self.frame_store = FrameStore(
+                frame_store_dir, max_bytes=int(frame_store_max_gb * 1024**3)
+            )
         from sam3.model_builder import build_sam3_video_model
 
-        self.model = (
-            build_sam3_video_model(
-                checkpoint_path=checkpoint_path,
-                bpe_path=bpe_path,
-                has_presence_token=has_presence_token,
-                geo_encoder_use_img_cross_attn=geo_encoder_use_img_cross_attn,
-                strict_state_dict_loading=strict_state_dict_loading,
-                apply_temporal_disambiguation=apply_temporal_disambiguation,
-            )
-            .cuda()
-            .eval()
-        )
+        if self.device.type != "cuda":
+            # the features already live in CPU memory, so a CPU offload tier (in
+            # fp16, which is slow on CPU) would be pointless: use a single tier
+            frame_feature_cache_mb += frame_feature_cache_offload_mb
+            frame_feature_cache_offload_mb = 0
+        self.model = build_sam3_video_model(
+            checkpoint_path=checkpoint_path,
+            bpe_path=bpe_path,
+            has_presence_token=has_presence_token,
+            geo_encoder_use_img_cross_attn=geo_encoder_use_img_cross_attn,
+            strict_state_dict_loading=strict_state_dict_loading,
+            apply_temporal_disambiguation=apply_temporal_disambiguation,
+            device=self.device,
+            frame_feature_cache_bytes=frame_feature_cache_mb * 1024**2,
+            frame_feature_cache_offload_bytes=frame_feature_cache_offload_mb * 1024**2,
+        ).eval()
 
     @torch.inference_mode()
     def handle_request(self, request):
@@ -114,6 +134,7 @@ class Sam3VideoPredictor:
             resource_path=resource_path,
             async_loading_frames=self.async_loading_frames,
             video_loader_type=self.video_loader_type,
+            frame_store=self.frame_store,
         )
         if not session_id:
             session_id = str(uuid.uuid4())
@@ -262,9 +283,15 @@ class Sam3VideoPredictor:
         """Get a statistics string for live sessions and their GPU usage."""
         # print both the session ids and their video frame numbers
         live_session_strs = [
-            f"'{session_id}' ({session['state']['num_frames']} frames)"
+            f"'{session_id}' ({session['state']['num_frames']} frames"
+            f"{self._get_frame_feature_cache_stats(session['state'])})"
             for session_id, session in self._ALL_INFERENCE_STATES.items()
         ]
+        if self.device.type != "cuda":
+            return (
+                f"live sessions: [{', '.join(live_session_strs)}], CPU memory: "
+                f"{psutil.Process().memory_info().rss // 1024**2} MiB used"
+            )
         session_stats_str = (
             f"live sessions: [{', '.join(live_session_strs)}], GPU memory: "
             f"{torch.cuda.memory_allocated() // 1024**2} MiB used and "
@@ -274,8 +301,31 @@ class Sam3VideoPredictor:
         )
         return session_stats_str
 
+    def _get_frame_feature_cache_stats(self, inference_state):
+        """Get a statistics string for the frame feature cache of a session."""
+        frame_cache = self.model.tracker.get_frame_feature_cache(
+            inference_state["feature_cache"], create=False
+        )
+        if frame_cache is None:
+            return ""
+        stats = frame_cache.stats()
+        stats_str = (
+            f", feature cache: {stats['primary']['entries']} frames "
+            f"({stats['primary']['bytes'] // 1024**2} MiB)"
+        )
+        if "offload" in stats:
+            stats_str += (
+                f" + {stats['offload']['entries']} offloaded "
+                f"({stats['offload']['bytes'] // 1024**2} MiB)"
+            )
+        return stats_str + f", hit rate {stats['hit_rate']:.1%}"
+
     def _get_torch_and_gpu_properties(self):
         """Get a string for PyTorch and GPU properties (for logging and debugging)."""
+        if self.device.type != "cuda":
+            return (
+                f"torch: {torch.__version__} on CPU ({torch.get_num_threads()} threads)"
+            )
         torch_and_gpu_str = (
             f"torch: {torch.__version__} with CUDA arch {torch.cuda.get_arch_list()}, "
             f"GPU device: {torch.cuda.get_device_properties(torch.cuda.current_device())}"
@@ -315,7 +365,7 @@ class Sam3VideoPredictorMultiGPU(Sam3VideoPredictor):
             logger.info("\n\n\n\t*** START loading model on all ranks ***\n\n")
 
         logger.info(f"loading model on {self.rank_str} -- this could take a while ...")
-        super().__init__(*model_args, **model_kwargs)
+        super().__init__(*model_args, device=self.device, **model_kwargs)
         logger.info(f"loading model on {self.rank_str} -- DONE locally")
 
         if self.world_size > 1 and self.rank == 0:
@@ -8,22 +8,34 @@ from open_clip and openAI CLIP.
 """
 
 import gzip
+import hashlib
 import html
 import io
+import multiprocessing as mp
 import os
+import pickle
 import string
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from functools import lru_cache
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
 import ftfy
 import regex as re
 import torch
 from iopath.common.file_io import g_pathmgr
+from sam3.logger import get_logger
 
+logger = get_logger(__name__)
 
 # https://stackoverflow.com/q/62691279
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 DEFAULT_CONTEXT_LENGTH = 77
+DEFAULT_MERGES_CACHE_DIR = os.environ.get(
+    "SAM3_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sam3")
+)
+# a batch is only split across the worker processes above this number of texts
+_MIN_TEXTS_FOR_WORKERS = 256
 
 
 @lru_cache()
@@ -65,6 +77,44 @@ def get_pairs(word):
     return pairs
 
 
+def load_bpe_merges(
+    bpe_path: Union[str, os.PathLike], cache_dir: Optional[str] = None
+) -> List[Tuple[str, str]]:
+    """
+    Load the BPE merges from the gzipped merges file. When `cache_dir` is given, the
+    decompressed merges are stored there once (keyed by the hash of the file) and
+    loaded from this binary on the next calls, skipping the decompression and parsing.
+    """
+    with g_pathmgr.open(bpe_path, "rb") as fh:
+        bpe_bytes = fh.read()
+    cache_path = None
+    if cache_dir is not None:
+        digest = hashlib.blake2b(bpe_bytes, digest_size=16).hexdigest()
+        cache_path = os.path.join(cache_dir, f"bpe_merges_{digest}.pkl")
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    merges = gzip.open(io.BytesIO(bpe_bytes)).read().decode("utf-8").split("\n")
+    merges = merges[1 : 49152 - 256 - 2 + 1]
+    merges = [tuple(merge.split()) for merge in merges]
+
+    if cache_path is not None:
+        # write to a temporary file and then rename it, so that concurrent processes
+        # never load a partially written cache
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(merges, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"could not cache the BPE merges in {cache_dir}: {e}")
+    return merges
+
+
 def basic_clean(text):
     text = ftfy.fix_text(text)
     text = html.unescape(html.unescape(text))
@@ -125,6 +175,18 @@ def canonicalize_text(text, *, keep_punctuation_exact_string=None):
     return text.strip()
 
 
+_WORKER_TOKENIZER = None
+
+
+def _init_worker(tokenizer_kwargs):
+    global _WORKER_TOKENIZER
+    _WORKER_TOKENIZER = SimpleTokenizer(**tokenizer_kwargs)
+
+
+def _encode_in_worker(texts):
+    return [_WORKER_TOKENIZER.encode(text) for text in texts]
+
+
 class SimpleTokenizer(object):
     def __init__(
         self,
@@ -132,15 +194,30 @@ class SimpleTokenizer(object):
         additional_special_tokens: Optional[List[str]] = None,
         context_length: Optional[int] = DEFAULT_CONTEXT_LENGTH,
         clean: str = "lower",
+        bpe_cache_size: int = 100_000,
+        merges_cache_dir: Optional[str] = DEFAULT_MERGES_CACHE_DIR,
+        num_workers: int = 0,
     ):
+        """
+        Args:
+            bpe_cache_size: maximum number of words whose BPE tokens are kept in an
+                LRU cache
+            merges_cache_dir: directory where the decompressed BPE merges are cached
+                (None to always decompress the merges file)
+            num_workers: number of processes used to tokenize large batches of texts
+                (0 to always tokenize in the calling process)
+        """
+        self._init_kwargs = dict(
+            bpe_path=bpe_path,
+            additional_special_tokens=additional_special_tokens,
+            context_length=context_length,
+            clean=clean,
+            bpe_cache_size=bpe_cache_size,
+            merges_cache_dir=merges_cache_dir,
+        )
         self.byte_encoder = bytes_to_unicode()
         self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
-        with g_pathmgr.open(bpe_path, "rb") as fh:
-            bpe_bytes = io.BytesIO(fh.read())
-            merges = gzip.open(bpe_bytes).read().decode("utf-8").split("\n")
-        # merges = gzip.open(bpe_path).read().decode("utf-8").split("\n")
-        merges = merges[1 : 49152 - 256 - 2 + 1]
-        merges = [tuple(merge.split()) for merge in merges]
+        merges = load_bpe_merges(bpe_path, merges_cache_dir)
         vocab = list(bytes_to_unicode().values())
         vocab = vocab + [v + "</w>" for v in vocab]
         for merge in merges:
@@ -152,7 +229,16 @@ class SimpleTokenizer(object):
         self.encoder = dict(zip(vocab, range(len(vocab))))
         self.decoder = {v: k for k, v in self.encoder.items()}
         self.bpe_ranks = dict(zip(merges, range(len(merges))))
-        self.cache = {t: t for t in special_tokens}
+        # the merges over token ids: (first id, second id) -> (rank, merged id)
+        self.bpe_id_merges = {
+            (self.encoder[first], self.encoder[second]): (
+                rank,
+                self.encoder[first + second],
+            )
+            for (first, second), rank in self.bpe_ranks.items()
+        }
+        self.special_token_ids = {t: (self.encoder[t],) for t in special_tokens}
+        self._bpe_ids_cached = lru_cache(maxsize=bpe_cache_size)(self._bpe_ids)
         special = "|".join(special_tokens)
         self.pat = re.compile(
             special + r"""|'s|'t|'re|'ve|'m|'ll|'d|[\p{L}]+|[\p{N}]|[^\s\p{L}\p{N}]+""",
@@ -164,55 +250,86 @@ class SimpleTokenizer(object):
         self.eot_token_id = self.all_special_ids[1]
         self.context_length = context_length
         self.clean_fn = get_clean_fn(clean)
+        self.num_workers = num_workers
+        self._pool = None
 
-    def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
-        word = tuple(token[:-1]) + (token[-1] + "</w>",)
-        pairs = get_pairs(word)
-        if not pairs:
-            return token + "</w>"
-        while True:
-            bigram = min(pairs, key=lambda pair: self.bpe_ranks.get(pair, float("inf")))
-            if bigram not in self.bpe_ranks:
+    def __getstate__(self):
+        # the LRU cache and the worker processes are not picklable, the tokenizer is
+        # rebuilt from its arguments instead (which is fast with the cached merges)
+        return {"init_kwargs": self._init_kwargs, "num_workers": self.num_workers}
+
+    def __setstate__(self, state):
+        self.__init__(**state["init_kwargs"], num_workers=state["num_workers"])
+
+    def _bpe_ids(self, token: str) -> Tuple[int, ...]:
+        """BPE token ids of a (byte-encoded) word."""
+        if token in self.special_token_ids:
+            return self.special_token_ids[token]
+        encoder = self.encoder
+        word = [encoder[c] for c in token[:-1]] + [encoder[token[-1] + "</w>"]]
+        merges = self.bpe_id_merges
+        while len(word) > 1:
+            # the pair with the lowest rank is merged everywhere in the word
+            best = None
+            for pair in zip(word, word[1:]):
+                merge = merges.get(pair)
+                if merge is not None and (best is None or merge[0] < best[0]):
+                    best, best_pair = merge, pair
+            if best is None:
                 break
-            first, second = bigram
+            first, second = best_pair
+            merged = best[1]
             new_word = []
             i = 0
             while i < len(word):
-                try:
-                    j = word.index(first, i)
-                    new_word.extend(word[i:j])
-                    i = j
-                except:
-                    new_word.extend(word[i:])
-                    break
-                if word[i] == first and i < len(word) - 1 and word[i + 1] == second:
-                    new_word.append(first + second)
+                if i < len(word) - 1 and word[i] == first and word[i + 1] == second:
+                    new_word.append(merged)
                     i += 2
                 else:
                     new_word.append(word[i])
                     i += 1
-            new_word = tuple(new_word)
             word = new_word
-            if len(word) == 1:
-                break
-            else:
-                pairs = get_pairs(word)
-        word = " ".join(word)
-        self.cache[token] = word
-        return word
+        return tuple(word)
+
+    def bpe(self, token):
+        return " ".join(self.decoder[i] for i in self._bpe_ids_cached(token))
 
     def encode(self, text):
         bpe_tokens = []
         text = self.clean_fn(text)
         for token in re.findall(self.pat, text):
             token = "".join(self.byte_encoder[b] for b in token.encode("utf-8"))
-            bpe_tokens.extend(
-                self.encoder[bpe_token] for bpe_token in self.bpe(token).split(" ")
-            )
+            bpe_tokens.extend(self._bpe_ids_cached(token))
         return bpe_tokens
 
+    def _encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """Token ids of each text, tokenizing each distinct text once (in the worker
+        processes if there are enough of them)."""
+        unique_texts = list(dict.fromkeys(texts))
+        if self.num_workers > 0 and len(unique_texts) >= _MIN_TEXTS_FOR_WORKERS:
+            if self._pool is None:
+                # spawn the workers, forking a process using CUDA is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    mp_context=mp.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._init_kwargs,),
+                )
+            chunk_size = -(-len(unique_texts) // (4 * self.num_workers))
+            chunks = [
+                unique_texts[i : i + chunk_size]
+                for i in range(0, len(unique_texts), chunk_size)
+            ]
+            unique_tokens = [
+                tokens
+                for chunk_tokens in self._pool.map(_encode_in_worker, chunks)
+                for tokens in chunk_tokens
+            ]
+        else:
+            unique_tokens = [self.encode(text) for text in unique_texts]
+        tokens_by_text = dict(zip(unique_texts, unique_tokens))
+        return [tokens_by_text[text] for text in texts]
+
     def decode(self, tokens):
         text = "".join([self.decoder[token] for token in tokens])
         text = (
@@ -241,8 +358,8 @@ class SimpleTokenizer(object):
         context_length = context_length or self.context_length
         assert context_length, "Please set a valid context length"
         all_tokens = [
-            [self.sot_token_id] + self.encode(text) + [self.eot_token_id]
-            for text in texts
+            [self.sot_token_id] + tokens + [self.eot_token_id]
+            for tokens in self._encode_batch(texts)
         ]
         result = torch.zeros(len(all_tokens), context_length, dtype=torch.long)
         for i, tokens in enumerate(all_tokens):
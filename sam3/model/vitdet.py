@@ -435,16 +435,17 @@ class Attention(nn.Module):
             theta=self.rope_theta,
         )
 
+        self.register_buffer("freqs_cis", self._compute_freqs_cis(*self.input_size))
+        # freqs_cis of other input sizes (e.g. resolution-adaptive inference)
+        self._freqs_cis_cache = {}
+
+    def _compute_freqs_cis(self, H: int, W: int) -> Tensor:
         # interpolate rope
         scale_pos = 1.0
         if self.rope_interp:
-            scale_pos = self.rope_pt_size[0] / self.input_size[0]
+            scale_pos = self.rope_pt_size[0] / H
         # get scaled freqs_cis
-        freqs_cis = self.compute_cis(
-            end_x=self.input_size[0],
-            end_y=self.input_size[1],
-            scale_pos=scale_pos,
-        )
+        freqs_cis = self.compute_cis(end_x=H, end_y=W, scale_pos=scale_pos)
         if self.cls_token:
             t = torch.zeros(
                 self.head_dim // 2,
@@ -453,15 +454,23 @@ class Attention(nn.Module):
             )
             cls_freqs_cis = torch.polar(torch.ones_like(t), t)[None, :]
             freqs_cis = torch.cat([cls_freqs_cis, freqs_cis], dim=0)
-
-        self.register_buffer("freqs_cis", freqs_cis)
-
-    def _apply_rope(self, q, k) -> Tuple[Tensor, Tensor]:
+        return freqs_cis
+
+    def _get_freqs_cis(self, H: int, W: int) -> Tensor:
+        if (H, W) == tuple(self.input_size):
+            return self.freqs_cis
+        freqs_cis = self._freqs_cis_cache.get((H, W))
+        if freqs_cis is None or freqs_cis.device != self.freqs_cis.device:
+            freqs_cis = self._compute_freqs_cis(H, W).to(self.freqs_cis.device)
+            self._freqs_cis_cache[(H, W)] = freqs_cis
+        return freqs_cis
+
+    def _apply_rope(self, q, k, hw: Tuple[int, int]) -> Tuple[Tensor, Tensor]:
         if not self.use_rope:
             return q, k
 
         assert self.freqs_cis is not None
-        return apply_rotary_enc(q, k, freqs_cis=self.freqs_cis)
+        return apply_rotary_enc(q, k, freqs_cis=self._get_freqs_cis(*hw))
 
     def forward(self, x: Tensor) -> Tensor:
         s = 1 if self.cls_token else 0  # used to exclude cls_token
@@ -474,7 +483,7 @@ class Attention(nn.Module):
             assert x.ndim == 3
             B, L, _ = x.shape
             ndim = 3
-            H = W = math.sqrt(L - s)
+            H = W = int(math.sqrt(L - s))
 
         # qkv with shape (3, B, nHead, L, C)
         qkv = self.qkv(x).reshape(B, L, 3, self.num_heads, -1)
@@ -482,7 +491,7 @@ class Attention(nn.Module):
         q, k, v = qkv.permute(2, 0, 3, 1, 4).unbind(0)
 
         # handle rope and rel pos embeddings
-        q, k = self._apply_rope(q, k)
+        q, k = self._apply_rope(q, k, (H, W))
         if self.use_rel_pos:
             q, k = concat_rel_pos(
                 q.flatten(0, 1),
@@ -11,6 +11,7 @@ import torch.nn as nn
 from torch.nn.attention import sdpa_kernel, SDPBackend
 
 from .act_ckpt_utils import activation_ckpt_wrapper
+from .feature_cache import LRUCache
 from .necks import Sam3DualViTDetNeck
 
 
@@ -29,11 +30,16 @@ class SAM3VLBackbone(nn.Module):
         act_ckpt_whole_vision_backbone: bool = False,
         act_ckpt_whole_language_backbone: bool = False,
         scalp=0,
+        text_cache_size: int = 0,
     ):
         """Initialize the backbone combiner.
 
         :param visual: The vision backbone to use
         :param text: The text encoder to use
+        :param text_cache_size: Max number of prompts whose text features are
+            cached for inference (0 to disable the cache). The cache is cleared
+            when switching between train and eval mode and when loading weights,
+            so it should only be enabled for inference models.
         """
         super().__init__()
         self.vision_backbone: Sam3DualViTDetNeck = (
@@ -44,6 +50,25 @@ class SAM3VLBackbone(nn.Module):
         # allow running activation checkpointing on the entire vision and language backbones
         self.act_ckpt_whole_vision_backbone = act_ckpt_whole_vision_backbone
         self.act_ckpt_whole_language_backbone = act_ckpt_whole_language_backbone
+        # LRU cache of per-prompt text features, only used at inference. Since every
+        # caller (image processor, video inference, ...) goes through `forward_text`,
+        # they all share it.
+        self.text_cache = (
+            LRUCache(max_entries=text_cache_size) if text_cache_size > 0 else None
+        )
+
+    def clear_text_cache(self):
+        if self.text_cache is not None:
+            self.text_cache.clear()
+
+    def train(self, mode: bool = True):
+        # the cached text features are stale once the weights were updated
+        self.clear_text_cache()
+        return super().train(mode)
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        self.clear_text_cache()
+        super()._load_from_state_dict(*args, **kwargs)
 
     def forward(
         self,
@@ -121,6 +146,15 @@ class SAM3VLBackbone(nn.Module):
     def forward_text(
         self, captions, input_boxes=None, additional_text=None, device="cuda"
     ):
+        use_cache = (
+            self.text_cache is not None
+            and not self.training
+            and not torch.is_grad_enabled()
+            and (input_boxes is None or len(input_boxes) == 0)
+            and additional_text is None
+        )
+        if use_cache:
+            return self._forward_text_cached(captions, device=device)
         return activation_ckpt_wrapper(self._forward_text_no_ack_ckpt)(
             captions=captions,
             input_boxes=input_boxes,
@@ -174,3 +208,58 @@ class SAM3VLBackbone(nn.Module):
         )
 
         return output
+
+    def _text_cache_key(self, caption, device):
+        # Normalize the prompt the same way the tokenizer does, so that prompts
+        # differing only in case or whitespace share an entry
+        clean_fn = getattr(self.language_backbone.tokenizer, "clean_fn", None)
+        text = clean_fn(caption) if clean_fn is not None else caption
+        autocast_state = (
+            torch.is_autocast_enabled() and torch.get_autocast_gpu_dtype(),
+            torch.is_autocast_cpu_enabled() and torch.get_autocast_cpu_dtype(),
+        )
+        return text, str(torch.device(device)), autocast_state
+
+    def _forward_text_cached(self, captions, device="cuda"):
+        """Same as `_forward_text_no_ack_ckpt` but only encodes the captions whose
+        features are not already in `self.text_cache`."""
+        keys = [self._text_cache_key(caption, device) for caption in captions]
+        entries = {}
+        to_encode = {}
+        for caption, key in zip(captions, keys):
+            if key in entries or key in to_encode:
+                continue
+            entry = self.text_cache.get(key)
+            if entry is None:
+                to_encode[key] = caption
+            else:
+                entries[key] = entry
+
+        if len(to_encode) > 0:
+            encoded = self._forward_text_no_ack_ckpt(
+                list(to_encode.values()), device=device
+            )
+            for i, key in enumerate(to_encode):
+                # clone so that each entry only holds its own slice of memory
+                entry = {
+                    "language_features": encoded["language_features"][
+                        :, i : i + 1
+                    ].clone(),
+                    "language_mask": encoded["language_mask"][i : i + 1].clone(),
+                    "language_embeds": encoded["language_embeds"][:, i : i + 1].clone(),
+                }
+                self.text_cache.put(key, entry)
+                entries[key] = entry
+
+        # text features are sequence-first, the attention mask is batch-first
+        return {
+            "language_features": torch.cat(
+                [entries[key]["language_features"] for key in keys], dim=1
+            ),
+            "language_mask": torch.cat(
+                [entries[key]["language_mask"] for key in keys], dim=0
+            ),
+            "language_embeds": torch.cat(
+                [entries[key]["language_embeds"] for key in keys], dim=1
+            ),
+        }
@@ -14,6 +14,7 @@ from sam3.model.decoder import (
     TransformerEncoderCrossAttention,
 )
 from sam3.model.encoder import TransformerEncoderFusion, TransformerEncoderLayer
+from sam3.model.feature_cache import map_tensors
 from sam3.model.geometry_encoders import SequenceGeometryEncoder
 from sam3.model.maskformer_segmentation import PixelDecoder, UniversalSegmentationHead
 from sam3.model.memory import (
@@ -34,13 +35,19 @@ from sam3.model.sam1_task_predictor import SAM3InteractiveImagePredictor
 from sam3.model.sam3_image import Sam3Image, Sam3ImageOnVideoMultiGPU
 from sam3.model.sam3_tracking_predictor import Sam3TrackerPredictor
 from sam3.model.sam3_video_inference import Sam3VideoInferenceWithInstanceInteractivity
-from sam3.model.sam3_video_predictor import Sam3VideoPredictorMultiGPU
+from sam3.model.sam3_video_predictor import (
+    Sam3VideoPredictor,
+    Sam3VideoPredictorMultiGPU,
+)
 from sam3.model.text_encoder_ve import VETextEncoder
 from sam3.model.tokenizer_ve import SimpleTokenizer
 from sam3.model.vitdet import ViT
 from sam3.model.vl_combiner import SAM3VLBackbone
 from sam3.sam.transformer import RoPEAttention
 
+# max number of prompts whose text features are cached by the inference models
+INFERENCE_TEXT_CACHE_SIZE = 256
+
 
 # Setup TensorFloat-32 for Ampere GPUs if available
 def _setup_tf32() -> None:
@@ -107,9 +114,11 @@ def _create_vit_neck(position_encoding, vit_backbone, enable_inst_interactivity=
     )
 
 
-def _create_vl_backbone(vit_neck, text_encoder):
+def _create_vl_backbone(vit_neck, text_encoder, text_cache_size=0):
     """Create visual-language backbone."""
-    return SAM3VLBackbone(visual=vit_neck, text=text_encoder, scalp=1)
+    return SAM3VLBackbone(
+        visual=vit_neck, text=text_encoder, scalp=1, text_cache_size=text_cache_size
+    )
 
 
 def _create_transformer_encoder() -> TransformerEncoderFusion:
@@ -429,11 +438,20 @@ def _create_tracker_transformer():
 
 
 def build_tracker(
-    apply_temporal_disambiguation: bool, with_backbone: bool = False, compile_mode=None
+    apply_temporal_disambiguation: bool,
+    with_backbone: bool = False,
+    compile_mode=None,
+    frame_feature_cache_bytes: int = 0,
+    frame_feature_cache_offload_bytes: int = 0,
 ) -> Sam3TrackerPredictor:
     """
     Build the SAM3 Tracker module for video tracking.
 
+    Args:
+        frame_feature_cache_bytes: Memory budget of the LRU cache of the backbone
+            features of recently visited frames (0 to disable it)
+        frame_feature_cache_offload_bytes: Budget of the CPU (fp16) tier of this cache
+
     Returns:
         Sam3TrackerPredictor: Wrapped SAM3 Tracker module
     """
@@ -478,6 +496,8 @@ def build_tracker(
         clear_non_cond_mem_around_input=True,
         fill_hole_area=0,
         use_memory_selection=apply_temporal_disambiguation,
+        frame_feature_cache_bytes=frame_feature_cache_bytes,
+        frame_feature_cache_offload_bytes=frame_feature_cache_offload_bytes,
     )
 
     return model
@@ -554,6 +574,61 @@ def _setup_device_and_mode(model, device, eval_mode):
     return model
 
 
+CPU_PROFILES = ("fp32", "bf16", "int8")
+
+
+def _get_num_physical_cores() -> int:
+    try:
+        import psutil
+
+        num_cores = psutil.cpu_count(logical=False)
+    except ImportError:
+        num_cores = None
+    return num_cores or os.cpu_count() or 1
+
+
+def _autocast_forward(module: nn.Module, dtype: torch.dtype) -> None:
+    """Run `module.forward` under CPU autocast to `dtype`, returning fp32 outputs."""
+    forward = module.forward
+
+    def _forward(*args, **kwargs):
+        with torch.autocast(device_type="cpu", dtype=dtype):
+            out = forward(*args, **kwargs)
+        return map_tensors(out, lambda t: t.float() if t.is_floating_point() else t)
+
+    module.forward = _forward
+
+
+def _setup_cpu_inference(model, cpu_profile="fp32", num_threads=None):
+    """
+    Tune a model running on the CPU for inference.
+
+    All profiles set the number of torch threads (by default, to the number of
+    physical cores, as hyper-threads don't help the GEMMs) and use the
+    channels-last layout for the convolutions. On top of this:
+        - "bf16" runs the ViT and the text encoder under bfloat16 autocast
+          (fast on CPUs with AVX512-BF16 / AMX)
+        - "int8" applies dynamic int8 quantization to the Linear layers of the
+          ViT and the text encoder, which hold most of the FLOPs of the model
+    The rest of the model (fusion encoder, decoder, heads) stays in fp32.
+    """
+    assert cpu_profile in CPU_PROFILES, f"{cpu_profile=} must be in {CPU_PROFILES}"
+    torch.set_num_threads(num_threads or _get_num_physical_cores())
+    model = model.to(memory_format=torch.channels_last)
+
+    backbone = model.backbone
+    heavy_modules = [backbone.vision_backbone.trunk, backbone.language_backbone]
+    if cpu_profile == "bf16":
+        for module in heavy_modules:
+            _autocast_forward(module, torch.bfloat16)
+    elif cpu_profile == "int8":
+        for module in heavy_modules:
+            torch.ao.quantization.quantize_dynamic(
+                module, {nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+    return model
+
+
 def build_sam3_image_model(
     bpe_path=None,
     device="cuda" if torch.cuda.is_available() else "cpu",
@@ -563,6 +638,8 @@ def build_sam3_image_model(
     enable_segmentation=True,
     enable_inst_interactivity=False,
     compile=False,
+    cpu_profile=None,
+    num_threads=None,
 ):
     """
     Build SAM3 image model
@@ -574,7 +651,12 @@ def build_sam3_image_model(
         checkpoint_path: Optional path to model checkpoint
         enable_segmentation: Whether to enable segmentation head
         enable_inst_interactivity: Whether to enable instance interactivity (SAM 1 task)
-        compile_mode: To enable compilation, set to "default"
+        compile_mode: To enable compilation, set to "default" (on CPU, this uses
+            the inductor C++ backend)
+        cpu_profile: Inference optimizations when running on the CPU, one of
+            "fp32", "bf16" or "int8" (see `_setup_cpu_inference`). None keeps
+            the plain fp32 model.
+        num_threads: Number of torch threads for the CPU profile
 
     Returns:
         A SAM3 image model
@@ -593,7 +675,12 @@ def build_sam3_image_model(
     text_encoder = _create_text_encoder(bpe_path)
 
     # Create visual-language backbone
-    backbone = _create_vl_backbone(vision_encoder, text_encoder)
+    # the per-prompt text feature cache is only enabled for inference
+    backbone = _create_vl_backbone(
+        vision_encoder,
+        text_encoder,
+        text_cache_size=INFERENCE_TEXT_CACHE_SIZE if eval_mode else 0,
+    )
 
     # Create transformer components
     transformer = _create_sam3_transformer()
@@ -633,6 +720,10 @@ def build_sam3_image_model(
 
     # Setup device and mode
     model = _setup_device_and_mode(model, device, eval_mode)
+    if cpu_profile is not None:
+        assert device == "cpu", "cpu_profile requires device='cpu'"
+        assert eval_mode, "cpu_profile is only supported for inference"
+        model = _setup_cpu_inference(model, cpu_profile, num_threads=num_threads)
 
     return model
 
@@ -656,6 +747,8 @@ def build_sam3_video_model(
     apply_temporal_disambiguation: bool = True,
     device="cuda" if torch.cuda.is_available() else "cpu",
     compile=False,
+    frame_feature_cache_bytes: int = 0,
+    frame_feature_cache_offload_bytes: int = 0,
 ) -> Sam3VideoInferenceWithInstanceInteractivity:
     """
     Build SAM3 dense tracking model.
@@ -663,6 +756,9 @@ def build_sam3_video_model(
     Args:
         checkpoint_path: Optional path to checkpoint file
         bpe_path: Path to the BPE tokenizer file
+        frame_feature_cache_bytes: Memory budget of the LRU cache of the backbone
+            features of recently visited frames (0 to disable it)
+        frame_feature_cache_offload_bytes: Budget of the CPU (fp16) tier of this cache
 
     Returns:
         Sam3VideoInferenceWithInstanceInteractivity: The instantiated dense tracking model
@@ -673,12 +769,18 @@ def build_sam3_video_model(
         )
 
     # Build Tracker module
-    tracker = build_tracker(apply_temporal_disambiguation=apply_temporal_disambiguation)
+    tracker = build_tracker(
+        apply_temporal_disambiguation=apply_temporal_disambiguation,
+        frame_feature_cache_bytes=frame_feature_cache_bytes,
+        frame_feature_cache_offload_bytes=frame_feature_cache_offload_bytes,
+    )
 
     # Build Detector components
     visual_neck = _create_vision_backbone()
     text_encoder = _create_text_encoder(bpe_path)
-    backbone = SAM3VLBackbone(scalp=1, visual=visual_neck, text=text_encoder)
+    backbone = _create_vl_backbone(
+        visual_neck, text_encoder, text_cache_size=INFERENCE_TEXT_CACHE_SIZE
+    )
     transformer = _create_sam3_transformer(has_presence_token=has_presence_token)
     segmentation_head: UniversalSegmentationHead = _create_segmentation_head()
     input_geometry_encoder = _create_geometry_encoder()
@@ -787,7 +889,14 @@ def build_sam3_video_model(
     return model
 
 
-def build_sam3_video_predictor(*model_args, gpus_to_use=None, **model_kwargs):
+def build_sam3_video_predictor(
+    *model_args, gpus_to_use=None, device=None, **model_kwargs
+):
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    if torch.device(device).type != "cuda":
+        # single-process predictor, e.g. on CPU-only hosts
+        return Sam3VideoPredictor(*model_args, device=device, **model_kwargs)
     return Sam3VideoPredictorMultiGPU(
         *model_args, gpus_to_use=gpus_to_use, **model_kwargs
     )
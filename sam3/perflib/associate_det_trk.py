@@ -2,10 +2,60 @@
 
 from collections import defaultdict
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 from sam3.perflib.masks_ops import mask_iou
 from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+def assign_max_iou(iou):
+    """
+    Maximum-IoU one-to-one assignment between detections (rows) and tracks (columns)
+    of the (N, M) array `iou`, equivalent to `linear_sum_assignment(1 - iou)` up to ties.
+
+    The overlap graph between detections and tracks is usually very sparse (most
+    detections overlap at most one track), so a pair that is the only overlap of both
+    its detection and its track is assigned directly, and the Hungarian algorithm only
+    runs on each connected block of contested pairs. The remaining rows and columns
+    (which don't overlap each other) are then paired in order, so that min(N, M) pairs
+    are assigned as with the Hungarian algorithm on the whole matrix.
+
+    Returns:
+        row_ind, col_ind: arrays of the assigned pairs, sorted by row
+    """
+    num_det, num_trk = iou.shape
+    d_idx, t_idx = np.nonzero(iou > 0)
+    row_deg = np.bincount(d_idx, minlength=num_det)
+    col_deg = np.bincount(t_idx, minlength=num_trk)
+    uncontested = (row_deg[d_idx] == 1) & (col_deg[t_idx] == 1)
+    row_ind, col_ind = [d_idx[uncontested]], [t_idx[uncontested]]
+    if not uncontested.all():
+        # all the overlaps of a contested detection or track are contested, so the
+        # contested pairs form blocks that can be solved independently
+        d_c, t_c = d_idx[~uncontested], t_idx[~uncontested]
+        num_nodes = num_det + num_trk  # tracks are the nodes after the detections
+        graph = coo_matrix(
+            (np.ones(len(d_c)), (d_c, t_c + num_det)), shape=(num_nodes, num_nodes)
+        )
+        _, labels = connected_components(graph, directed=False)
+        d_labels, t_labels = labels[d_c], labels[t_c + num_det]
+        for label in np.unique(d_labels):
+            rows = np.unique(d_c[d_labels == label])
+            cols = np.unique(t_c[t_labels == label])
+            r, c = linear_sum_assignment(iou[np.ix_(rows, cols)], maximize=True)
+            row_ind.append(rows[r])
+            col_ind.append(cols[c])
+    row_ind, col_ind = np.concatenate(row_ind), np.concatenate(col_ind)
+    free_rows = np.setdiff1d(np.arange(num_det), row_ind)
+    free_cols = np.setdiff1d(np.arange(num_trk), col_ind)
+    num_free_pairs = min(len(free_rows), len(free_cols))
+    row_ind = np.concatenate([row_ind, free_rows[:num_free_pairs]])
+    col_ind = np.concatenate([col_ind, free_cols[:num_free_pairs]])
+    order = np.argsort(row_ind, kind="stable")
+    return row_ind[order], col_ind[order]
 
 
 def associate_det_trk(
@@ -15,6 +65,7 @@ def associate_det_trk(
     iou_threshold_trk=0.5,
     det_scores=None,
     new_det_thresh=0.0,
+    fast_path=True,
 ):
     """
     Optimized implementation of detection <-> track association that minimizes DtoH syncs.
@@ -22,6 +73,9 @@ def associate_det_trk(
     Args:
         det_masks: (N, H, W) tensor of predicted masks
         track_masks: (M, H, W) tensor of track masks
+        fast_path: use a single DtoH copy and vectorized matching, running the
+            Hungarian algorithm only on contested blocks (see `assign_max_iou`)
+            instead of on the whole IoU matrix
 
     Returns:
         new_det_indices: list of indices in det_masks considered 'new'
@@ -61,6 +115,15 @@ def associate_det_trk(
         track_masks = track_masks > 0
 
         iou = mask_iou(det_masks, track_masks)  # (N, M)
+        if fast_path:
+            return _associate_from_iou(
+                iou,
+                iou_threshold=iou_threshold,
+                iou_threshold_trk=iou_threshold_trk,
+                det_scores=det_scores,
+                new_det_thresh=new_det_thresh,
+            )
+
         igeit = iou >= iou_threshold
         igeit_any_dim_1 = igeit.any(dim=1)
         igeit_trk = iou >= iou_threshold_trk
@@ -135,3 +198,53 @@ def associate_det_trk(
         return (branchy_hungarian_better_uses_the_cpu)(
             cost_matrix, row_ind, col_ind, iou_list, det_masks, track_masks
         )
+
+
+def _associate_from_iou(
+    iou, iou_threshold, iou_threshold_trk, det_scores, new_det_thresh
+):
+    """The matching of `associate_det_trk` from the (N, M) IoU matrix, with a single
+    DtoH copy (of the IoUs and the detection scores) and vectorized numpy ops."""
+    num_det, num_trk = iou.shape
+    if det_scores is not None:
+        iou_and_scores = torch.cat([iou, det_scores.float()[:, None]], dim=1)
+        iou_and_scores = iou_and_scores.cpu().numpy()
+        iou, det_scores = iou_and_scores[:, :num_trk], iou_and_scores[:, num_trk]
+    else:
+        iou = iou.cpu().numpy()
+
+    # Maximum-IoU matching for tracks (one-to-one: each track matches at most one detection)
+    row_ind, col_ind = assign_max_iou(iou)
+    matched_iou = iou[row_ind, col_ind]
+    trk_is_matched = np.zeros(num_trk, dtype=bool)
+    trk_is_matched[col_ind[matched_iou >= iou_threshold_trk]] = True
+    unmatched_trk_indices = np.nonzero(~trk_is_matched)[0].tolist()
+    matched_det_scores = {}  # track index -> [det_score, det_score * iou]
+    if det_scores is not None:
+        scores = det_scores[row_ind].astype(np.float64)
+        matched_det_scores = {
+            t: [s, s_iou]
+            for t, s, s_iou in zip(
+                col_ind.tolist(), scores.tolist(), (scores * matched_iou).tolist()
+            )
+        }
+
+    # For detections: allow many tracks to match to the same detection (many-to-one)
+    # So, a detection is 'new' if it does not match any track above threshold
+    igeit = iou >= iou_threshold
+    new_det_indices = []
+    if det_scores is not None:
+        is_new_det = ~igeit.any(axis=1) & (det_scores >= new_det_thresh)
+        new_det_indices = np.nonzero(is_new_det)[0].tolist()
+
+    # for each detection, which tracks it matched to (above threshold)
+    det_to_matched_trk = defaultdict(list)
+    for d, t in zip(*(idx.tolist() for idx in np.nonzero(igeit))):
+        det_to_matched_trk[d].append(t)
+
+    return (
+        new_det_indices,
+        unmatched_trk_indices,
+        det_to_matched_trk,
+        matched_det_scores,
+    )
@@ -1,6 +1,9 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import torch
 
 try:
@@ -20,13 +23,24 @@ def connected_components_cpu_single(values: torch.Tensor):
     from skimage.measure import label
 
     labels, num = label(values.cpu().numpy(), return_num=True)
-    labels = torch.from_numpy(labels)
-    counts = torch.zeros_like(labels)
-    for i in range(1, num + 1):
-        cur_mask = labels == i
-        cur_count = cur_mask.sum()
-        counts[cur_mask] = cur_count
-    return labels, counts
+    # the size of each component, gathered for each pixel (0 for the background)
+    component_sizes = np.bincount(labels.ravel(), minlength=num + 1)
+    component_sizes[0] = 0
+    counts = component_sizes.astype(labels.dtype)[labels]
+    return torch.from_numpy(labels), torch.from_numpy(counts)
+
+
+_CPU_EXECUTOR = None
+
+
+def _get_cpu_executor():
+    global _CPU_EXECUTOR
+    if _CPU_EXECUTOR is None:
+        _CPU_EXECUTOR = ThreadPoolExecutor(
+            max_workers=min(32, os.cpu_count() or 1),
+            thread_name_prefix="perflib_cc",
+        )
+    return _CPU_EXECUTOR
 
 
 def connected_components_cpu(input_tensor: torch.Tensor):
@@ -39,12 +53,17 @@ def connected_components_cpu(input_tensor: torch.Tensor):
         ), "Input tensor must be (B, H, W) or (B, 1, H, W)."
 
     batch_size = input_tensor.shape[0]
-    labels_list = []
-    counts_list = []
-    for b in range(batch_size):
-        labels, counts = connected_components_cpu_single(input_tensor[b])
-        labels_list.append(labels)
-        counts_list.append(counts)
+    values = input_tensor.cpu()
+    if batch_size > 1:
+        # the labeling and the counting mostly run in native code, so the masks are
+        # processed in parallel in a thread pool
+        results = list(
+            _get_cpu_executor().map(connected_components_cpu_single, values.unbind(0))
+        )
+    else:
+        results = [connected_components_cpu_single(v) for v in values.unbind(0)]
+    labels_list = [labels for labels, _ in results]
+    counts_list = [counts for _, counts in results]
     labels_tensor = torch.stack(labels_list, dim=0).to(input_tensor.device)
     counts_tensor = torch.stack(counts_list, dim=0).to(input_tensor.device)
     return labels_tensor.view(out_shape), counts_tensor.view(out_shape)
@@ -72,12 +91,14 @@ def connected_components(input_tensor: torch.Tensor):
     if input_tensor.is_cuda:
         if HAS_CC_TORCH:
             return get_connected_components(input_tensor.to(torch.uint8))
-        else:
+        try:
             # triton fallback
             from sam3.perflib.triton.connected_components import (
                 connected_components_triton,
             )
-
+        except ImportError:
+            logging.debug("triton not found, computing connected components on CPU")
+        else:
             return connected_components_triton(input_tensor)
 
     # CPU fallback
@@ -1,6 +1,7 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
 
 import torch
+import torch.nn.functional as F
 
 
 def masks_to_boxes(masks: torch.Tensor, obj_ids: list[int]):
@@ -45,18 +46,71 @@ def masks_to_boxes(masks: torch.Tensor, obj_ids: list[int]):
         return bounding_boxes
 
 
-def mask_iou(pred_masks: torch.Tensor, gt_masks: torch.Tensor) -> torch.Tensor:
+# above this number of elements of the (N, M, H*W) broadcast intermediates, the masks
+# are bit-packed and only the pairs with overlapping boxes are compared
+_DENSE_MASK_IOU_MAX_NUMEL = 1 << 24
+
+
+def mask_iou(
+    pred_masks: torch.Tensor, gt_masks: torch.Tensor, chunk_bytes: int = 1 << 28
+) -> torch.Tensor:
     """
     Compute the IoU (Intersection over Union) between predicted masks and ground truth masks.
+
+    Small inputs are compared densely by broadcasting. For larger inputs, only the pairs
+    of masks whose bounding boxes overlap are compared, on masks bit-packed into 64-bit
+    words (popcount of their AND), in chunks of pairs of about `chunk_bytes`. This needs
+    O((N + M) * H * W / 8 + chunk_bytes) memory instead of O(N * M * H * W).
+
     Args:
       - pred_masks: (N, H, W) bool Tensor, containing binary predicted segmentation masks
       - gt_masks: (M, H, W) bool Tensor, containing binary ground truth segmentation masks
+      - chunk_bytes: approximate memory budget of the packed intermediates
     Returns:
       - ious: (N, M) float Tensor, containing IoUs for each pair of predicted and ground truth masks
     """
     assert pred_masks.dtype == gt_masks.dtype == torch.bool
     N, H, W = pred_masks.shape
     M, _, _ = gt_masks.shape
+    if N * M * H * W <= _DENSE_MASK_IOU_MAX_NUMEL:
+        return _mask_iou_dense(pred_masks, gt_masks)
+
+    with torch.autograd.profiler.record_function("perflib: mask_iou_packed"):
+        pred_flat = pred_masks.reshape(N, H * W)
+        gt_flat = gt_masks.reshape(M, H * W)
+        pred_area = pred_flat.sum(dim=1)
+        gt_area = gt_flat.sum(dim=1)
+
+        # only pairs of masks with overlapping bounding boxes can intersect (empty
+        # masks have an empty box [W, H, 0, 0] that overlaps no other box)
+        pred_boxes = masks_to_boxes(pred_masks, range(N))
+        gt_boxes = masks_to_boxes(gt_masks, range(M))
+        boxes_overlap = (
+            (pred_boxes[:, None, 0] <= gt_boxes[None, :, 2])
+            & (gt_boxes[None, :, 0] <= pred_boxes[:, None, 2])
+            & (pred_boxes[:, None, 1] <= gt_boxes[None, :, 3])
+            & (gt_boxes[None, :, 1] <= pred_boxes[:, None, 3])
+        )
+        pred_inds, gt_inds = torch.nonzero(boxes_overlap, as_tuple=True)
+
+        pred_words = _pack_masks(pred_flat)
+        gt_words = _pack_masks(gt_flat)
+        intersection = torch.zeros(N, M, dtype=torch.float, device=pred_masks.device)
+        chunk_size = max(1, chunk_bytes // (pred_words.size(1) * 8))
+        for begin in range(0, pred_inds.numel(), chunk_size):
+            i = pred_inds[begin : begin + chunk_size]
+            j = gt_inds[begin : begin + chunk_size]
+            words = pred_words[i] & gt_words[j]
+            intersection[i, j] = _popcount(words).float()
+
+        union = pred_area[:, None] + gt_area[None, :] - intersection
+        ious = intersection / union.clamp(min=1)
+        return ious  # shape: (N, M)
+
+
+def _mask_iou_dense(pred_masks: torch.Tensor, gt_masks: torch.Tensor) -> torch.Tensor:
+    N, H, W = pred_masks.shape
+    M, _, _ = gt_masks.shape
 
     # Flatten masks: (N, 1, H*W) and (1, M, H*W)
     pred_flat = pred_masks.view(N, 1, H * W)
@@ -67,3 +121,21 @@ def mask_iou(pred_masks: torch.Tensor, gt_masks: torch.Tensor) -> torch.Tensor:
     union = (pred_flat | gt_flat).sum(dim=2).float()
     ious = intersection / union.clamp(min=1)
     return ious  # shape: (N, M)
+
+
+def _pack_masks(masks_flat: torch.Tensor) -> torch.Tensor:
+    """Packs (N, L) bool masks into (N, ceil(L / 64)) int64 words."""
+    N, L = masks_flat.shape
+    masks_flat = F.pad(masks_flat.to(torch.uint8), (0, -L % 64))
+    bit_weights = 2 ** torch.arange(8, dtype=torch.uint8, device=masks_flat.device)
+    packed = (masks_flat.view(N, -1, 8) * bit_weights).sum(dim=2, dtype=torch.uint8)
+    return packed.view(torch.int64)
+
+
+def _popcount(words: torch.Tensor) -> torch.Tensor:
+    """Number of set bits in each row of (P, K) int64 words (SWAR popcount)."""
+    words = words - ((words >> 1) & 0x5555555555555555)
+    words = (words & 0x3333333333333333) + ((words >> 2) & 0x3333333333333333)
+    # the number of set bits of each byte
+    words = (words + (words >> 4)) & 0x0F0F0F0F0F0F0F0F
+    return words.view(torch.uint8).sum(dim=1)
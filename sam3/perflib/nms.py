@@ -1,6 +1,7 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
 
 import logging
+from typing import List
 
 import numpy as np
 import torch
@@ -75,8 +76,68 @@ def generic_nms_cpu(
     ious: torch.Tensor, scores: torch.Tensor, iou_threshold=0.5
 ) -> torch.Tensor:
     """
-    A generic version of `torchvision.ops.nms` that takes a pairwise IoU matrix. (CPU implementation
-    based on https://github.com/jwyang/faster-rcnn.pytorch/blob/master/lib/model/nms/nms_cpu.py)
+    A generic version of `torchvision.ops.nms` that takes a pairwise IoU matrix (CPU
+    implementation, see `batched_generic_nms_cpu`).
+    """
+    return batched_generic_nms_cpu([ious], [scores], iou_threshold)[0]
+
+
+def batched_generic_nms_cpu(
+    ious_list: List[torch.Tensor], scores_list: List[torch.Tensor], iou_threshold=0.5
+) -> List[torch.Tensor]:
+    """
+    CPU `generic_nms` over a batch of images, each with its (N_i, N_i) IoU matrix and
+    (N_i,) scores. Returns the kept indices of each image in decreasing score order.
+
+    The detections are sorted by score and the whole suppression matrix ("j comes
+    after i and IoU(i, j) > iou_threshold") is computed at once for the batch in
+    NumPy, with its rows packed into bitsets. The greedy selection then only visits
+    the kept detections: each kept row is OR-ed into a bitset of suppressed
+    detections and the next detection is its lowest unset bit. The results are the
+    same as the sequential algorithm in `_generic_nms_cpu_loop`.
+    """
+    assert len(ious_list) == len(scores_list)
+    sizes = [scores.size(0) for scores in scores_list]
+    max_size = max(sizes, default=0)
+    ious_np = np.zeros((len(sizes), max_size, max_size), dtype=np.float32)
+    orders = np.zeros((len(sizes), max_size), dtype=np.int64)
+    for b, (ious, scores) in enumerate(zip(ious_list, scores_list)):
+        n = sizes[b]
+        ious_np[b, :n, :n] = ious.float().detach().cpu().numpy()
+        orders[b, :n] = scores.float().detach().cpu().numpy().argsort()[::-1]
+    # IoUs between the detections sorted by decreasing score
+    ious_np = np.take_along_axis(ious_np, orders[:, :, None], axis=1)
+    ious_np = np.take_along_axis(ious_np, orders[:, None, :], axis=2)
+    suppress = np.triu(~(ious_np <= iou_threshold), k=1)
+    suppress_bits = np.packbits(suppress, axis=2, bitorder="little")
+
+    kept_inds_list = []
+    for b, scores in enumerate(scores_list):
+        kept = _greedy_select(suppress_bits[b], sizes[b])
+        kept_inds = torch.from_numpy(orders[b, kept])
+        kept_inds_list.append(kept_inds.to(device=scores.device))
+    return kept_inds_list
+
+
+def _greedy_select(suppress_bits: np.ndarray, n: int) -> List[int]:
+    """Greedy NMS selection from the bit-packed rows of the suppression matrix."""
+    kept = []
+    done = 0  # bitset of the detections that are kept, suppressed or skipped
+    i = 0
+    while i < n:
+        kept.append(i)
+        row = int.from_bytes(suppress_bits[i].tobytes(), "little")
+        done |= row | ((1 << (i + 1)) - 1)
+        i = (~done & (done + 1)).bit_length() - 1  # the lowest unset bit
+    return kept
+
+
+def _generic_nms_cpu_loop(
+    ious: torch.Tensor, scores: torch.Tensor, iou_threshold=0.5
+) -> torch.Tensor:
+    """
+    Sequential reference implementation of `generic_nms_cpu` (based on
+    https://github.com/jwyang/faster-rcnn.pytorch/blob/master/lib/model/nms/nms_cpu.py)
     """
     ious_np = ious.float().detach().cpu().numpy()
     scores_np = scores.float().detach().cpu().numpy()
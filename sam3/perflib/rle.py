@@ -0,0 +1,146 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""Batched COCO RLE encoding and decoding of masks, vectorized over all the masks
+(no Python loop over the masks or over the runs). The compressed strings are the
+same as the ones of `pycocotools.mask.encode`."""
+
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+
+# a 64-bit run length (or difference of run lengths) takes at most 13 5-bit chars
+_MAX_CHARS_PER_COUNT = 13
+
+
+@torch.no_grad()
+def masks_to_rle_counts(masks: torch.Tensor) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run lengths of (N, H, W) bool masks in COCO (column-major) order, computed with a
+    single segmented difference of the change points of all the masks.
+
+    Returns:
+      - runs: (R,) int64 array of the run lengths of all the masks, concatenated
+      - num_runs: (N,) int64 array of the number of runs of each mask
+    """
+    assert masks.ndim == 3 and masks.dtype == torch.bool
+    N = masks.shape[0]
+    # the COCO API uses Fortran order
+    flat = masks.transpose(1, 2).reshape(N, -1)
+    differences = torch.ones(
+        N, flat.shape[1] + 1, device=masks.device, dtype=torch.bool
+    )
+    differences[:, 1:-1] = flat[:, :-1] != flat[:, 1:]
+    differences[:, 0] = flat[:, 0]  # the first run (of zeros) might be empty
+    mask_inds, change_inds = torch.where(differences)
+    runs = change_inds.clone()
+    runs[1:] -= change_inds[:-1]
+    # the first run of each mask starts at its first pixel
+    is_first = torch.ones_like(mask_inds, dtype=torch.bool)
+    is_first[1:] = mask_inds[1:] != mask_inds[:-1]
+    runs = torch.where(is_first, change_inds, runs)
+    num_runs = differences.sum(dim=1)
+    runs_and_num_runs = torch.cat([runs, num_runs]).cpu().numpy()
+    return runs_and_num_runs[: runs.numel()], runs_and_num_runs[runs.numel() :]
+
+
+def _positions_in_masks(num_items: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start index of each mask, and index of each item within its mask."""
+    starts = np.cumsum(num_items) - num_items
+    positions = np.arange(num_items.sum()) - np.repeat(starts, num_items)
+    return starts, positions
+
+
+def rle_counts_to_strings(runs: np.ndarray, num_runs: np.ndarray) -> List[str]:
+    """COCO compressed strings (as in `rleToString` of the COCO API) of the
+    concatenated run lengths `runs` of several masks (`num_runs` runs each)."""
+    if len(num_runs) == 0:
+        return []
+    runs = np.asarray(runs, dtype=np.int64)
+    num_runs = np.asarray(num_runs, dtype=np.int64)
+    _, positions = _positions_in_masks(num_runs)
+    # from the 4th run on, each run is stored as a difference to the run 2 before
+    x = runs.copy()
+    is_delta = positions > 2
+    x[is_delta] -= runs[np.flatnonzero(is_delta) - 2]
+
+    # emit the 5-bit groups of each value (least significant first), with bit 0x20
+    # set on all but its last char
+    chars = np.zeros((len(x), _MAX_CHARS_PER_COUNT), dtype=np.uint8)
+    is_char = np.zeros((len(x), _MAX_CHARS_PER_COUNT), dtype=bool)
+    active = np.ones(len(x), dtype=bool)
+    num_groups = 0
+    while active.any():
+        c = x & 0x1F
+        x = x >> 5  # arithmetic shift, as for the signed values in the COCO API
+        more = np.where(c & 0x10, x != -1, x != 0)
+        chars[:, num_groups] = (c | (more << 5)) + 48
+        is_char[:, num_groups] = active
+        active &= more
+        num_groups += 1
+
+    text = chars[is_char].tobytes().decode("ascii")
+    chars_before = np.concatenate([[0], np.cumsum(is_char.sum(axis=1))])
+    ends = chars_before[np.cumsum(num_runs)]
+    begins = chars_before[np.cumsum(num_runs) - num_runs]
+    return [text[b:e] for b, e in zip(begins.tolist(), ends.tolist())]
+
+
+def rle_strings_to_counts(
+    strings: Sequence[Union[str, bytes]],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Run lengths of the COCO compressed strings of several masks (the inverse of
+    `rle_counts_to_strings`), as the concatenated `runs` and the `num_runs` of each mask.
+    """
+    encoded = [s.encode("ascii") if isinstance(s, str) else bytes(s) for s in strings]
+    c = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.int64) - 48
+    is_last = (c & 0x20) == 0  # the last char of each value
+    value_starts = np.flatnonzero(np.concatenate([[True], is_last[:-1]]))
+    value_ids = np.cumsum(is_last) - is_last
+    shift = 5 * (np.arange(len(c)) - value_starts[value_ids])
+    if len(c) > 0:
+        x = np.bitwise_or.reduceat((c & 0x1F) << shift, value_starts)
+    else:
+        x = np.zeros(0, dtype=np.int64)
+    # sign extension of the negative values
+    is_negative = (c[is_last] & 0x10) != 0
+    x[is_negative] |= np.left_shift(-1, shift[is_last][is_negative] + 5)
+
+    # the number of values of each mask
+    lengths = np.array([len(s) for s in encoded], dtype=np.int64)
+    values_before = np.concatenate([[0], np.cumsum(is_last)])
+    char_ends = np.cumsum(lengths)
+    num_runs = values_before[char_ends] - values_before[char_ends - lengths]
+
+    # undo the differences: runs[m] = x[m] + runs[m - 2] for m > 2, i.e. cumulative
+    # sums of x over the odd positions and over the even positions from 2 on
+    starts, positions = _positions_in_masks(num_runs)
+    mask_starts = np.repeat(starts, num_runs)
+    runs = x.copy()
+    for chain in (positions % 2 == 1, (positions % 2 == 0) & (positions >= 2)):
+        cumsum = np.concatenate([[0], np.cumsum(np.where(chain, x, 0))])
+        runs[chain] = (cumsum[1:] - cumsum[mask_starts])[chain]
+    return runs, num_runs
+
+
+def rle_counts_to_masks(
+    runs: np.ndarray, num_runs: np.ndarray, h: int, w: int
+) -> np.ndarray:
+    """(N, h, w) bool masks from their concatenated run lengths."""
+    _, positions = _positions_in_masks(np.asarray(num_runs, dtype=np.int64))
+    # the runs alternate between zeros and ones, starting with zeros
+    flat = np.repeat(positions % 2 == 1, runs)
+    if flat.size != len(num_runs) * h * w:
+        raise ValueError(f"Invalid RLE: the runs don't add up to {h}x{w} masks")
+    masks = flat.reshape(len(num_runs), w, h).transpose(0, 2, 1)
+    return np.ascontiguousarray(masks)
+
+
+def rle_decode(strings: Sequence[Union[str, bytes]], h: int, w: int) -> np.ndarray:
+    """Decode the COCO compressed RLE strings of several (h, w) masks at once.
+
+    Returns:
+      - masks: (N, h, w) bool array
+    """
+    runs, num_runs = rle_strings_to_counts(strings)
+    return rle_counts_to_masks(runs, num_runs, h, w)
@@ -6,7 +6,7 @@ import numpy as np
 import pytest
 import torch
 from PIL import Image
-from sam3.perflib.masks_ops import masks_to_boxes
+from sam3.perflib.masks_ops import mask_iou, masks_to_boxes
 
 
 class TestMasksToBoxes:
@@ -57,3 +57,143 @@ class TestMasksToBoxes:
             )
             masks = _create_masks(image, masks)
             masks_box_check(masks, expected)
+
+
+class TestAssociateDetTrk:
+    @staticmethod
+    def _random_box_masks(num_masks, size, generator):
+        masks = torch.zeros(num_masks, size, size, dtype=torch.bool)
+        xy = torch.randint(0, size - 8, (num_masks, 2), generator=generator)
+        wh = torch.randint(4, 16, (num_masks, 2), generator=generator)
+        for mask, (x, y), (w, h) in zip(masks, xy.tolist(), wh.tolist()):
+            mask[y : y + h, x : x + w] = True
+        return masks
+
+    def test_fast_path_matches_hungarian(self):
+        from scipy.optimize import linear_sum_assignment
+        from sam3.perflib.associate_det_trk import assign_max_iou, associate_det_trk
+
+        generator = torch.Generator().manual_seed(0)
+        for num_det, num_trk in [(1, 1), (5, 3), (3, 5), (20, 20), (40, 10)]:
+            trk_masks = self._random_box_masks(num_trk, 64, generator)
+            det_masks = self._random_box_masks(num_det, 64, generator)
+            # most detections re-detect a track
+            det_masks[: min(num_det, num_trk)] |= trk_masks[: min(num_det, num_trk)]
+            det_scores = torch.rand(num_det, generator=generator)
+
+            iou = mask_iou(det_masks, trk_masks).numpy()
+            row_ind, col_ind = assign_max_iou(iou)
+            ref_row_ind, ref_col_ind = linear_sum_assignment(1 - iou)
+            assert len(row_ind) == len(ref_row_ind) == min(num_det, num_trk)
+            assert (
+                len(set(row_ind.tolist())) == len(set(col_ind.tolist())) == len(row_ind)
+            )
+            np.testing.assert_allclose(
+                iou[row_ind, col_ind].sum(), iou[ref_row_ind, ref_col_ind].sum()
+            )
+
+            kwargs = dict(det_scores=det_scores, new_det_thresh=0.3)
+            new, unmatched, det_to_trk, scores = associate_det_trk(
+                det_masks.float(), trk_masks.float(), **kwargs
+            )
+            ref_new, ref_unmatched, ref_det_to_trk, ref_scores = associate_det_trk(
+                det_masks.float(), trk_masks.float(), fast_path=False, **kwargs
+            )
+            assert new == ref_new
+            assert unmatched == ref_unmatched
+            assert dict(det_to_trk) == dict(ref_det_to_trk)
+            # zero-IoU pairs are arbitrary ties of the assignment
+            overlapping = {t: v for t, v in scores.items() if v[1] > 0}
+            ref_overlapping = {t: v for t, v in ref_scores.items() if v[1] > 0}
+            assert overlapping.keys() == ref_overlapping.keys()
+            for t, v in overlapping.items():
+                np.testing.assert_allclose(v, ref_overlapping[t], rtol=1e-6)
+
+
+class TestMaskIou:
+    def test_packed_matches_dense(self, monkeypatch):
+        from sam3.perflib import masks_ops
+
+        # always use the bit-packed path
+        monkeypatch.setattr(masks_ops, "_DENSE_MASK_IOU_MAX_NUMEL", 0)
+        generator = torch.Generator().manual_seed(0)
+        for (num_pred, num_gt), (H, W) in [((7, 5), (37, 53)), ((16, 16), (64, 64))]:
+            pred_masks = torch.rand(num_pred, H, W, generator=generator) > 0.7
+            gt_masks = torch.zeros(num_gt, H, W, dtype=torch.bool)
+            for k in range(1, num_gt):  # the first ground truth mask is empty
+                y, x = torch.randint(0, H // 2, (2,), generator=generator).tolist()
+                gt_masks[k, y : y + H // 2, x : x + W // 4] = True
+            expected = masks_ops._mask_iou_dense(pred_masks, gt_masks)
+            for chunk_bytes in [8, 1 << 20]:
+                out = mask_iou(pred_masks, gt_masks, chunk_bytes=chunk_bytes)
+                torch.testing.assert_close(out, expected, rtol=0.0, atol=1e-6)
+
+
+class TestGenericNmsCpu:
+    def test_matches_sequential_nms(self):
+        from sam3.perflib.nms import (
+            _generic_nms_cpu_loop,
+            batched_generic_nms_cpu,
+            generic_nms_cpu,
+        )
+
+        generator = torch.Generator().manual_seed(0)
+        ious_list, scores_list = [], []
+        for n in [0, 1, 10, 100, 300]:
+            ious = torch.rand(n, n, generator=generator)
+            ious = (ious + ious.T) / 2
+            ious.fill_diagonal_(1.0)
+            # quantized scores to also check the order of ties
+            scores = (torch.rand(n, generator=generator) * 10).round() / 10
+            ious_list.append(ious)
+            scores_list.append(scores)
+            for iou_threshold in [0.3, 0.5, 0.9]:
+                expected = _generic_nms_cpu_loop(ious, scores, iou_threshold)
+                out = generic_nms_cpu(ious, scores, iou_threshold)
+                assert torch.equal(out, expected)
+
+        batched = batched_generic_nms_cpu(ious_list, scores_list, 0.5)
+        for ious, scores, out in zip(ious_list, scores_list, batched):
+            assert torch.equal(out, _generic_nms_cpu_loop(ious, scores, 0.5))
+
+
+class TestConnectedComponentsCpu:
+    def test_component_sizes(self):
+        from sam3.perflib.connected_components import connected_components_cpu
+
+        masks = torch.zeros(3, 1, 16, 16, dtype=torch.uint8)
+        masks[0, 0, 1:4, 1:4] = 1  # 9 pixels
+        masks[0, 0, 8:10, 8:15] = 1  # 14 pixels
+        masks[1, 0, 5, 5] = 1  # 1 pixel
+        masks[1, 0, 6, 6] = 1  # 8-connected to the pixel above
+        labels, counts = connected_components_cpu(masks)
+        assert labels.shape == counts.shape == masks.shape
+        assert counts[0, 0, 2, 2] == 9 and counts[0, 0, 9, 9] == 14
+        assert counts[1, 0, 5, 5] == counts[1, 0, 6, 6] == 2
+        assert labels[0].max() == 2 and labels[1].max() == 1
+        # the background and the empty mask have no component
+        assert (counts[masks == 0] == 0).all() and (labels[2] == 0).all()
+
+
+class TestRle:
+    def test_matches_pycocotools(self):
+        mask_util = pytest.importorskip("pycocotools.mask")
+        from sam3.perflib.rle import (
+            masks_to_rle_counts,
+            rle_counts_to_strings,
+            rle_decode,
+        )
+
+        generator = torch.Generator().manual_seed(0)
+        masks = torch.rand(6, 37, 23, generator=generator) > 0.7
+        masks[0] = False
+        masks[1] = True
+        masks[2, :, :11] = True  # long runs
+        strings = rle_counts_to_strings(*masks_to_rle_counts(masks))
+        for mask, string in zip(masks.numpy(), strings):
+            rle = mask_util.encode(np.asfortranarray(mask.astype(np.uint8)))
+            assert string == rle["counts"].decode("ascii")
+
+        decoded = rle_decode(strings, 37, 23)
+        assert decoded.dtype == np.bool_
+        assert np.array_equal(decoded, masks.numpy())
@@ -6,6 +6,7 @@ import numpy as np
 import pycocotools.mask as maskUtils
 import torch
 from pycocotools import mask as mask_util
+from sam3.perflib.rle import masks_to_rle_counts, rle_counts_to_strings
 
 
 def instance_masks_to_semantic_masks(
@@ -162,7 +163,9 @@ def rle_encode(orig_mask, return_areas=False):
     """Encodes a collection of masks in RLE format
 
     This function emulates the behavior of the COCO API's encode function, but
-    is executed partially on the GPU for faster execution.
+    is executed partially on the GPU for faster execution: the run lengths of all
+    the masks are computed at once on the masks' device, and then compressed into
+    COCO strings with vectorized NumPy ops (see `sam3.perflib.rle`).
 
     Args:
         mask (torch.Tensor): A mask of shape (N, H, W) with dtype=torch.bool
@@ -178,54 +181,17 @@ def rle_encode(orig_mask, return_areas=False):
     if orig_mask.numel() == 0:
         return []
 
-    # First, transpose the spatial dimensions.
-    # This is necessary because the COCO API uses Fortran order
-    mask = orig_mask.transpose(1, 2)
-
-    # Flatten the mask
-    flat_mask = mask.reshape(mask.shape[0], -1)
     if return_areas:
-        mask_areas = flat_mask.sum(-1).tolist()
-    # Find the indices where the mask changes
-    differences = torch.ones(
-        mask.shape[0], flat_mask.shape[1] + 1, device=mask.device, dtype=torch.bool
-    )
-    differences[:, 1:-1] = flat_mask[:, :-1] != flat_mask[:, 1:]
-    differences[:, 0] = flat_mask[:, 0]
-    _, change_indices = torch.where(differences)
-
-    try:
-        boundaries = torch.cumsum(differences.sum(-1), 0).cpu()
-    except RuntimeError as _:
-        boundaries = torch.cumsum(differences.cpu().sum(-1), 0)
-
-    change_indices_clone = change_indices.clone()
-    # First pass computes the RLEs on GPU, in a flatten format
-    for i in range(mask.shape[0]):
-        # Get the change indices for this batch item
-        beg = 0 if i == 0 else boundaries[i - 1].item()
-        end = boundaries[i].item()
-        change_indices[beg + 1 : end] -= change_indices_clone[beg : end - 1]
-
-    # Now we can split the RLES of each batch item, and convert them to strings
-    # No more gpu at this point
-    change_indices = change_indices.tolist()
-
-    batch_rles = []
-    # Process each mask in the batch separately
-    for i in range(mask.shape[0]):
-        beg = 0 if i == 0 else boundaries[i - 1].item()
-        end = boundaries[i].item()
-        run_lengths = change_indices[beg:end]
-
-        uncompressed_rle = {"counts": run_lengths, "size": list(orig_mask.shape[1:])}
-        h, w = uncompressed_rle["size"]
-        rle = mask_util.frPyObjects(uncompressed_rle, h, w)
-        rle["counts"] = rle["counts"].decode("utf-8")
-        if return_areas:
-            rle["area"] = mask_areas[i]
-        batch_rles.append(rle)
-
+        mask_areas = orig_mask.flatten(1).sum(-1).tolist()
+    runs, num_runs = masks_to_rle_counts(orig_mask)
+    h, w = orig_mask.shape[1:]
+    batch_rles = [
+        {"size": [h, w], "counts": counts}
+        for counts in rle_counts_to_strings(runs, num_runs)
+    ]
+    if return_areas:
+        for rle, area in zip(batch_rles, mask_areas):
+            rle["area"] = area
     return batch_rles
 
 
@@ -238,16 +204,7 @@ def robust_rle_encode(masks):
     try:
         return rle_encode(masks)
     except RuntimeError as _:
-        masks = masks.cpu().numpy()
-        rles = [
-            mask_util.encode(
-                np.array(mask[:, :, np.newaxis], dtype=np.uint8, order="F")
-            )[0]
-            for mask in masks
-        ]
-        for rle in rles:
-            rle["counts"] = rle["counts"].decode("utf-8")
-        return rles
+        return rle_encode(masks.cpu())
 
 
 def ann_to_rle(segm, im_info):
@@ -0,0 +1,76 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""Micro-benchmark of the detection <-> track association in perflib.
+
+Sweeps the number of detections N and of tracks M on synthetic box masks, where
+most detections re-detect a track (the common sparse case) and a fraction of them
+overlap several tracks, and compares the latency of the fast path (vectorized
+matching with Hungarian only on contested blocks) with the dense Hungarian path.
+
+Usage: python scripts/benchmarks/benchmark_associate_det_trk.py --sizes 8 32 128
+"""
+
+import argparse
+
+import torch
+from benchmark_utils import random_box_masks, time_fn
+from sam3.perflib.associate_det_trk import associate_det_trk
+
+
+def make_masks(num_det, num_trk, size, contested_frac, generator):
+    """Random box track masks, and detections that mostly re-detect a track."""
+    trk_masks = random_box_masks(num_trk, size, generator)
+    det_masks = random_box_masks(num_det, size, generator)
+    num_redetected = min(num_det, num_trk)
+    det_masks[:num_redetected] = trk_masks[:num_redetected]
+    # a fraction of the detections also covers a second track
+    num_contested = int(contested_frac * num_redetected)
+    for d in range(num_contested):
+        det_masks[d] |= trk_masks[(d + 1) % num_trk]
+    det_scores = torch.rand(num_det, generator=generator)
+    return det_masks.float(), trk_masks.float(), det_scores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[8, 32, 128])
+    parser.add_argument("--mask_size", type=int, default=256)
+    parser.add_argument("--contested_frac", type=float, default=0.1)
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    parser.add_argument("--num_iters", type=int, default=20)
+    args = parser.parse_args()
+
+    generator = torch.Generator().manual_seed(0)
+    print(
+        f"{'N dets':>8}{'M tracks':>10}{'hungarian':>12}{'fast path':>12}{'speedup':>9}"
+    )
+    for num_det in args.sizes:
+        for num_trk in args.sizes:
+            det_masks, trk_masks, det_scores = make_masks(
+                num_det, num_trk, args.mask_size, args.contested_frac, generator
+            )
+            det_masks = det_masks.to(args.device)
+            trk_masks = trk_masks.to(args.device)
+            det_scores = det_scores.to(args.device)
+            times = {}
+            for fast_path in (False, True):
+                _, times[fast_path], _ = time_fn(
+                    lambda: associate_det_trk(
+                        det_masks,
+                        trk_masks,
+                        det_scores=det_scores,
+                        fast_path=fast_path,
+                    ),
+                    args.num_iters,
+                    args.device,
+                )
+            print(
+                f"{num_det:>8}{num_trk:>10}{times[False] * 1000:>10.2f}ms"
+                f"{times[True] * 1000:>10.2f}ms{times[False] / times[True]:>8.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
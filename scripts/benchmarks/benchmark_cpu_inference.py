@@ -0,0 +1,141 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""Benchmark the CPU inference profiles of the SAM3 image model.
+
+For each profile, reports the latency of each stage (vision backbone, text
+encoder, grounding = fusion encoder + decoder + heads) and the accuracy delta
+w.r.t. the plain fp32 model on a small set of fixture images: IoU of the union
+of the predicted masks, difference in number of detections and in top score.
+
+Usage: python scripts/benchmarks/benchmark_cpu_inference.py --profiles fp32 bf16 int8
+"""
+
+import argparse
+import os
+import time
+
+import torch
+from PIL import Image
+from sam3.model.sam3_image_processor import Sam3Processor
+from sam3.model_builder import build_sam3_image_model, CPU_PROFILES
+
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "images")
+FIXTURES = [
+    ("truck.jpg", "truck"),
+    ("groceries.jpg", "paper bag"),
+    ("test_image.jpg", "child"),
+]
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def run_profile(model, images, num_iters):
+    """Returns the mean latency of each stage and the predictions on each fixture."""
+    processor = Sam3Processor(model, device="cpu")
+    # measure the actual text encoder, not the prompt cache
+    model.backbone.text_cache = None
+    timings = {"vision": 0.0, "text": 0.0, "grounding": 0.0}
+    predictions = []
+    for it in range(num_iters + 1):  # the first iteration is a warmup
+        for image, prompt in images:
+            state, t_vision = _timed(processor.set_image, image)
+            with torch.inference_mode():
+                text_out, t_text = _timed(
+                    model.backbone.forward_text, [prompt], device="cpu"
+                )
+            state["backbone_out"].update(text_out)
+            state["geometric_prompt"] = model._get_dummy_prompt()
+            state, t_grounding = _timed(processor._forward_grounding, state)
+            if it > 0:
+                timings["vision"] += t_vision
+                timings["text"] += t_text
+                timings["grounding"] += t_grounding
+            if it == num_iters:
+                predictions.append(
+                    {"masks": state["masks"].squeeze(1), "scores": state["scores"]}
+                )
+    num_runs = num_iters * len(images)
+    return {k: v / num_runs for k, v in timings.items()}, predictions
+
+
+def accuracy_delta(ref_predictions, predictions):
+    deltas = []
+    for ref, pred in zip(ref_predictions, predictions):
+        ref_union = ref["masks"].any(0) if len(ref["masks"]) else None
+        pred_union = pred["masks"].any(0) if len(pred["masks"]) else None
+        if ref_union is None or pred_union is None:
+            iou = 1.0 if ref_union is None and pred_union is None else 0.0
+        else:
+            inter = (ref_union & pred_union).sum().item()
+            union = (ref_union | pred_union).sum().item()
+            iou = inter / max(union, 1)
+        ref_top = ref["scores"].max().item() if len(ref["scores"]) else 0.0
+        top = pred["scores"].max().item() if len(pred["scores"]) else 0.0
+        deltas.append(
+            {
+                "union_mask_iou": iou,
+                "num_detections_delta": len(pred["scores"]) - len(ref["scores"]),
+                "top_score_delta": top - ref_top,
+            }
+        )
+    return deltas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        default=list(CPU_PROFILES),
+        choices=list(CPU_PROFILES),
+        help="CPU profiles to compare against the plain fp32 model.",
+    )
+    parser.add_argument("--num_threads", type=int, default=None)
+    parser.add_argument("--num_iters", type=int, default=3)
+    parser.add_argument("--checkpoint_path", type=str, default=None)
+    args = parser.parse_args()
+
+    images = [
+        (Image.open(os.path.join(ASSETS_DIR, name)).convert("RGB"), prompt)
+        for name, prompt in FIXTURES
+    ]
+
+    results = {}
+    for profile in [None] + args.profiles:
+        model = build_sam3_image_model(
+            device="cpu",
+            checkpoint_path=args.checkpoint_path,
+            cpu_profile=profile,
+            num_threads=args.num_threads,
+        )
+        results[profile] = run_profile(model, images, args.num_iters)
+        del model
+
+    ref_timings, ref_predictions = results[None]
+    print(f"{'profile':<10}{'vision':>10}{'text':>10}{'grounding':>12}{'speedup':>10}")
+    for profile, (timings, predictions) in results.items():
+        total = sum(timings.values())
+        speedup = sum(ref_timings.values()) / total
+        print(
+            f"{profile or 'baseline':<10}{timings['vision'] * 1000:>8.1f}ms"
+            f"{timings['text'] * 1000:>8.1f}ms{timings['grounding'] * 1000:>10.1f}ms"
+            f"{speedup:>9.2f}x"
+        )
+        if profile is None:
+            continue
+        for (name, prompt), delta in zip(
+            FIXTURES, accuracy_delta(ref_predictions, predictions)
+        ):
+            print(
+                f"    {name} ({prompt}): union mask IoU {delta['union_mask_iou']:.4f}, "
+                f"detections {delta['num_detections_delta']:+d}, "
+                f"top score {delta['top_score_delta']:+.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""Benchmark of perflib.masks_ops.mask_iou: dense broadcasting vs bit-packed masks.
+
+Sweeps N predicted x M ground truth masks of random boxes (a sparse scene, where
+most pairs of boxes don't overlap) and reports the latency of the dense path,
+which materializes (N, M, H*W) intermediates, and of the box-prefiltered bit-packed
+path, together with their peak memory on GPU. The dense path is skipped when its
+intermediates would not fit in --dense_max_gb.
+
+Usage: python scripts/benchmarks/benchmark_mask_iou.py --sizes 16 64 256 --mask_size 288
+"""
+
+import argparse
+
+import torch
+from benchmark_utils import random_box_masks, time_fn
+from sam3.perflib import masks_ops
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[16, 64, 256])
+    parser.add_argument("--mask_size", type=int, default=288)
+    parser.add_argument("--dense_max_gb", type=float, default=8.0)
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    parser.add_argument("--num_iters", type=int, default=10)
+    args = parser.parse_args()
+
+    # always use the bit-packed path when calling `mask_iou`
+    masks_ops._DENSE_MASK_IOU_MAX_NUMEL = 0
+    generator = torch.Generator().manual_seed(0)
+    print(
+        f"{'N':>6}{'M':>6}{'dense':>12}{'packed':>12}{'speedup':>9}"
+        f"{'dense mem':>12}{'packed mem':>12}  max abs diff"
+    )
+    for num_pred in args.sizes:
+        for num_gt in args.sizes:
+            pred_masks = random_box_masks(num_pred, args.mask_size, generator)
+            gt_masks = random_box_masks(num_gt, args.mask_size, generator)
+            pred_masks = pred_masks.to(args.device)
+            gt_masks = gt_masks.to(args.device)
+
+            packed, packed_time, packed_mem = time_fn(
+                lambda: masks_ops.mask_iou(pred_masks, gt_masks),
+                args.num_iters,
+                args.device,
+            )
+            dense_numel = num_pred * num_gt * args.mask_size**2
+            if dense_numel > args.dense_max_gb * 1024**3:
+                print(
+                    f"{num_pred:>6}{num_gt:>6}{'skipped':>12}"
+                    f"{packed_time * 1000:>10.2f}ms{'':>9}{'':>12}"
+                    f"{packed_mem:>10.0f}MB"
+                )
+                continue
+            dense, dense_time, dense_mem = time_fn(
+                lambda: masks_ops._mask_iou_dense(pred_masks, gt_masks),
+                args.num_iters,
+                args.device,
+            )
+            max_diff = (dense - packed).abs().max().item()
+            print(
+                f"{num_pred:>6}{num_gt:>6}{dense_time * 1000:>10.2f}ms"
+                f"{packed_time * 1000:>10.2f}ms{dense_time / packed_time:>8.2f}x"
+                f"{dense_mem:>10.0f}MB{packed_mem:>10.0f}MB  {max_diff:.2e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
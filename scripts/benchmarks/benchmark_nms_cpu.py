@@ -0,0 +1,78 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""Benchmark of the CPU mask NMS in perflib: sequential loop vs bitset selection.
+
+For each number of detections, builds the IoU matrix of random box masks (so that
+each detection overlaps a few others, as in the detector outputs) and reports the
+latency of the sequential NMS loop, of `generic_nms_cpu` and of
+`batched_generic_nms_cpu` over a batch of images (per image), checking that all of
+them keep exactly the same detections.
+
+Usage: python scripts/benchmarks/benchmark_nms_cpu.py --num_dets 100 300 1000
+"""
+
+import argparse
+
+import torch
+from benchmark_utils import random_box_masks, time_fn
+from sam3.perflib.masks_ops import mask_iou
+from sam3.perflib.nms import (
+    _generic_nms_cpu_loop,
+    batched_generic_nms_cpu,
+    generic_nms_cpu,
+)
+
+
+def random_ious(num_dets, size, generator):
+    masks = random_box_masks(num_dets, size, generator, min_side=size // 16)
+    return mask_iou(masks, masks), torch.rand(num_dets, generator=generator)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_dets", nargs="+", type=int, default=[100, 300, 1000])
+    parser.add_argument("--batch_size", type=int, default=8)
+    parser.add_argument("--iou_threshold", type=float, default=0.5)
+    parser.add_argument("--mask_size", type=int, default=128)
+    parser.add_argument("--num_iters", type=int, default=10)
+    args = parser.parse_args()
+
+    generator = torch.Generator().manual_seed(0)
+    thresh = args.iou_threshold
+    print(
+        f"{'dets':>6}{'loop':>12}{'bitset':>12}{'speedup':>9}"
+        f"{'batched/img':>14}{'speedup':>9}"
+    )
+    for num_dets in args.num_dets:
+        batch = [
+            random_ious(num_dets, args.mask_size, generator)
+            for _ in range(args.batch_size)
+        ]
+        ious_list = [ious for ious, _ in batch]
+        scores_list = [scores for _, scores in batch]
+        ref, loop_time, _ = time_fn(
+            lambda: [_generic_nms_cpu_loop(i, s, thresh) for i, s in batch],
+            args.num_iters,
+        )
+        out, bitset_time, _ = time_fn(
+            lambda: [generic_nms_cpu(i, s, thresh) for i, s in batch],
+            args.num_iters,
+        )
+        batched, batched_time, _ = time_fn(
+            lambda: batched_generic_nms_cpu(ious_list, scores_list, thresh),
+            args.num_iters,
+        )
+        for outputs in (out, batched):
+            assert all(torch.equal(a, b) for a, b in zip(ref, outputs))
+        loop_time /= args.batch_size
+        bitset_time /= args.batch_size
+        batched_time /= args.batch_size
+        print(
+            f"{num_dets:>6}{loop_time * 1000:>10.3f}ms{bitset_time * 1000:>10.3f}ms"
+            f"{loop_time / bitset_time:>8.2f}x{batched_time * 1000:>12.3f}ms"
+            f"{loop_time / batched_time:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""Speed/quality curve of resolution-adaptive inference in Sam3Processor.
+
+Runs each fixture image at every resolution (aspect-preserving resize + padding)
+and reports the latency of the vision backbone and of the whole image + prompt
+inference, together with the quality w.r.t. the default 1008x1008 (stretched)
+inference: IoU of the union of the predicted masks and difference in number of
+detections. Use it to pick the lowest resolution that is good enough for a given
+use case (e.g. triage of drone feeds).
+
+Usage: python scripts/benchmarks/benchmark_resolution.py --resolutions 336 672 1008
+"""
+
+import argparse
+import os
+import time
+
+import torch
+from PIL import Image
+from sam3.model.sam3_image_processor import Sam3Processor
+from sam3.model_builder import build_sam3_image_model
+
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "images")
+FIXTURES = [
+    ("truck.jpg", "truck"),
+    ("groceries.jpg", "paper bag"),
+    ("test_image.jpg", "child"),
+]
+
+
+def _sync(device):
+    if device == "cuda":
+        torch.cuda.synchronize()
+
+
+def run(processor, images, num_iters, device):
+    """Returns the mean vision and total latency, and the predictions on each fixture."""
+    vision_time = total_time = 0.0
+    predictions = []
+    for it in range(num_iters + 1):  # the first iteration is a warmup
+        for image, prompt in images:
+            _sync(device)
+            start = time.perf_counter()
+            state = processor.set_image(image)
+            _sync(device)
+            vision_end = time.perf_counter()
+            state = processor.set_text_prompt(prompt, state)
+            _sync(device)
+            end = time.perf_counter()
+            if it > 0:
+                vision_time += vision_end - start
+                total_time += end - start
+            if it == num_iters:
+                predictions.append(
+                    {"masks": state["masks"].squeeze(1), "scores": state["scores"]}
+                )
+    num_runs = num_iters * len(images)
+    return vision_time / num_runs, total_time / num_runs, predictions
+
+
+def union_mask_iou(ref_masks, masks):
+    if len(ref_masks) == 0 or len(masks) == 0:
+        return float(len(ref_masks) == len(masks))
+    ref_union, union = ref_masks.any(0), masks.any(0)
+    inter = (ref_union & union).sum().item()
+    return inter / max((ref_union | union).sum().item(), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolutions", nargs="+", type=int, default=[336, 672, 1008])
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    parser.add_argument("--num_iters", type=int, default=3)
+    parser.add_argument("--checkpoint_path", type=str, default=None)
+    args = parser.parse_args()
+
+    images = [
+        (Image.open(os.path.join(ASSETS_DIR, name)).convert("RGB"), prompt)
+        for name, prompt in FIXTURES
+    ]
+    model = build_sam3_image_model(
+        device=args.device, checkpoint_path=args.checkpoint_path
+    )
+    # measure the actual text encoder, not the prompt cache
+    model.backbone.text_cache = None
+
+    baseline = Sam3Processor(model, device=args.device)
+    ref_vision, ref_total, ref_predictions = run(
+        baseline, images, args.num_iters, args.device
+    )
+    print(f"{'resolution':<14}{'vision':>10}{'total':>10}{'speedup':>9}  quality")
+    print(
+        f"{'1008 (stretch)':<14}{ref_vision * 1000:>8.1f}ms{ref_total * 1000:>8.1f}ms"
+    )
+    for resolution in sorted(args.resolutions):
+        # a single supported resolution: every image is processed at it
+        processor = Sam3Processor(model, device=args.device, resolutions=[resolution])
+        vision, total, predictions = run(processor, images, args.num_iters, args.device)
+        quality = ", ".join(
+            f"{name}: IoU {union_mask_iou(ref['masks'], pred['masks']):.3f} "
+            f"({len(pred['scores']) - len(ref['scores']):+d} det)"
+            for (name, _), ref, pred in zip(FIXTURES, ref_predictions, predictions)
+        )
+        print(
+            f"{resolution:<14}{vision * 1000:>8.1f}ms{total * 1000:>8.1f}ms"
+            f"{ref_total / total:>8.2f}x  {quality}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""Benchmark of the batched RLE encoding and decoding of masks in perflib.
+
+Encodes and decodes N random blob masks, with one `pycocotools.mask` call per mask
+and with the vectorized `sam3.perflib.rle` functions, checking that both produce
+the same compressed strings and masks.
+
+Usage: python scripts/benchmarks/benchmark_rle.py --num_masks 16 128 1024
+"""
+
+import argparse
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from benchmark_utils import time_fn
+from pycocotools import mask as mask_util
+from sam3.perflib.rle import masks_to_rle_counts, rle_counts_to_strings, rle_decode
+
+
+def random_blob_masks(num_masks, size, generator):
+    noise = torch.rand(num_masks, 1, size // 16, size // 16, generator=generator)
+    noise = F.interpolate(noise, size=(size, size), mode="bilinear")
+    return noise[:, 0] > 0.6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_masks", nargs="+", type=int, default=[16, 128, 1024])
+    parser.add_argument("--mask_size", type=int, default=256)
+    parser.add_argument("--num_iters", type=int, default=10)
+    args = parser.parse_args()
+
+    generator = torch.Generator().manual_seed(0)
+    size = args.mask_size
+    print(
+        f"{'masks':>6}{'encode loop':>14}{'batched':>12}{'speedup':>9}"
+        f"{'decode loop':>14}{'batched':>12}{'speedup':>9}"
+    )
+    for num_masks in args.num_masks:
+        masks = random_blob_masks(num_masks, size, generator)
+        masks_np = masks.numpy().astype(np.uint8)
+
+        def encode_loop():
+            return [
+                mask_util.encode(np.asfortranarray(m))["counts"].decode()
+                for m in masks_np
+            ]
+
+        ref, encode_loop_time, _ = time_fn(encode_loop, args.num_iters)
+        strings, encode_time, _ = time_fn(
+            lambda: rle_counts_to_strings(*masks_to_rle_counts(masks)),
+            args.num_iters,
+        )
+        assert strings == ref
+        rles = [{"size": [size, size], "counts": s} for s in ref]
+        ref_masks, decode_loop_time, _ = time_fn(
+            lambda: np.stack([mask_util.decode(rle) for rle in rles]),
+            args.num_iters,
+        )
+        decoded, decode_time, _ = time_fn(
+            lambda: rle_decode(strings, size, size), args.num_iters
+        )
+        assert np.array_equal(decoded, ref_masks.astype(bool))
+        print(
+            f"{num_masks:>6}{encode_loop_time * 1000:>12.2f}ms"
+            f"{encode_time * 1000:>10.2f}ms{encode_loop_time / encode_time:>8.2f}x"
+            f"{decode_loop_time * 1000:>12.2f}ms{decode_time * 1000:>10.2f}ms"
+            f"{decode_loop_time / decode_time:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""Helpers shared by the micro-benchmarks of this directory (imported as a sibling
+module, since the benchmarks are run as scripts)."""
+
+import time
+
+import torch
+
+
+def random_box_masks(num_masks, size, generator, min_side=None, max_side=None):
+    """(num_masks, size, size) bool masks of random boxes, whose sides are drawn in
+    [min_side, max_side) (size // 32 and size // 8 by default)."""
+    min_side = size // 32 if min_side is None else min_side
+    max_side = size // 8 if max_side is None else max_side
+    masks = torch.zeros(num_masks, size, size, dtype=torch.bool)
+    xy = torch.randint(0, size - max_side, (num_masks, 2), generator=generator)
+    wh = torch.randint(min_side, max_side, (num_masks, 2), generator=generator)
+    for mask, (x, y), (w, h) in zip(masks, xy.tolist(), wh.tolist()):
+        mask[y : y + h, x : x + w] = True
+    return masks
+
+
+def time_fn(fn, num_iters, device="cpu"):
+    """
+    Mean latency of `fn` over `num_iters` calls, after a warmup call. On GPU, the
+    calls are synchronized and the peak memory allocated during the timed calls is
+    measured.
+
+    Returns:
+      - out: the output of the warmup call
+      - elapsed: the mean latency in seconds
+      - peak_mb: the peak GPU memory in MB (0 on CPU)
+    """
+    out = fn()  # warmup
+    if device == "cuda":
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+    start = time.perf_counter()
+    for _ in range(num_iters):
+        fn()
+    if device == "cuda":
+        torch.cuda.synchronize()
+    elapsed = (time.perf_counter() - start) / num_iters
+    peak_mb = torch.cuda.max_memory_allocated() / 1024**2 if device == "cuda" else 0
+    return out, elapsed, peak_mb
@@ -0,0 +1,83 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates. All Rights Reserved
+
+"""End-to-end smoke benchmark of the video predictor on a CPU-only host.
+
+Starts a session on a video (by default a synthetic one, so that no asset is
+needed), adds a text prompt on the first frame and propagates it through the
+whole video, reporting the latency of each step, the tracking throughput in
+frames per second and the session stats (CPU memory and frame feature cache).
+
+Usage: python scripts/benchmarks/benchmark_video_cpu.py --num_frames 16 --text person
+"""
+
+import argparse
+import time
+
+import torch
+from sam3.model_builder import build_sam3_video_predictor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--resource_path",
+        type=str,
+        default=None,
+        help="MP4 file or JPEG folder (defaults to a synthetic video).",
+    )
+    parser.add_argument("--num_frames", type=int, default=16)
+    parser.add_argument("--text", type=str, default="person")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--num_threads", type=int, default=None)
+    parser.add_argument("--checkpoint_path", type=str, default=None)
+    args = parser.parse_args()
+
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+    resource_path = args.resource_path or f"<load-dummy-video-{args.num_frames}>"
+
+    start = time.perf_counter()
+    predictor = build_sam3_video_predictor(
+        checkpoint_path=args.checkpoint_path, device=args.device
+    )
+    print(f"model build: {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    session_id = predictor.handle_request(
+        {"type": "start_session", "resource_path": resource_path}
+    )["session_id"]
+    print(f"start session: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    predictor.handle_request(
+        {
+            "type": "add_prompt",
+            "session_id": session_id,
+            "frame_index": 0,
+            "text": args.text,
+        }
+    )
+    print(f"add prompt: {time.perf_counter() - start:.2f}s")
+
+    num_frames = 0
+    start = time.perf_counter()
+    for _ in predictor.handle_stream_request(
+        {
+            "type": "propagate_in_video",
+            "session_id": session_id,
+            "propagation_direction": "forward",
+        }
+    ):
+        num_frames += 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"propagation: {num_frames} frames in {elapsed:.2f}s "
+        f"({num_frames / elapsed:.2f} fps)"
+    )
+    print(predictor._get_torch_and_gpu_properties())
+    print(predictor._get_session_stats())
+    predictor.handle_request({"type": "close_session", "session_id": session_id})
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,12 @@ def main():
         required=True,
         help="Paths to the ground truth files in COCO format.",
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=0,
+        help="Number of processes evaluating the images in parallel.",
+    )
     args = parser.parse_args()
     if len(args.gt_files) == 0:
         raise ValueError("At least one GT file must be provided.")
@@ -36,8 +42,11 @@ def main():
         )
 
     evaluator = CGF1Evaluator(
-        gt_path=args.gt_files, verbose=True, iou_type="segm"
-    )  # change to bbox if you want detection performance
+        gt_path=args.gt_files,
+        verbose=True,
+        iou_type="segm",  # change to bbox if you want detection performance
+        num_workers=args.num_workers,
+    )
 
     results = evaluator.evaluate(args.pred_file)
 